@@ -1,12 +1,12 @@
 import datetime
 import math
 import os
-from typing import Any, Callable, Dict, List, Optional, Union, Tuple
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Union, Tuple
 import csv
+import numpy as np
 import pandas as pd
-from utils import choose
-from bit_manipulations import nums_to_bits, bits_to_nums, popcount64d
-# Need to figure out how to have one file for bit manip.
+from utils import choose, dollar_to_float
+from lottery_analysis.bitset import BitSet, nums_to_bits, bits_to_nums, popcount64
 
 
 CASH5_FIELD_COUNT = 43
@@ -24,76 +24,288 @@ CASH5_ODDS_DICT = {CASH5_PICKED_COUNT - i:
 CASH5_PRIZE_DICT = {5: 100000, 4: 250, 3: 5, 2: 1, 1: 0}
 
 
+# Prize of each number of matches, 0 through 5; that of 5 is the jackpot, handled apart.
+CASH5_PRIZES = np.array([CASH5_PRIZE_DICT.get(i, 0)
+                         for i in range(CASH5_PICKED_COUNT + 1)],
+                        dtype=np.float64)
+
+
+def date_positions(cash5_df: pd.DataFrame, dates: Sequence[str]) -> np.ndarray:
+    """Positions of the first drawing of each date (e.g. "10/08/2007"); 0 if none, or absent."""
+    dates = list(dates)
+    epochs = np.array([int(datetime.datetime.strptime(date, "%m/%d/%Y").strftime("%s"))
+                       if (date != "") else 0
+                       for date in dates],
+                      dtype=np.int64)
+    given = np.array([date != "" for date in dates], dtype=bool)
+
+    draw_epochs, first = np.unique(cash5_df["epoch"].to_numpy(dtype=np.int64),
+                                   return_index=True)
+
+    if (len(draw_epochs) == 0):
+        return np.zeros(len(dates), dtype=np.int64)
+
+    ix = np.searchsorted(draw_epochs, epochs).clip(0, len(draw_epochs) - 1)
+    found = given & (draw_epochs[ix] == epochs)
+
+    return np.where(found, first[ix], 0)
+
+
+def date_position(cash5_df: pd.DataFrame, date: str = "") -> int:
+    """Position of the drawing of 'date' (e.g. "10/08/2007"); 0 if none, or absent."""
+    return int(date_positions(cash5_df, [date])[0])
+
+
+def match_counts(draw_bits: np.ndarray, bits: int) -> np.ndarray:
+    """Numbers matched by the ticket of 'bits' upon each drawing of 'draw_bits'.
+
+    Args:
+        draw_bits (np.ndarray): uint64 array of the drawings' bits.
+        bits (int): the ticket's bits.
+
+    Returns:
+        np.ndarray: uint8 array of the match counts.
+    """
+    return popcount64(draw_bits & np.uint64(bits))
+
+
+class RolloverIndex(NamedTuple):
+    """Per drawing, by position, the parsed 'prize_5' and its rollover segment.
+
+    A segment is a run of drawings whose jackpot rolled over, ended by the first
+    drawing whose jackpot was won: its 'segment_end'. Trailing rollovers, as yet
+    unwon, end at len(cash5_df).
+    """
+    # Whether the jackpot rolled over; and 'prize_5' as a number, NaN if so.
+    rollover: np.ndarray
+    prize_5: np.ndarray
+    # The advertised jackpot.
+    jackpot: np.ndarray
+    segment: np.ndarray
+    segment_end: np.ndarray
+    # The jackpot accumulated from the drawing up to its segment's end: that left to
+    # the segment's winner, were the jackpot won upon the drawing.
+    accumulated: np.ndarray
+    # The prize of a five-number match: the jackpot, if it rolled over, else a
+    # share of 'prize_5' with the drawing's other winners.
+    prize: np.ndarray
+
+
+def build_rollover_index(cash5_df: pd.DataFrame) -> RolloverIndex:
+    """Builds the rollover index of 'cash5_df', once, as it is loaded.
+
+    The index's arrays are read-only, and 'cash5_df' is not modified thereafter,
+    so that both may be shared by concurrent back tests.
+
+    Args:
+        cash5_df (pd.DataFrame): joined Cash 5 data, as per 'join_cash5csv'.
+
+    Returns:
+        RolloverIndex: the index.
+    """
+    n = len(cash5_df)
+    positions = np.arange(n)
+
+    rollover = (cash5_df["prize_5"] == "Rollover").to_numpy()
+    prize_5 = cash5_df["prize_5"]\
+        .where(~rollover)\
+        .map(dollar_to_float)\
+        .to_numpy(dtype=np.float64)
+    jackpot = cash5_df["jackpot"].map(dollar_to_float).to_numpy(dtype=np.float64)
+    winners_5 = cash5_df["winners_5"].fillna(0).to_numpy(dtype=np.float64)
+
+    # The first drawing, at or after each, whose jackpot was won.
+    segment_end = np.minimum.accumulate(np.where(rollover, n, positions)[::-1])[::-1]
+    # The number of jackpots won before each.
+    segment = np.cumsum(~rollover) - ~rollover
+
+    accumulated = CASH5_PRIZE + (segment_end - positions) * CASH5_PRIZE / 10
+    prize = np.where(rollover,
+                     jackpot,
+                     np.nan_to_num(prize_5) * winners_5 / (winners_5 + 1))
+
+    index = RolloverIndex(rollover=rollover,
+                          prize_5=prize_5,
+                          jackpot=jackpot,
+                          segment=segment,
+                          segment_end=segment_end,
+                          accumulated=accumulated,
+                          prize=prize)
+
+    for arr in index:
+        arr.setflags(write=False)
+
+    return index
+
+
+def segment_end_repricing(rollovers: RolloverIndex,
+                          winners_5: np.ndarray,
+                          jackpot_positions: np.ndarray) \
+        -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Reprices the jackpots of a ticket won at the end of a rollover segment.
+
+    A jackpot won upon a rollover leaves the 'accumulated' jackpot to the segment's
+    winner, at 'segment_end'; should the ticket win there too, it shares that, not
+    the 'prize_5' paid. Of several wins within a segment, the last is taken.
+
+    Args:
+        rollovers (RolloverIndex): as per 'build_rollover_index'.
+        winners_5 (np.ndarray): the 'winners_5' of every drawing, NaN as 0.
+        jackpot_positions (np.ndarray): ascending positions of the ticket's jackpots.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: the positions of the rollover wins
+        repricing a segment's end, those of the ends, and the prizes' differences.
+    """
+    won = jackpot_positions[rollovers.rollover[jackpot_positions]]
+    segments = rollovers.segment[won]
+    won = won[np.append(segments[1:] != segments[:-1], True)]
+
+    ends = rollovers.segment_end[won]
+    repriced = np.isin(ends, jackpot_positions)
+    won, ends = won[repriced], ends[repriced]
+
+    shares = winners_5[ends] / (winners_5[ends] + 1)
+    return won, ends, rollovers.accumulated[won] * shares - rollovers.prize[ends]
+
+
 def back_test(nums: str,
               cash5_df: pd.DataFrame,
-              date: str = "") -> pd.DataFrame:
+              date: str = "",
+              rollovers: Optional[RolloverIndex] = None) -> pd.DataFrame:
+    """Back-tests the ticket 'nums', as though played upon every drawing from 'date' onward.
 
+    The match counts of every drawing are computed at once, by AND and popcount of
+    the 'bits' column, and the prizes thereof mapped through CASH5_PRIZES; those of
+    the jackpot are looked up within the rollover index, and repriced at the end of
+    a segment as per 'segment_end_repricing'. 'cash5_df' is not modified.
+
+    Args:
+        nums (str): the ticket, e.g. "1, 2, 3, 4, 5".
+        cash5_df (pd.DataFrame): joined Cash 5 data, as per 'join_cash5csv'.
+        date (str, optional): first date, e.g. "10/08/2007"; defaults to the first drawing.
+        rollovers (RolloverIndex, optional): as per 'build_rollover_index'; built
+            anew if not given.
+
+    Returns:
+        pd.DataFrame: the drawings whereupon any number was matched, with the
+        'count' (int64) matched and the 'prize' (float64) won thereupon.
+    """
     bits = nums_to_bits(nums=nums,
                         bit_length=MAX_BITS,
                         max_num=CASH5_FIELD_COUNT + 1,
                         delim=", ")[0]
 
-    if (date != ""):
-        _date = datetime.datetime.strptime(date, "%m/%d/%Y")
-        epoch = int(_date.strftime("%s"))
-        pos = (cash5_df["epoch"] == epoch).argmax()
+    pos = date_position(cash5_df, date)
+
+    if (rollovers is None):
+        rollovers = build_rollover_index(cash5_df)
 
-    else:
-        pos = 0
+    # Drawings without a number's bits (e.g. absent from the join) match nothing.
+    draw_bits = cash5_df["bits"]\
+        .iloc[pos:]\
+        .fillna(0)\
+        .to_numpy(dtype=np.uint64)
 
-    winnings = []
+    counts = match_counts(draw_bits, bits)
+    matched = np.flatnonzero(counts)
 
-    def propagate_win(n: int, cash5_df: pd.DataFrame) -> float:
-        propagated = True
-        prize = CASH5_PRIZE
+    winnings_df = cash5_df.iloc[pos:].iloc[matched].reset_index(drop=True)
+    counts = counts[matched].astype(np.int64)
+    prizes = CASH5_PRIZES[counts]
 
-        n0 = n
+    jackpots = counts == CASH5_PICKED_COUNT
+    jackpot_positions = pos + matched[jackpots]
+    prizes[jackpots] = rollovers.prize[jackpot_positions]
 
-        won = cash5_df.loc[n0, "jackpot"]
+    # The jackpot is shared with the drawing's other winners, of whom the ticket
+    # is thereupon one more.
+    shared = np.zeros(len(matched), dtype=bool)
+    shared[jackpots] = ~rollovers.rollover[jackpot_positions]
+    winnings_df.loc[shared, "winners_5"] += 1
 
-        while (cash5_df.loc[n, "prize_5"] == "Rollover"):
-            prize += CASH5_PRIZE / 10
-            n += 1
+    winners_5 = cash5_df["winners_5"].fillna(0).to_numpy(dtype=np.float64)
+    _, ends, deltas = segment_end_repricing(rollovers, winners_5, jackpot_positions)
+    prizes[np.searchsorted(matched, ends - pos)] += deltas
 
-        cash5_df.loc[n0, "prize_5"] = won
-        cash5_df.loc[n, "prize_5"] = prize
+    winnings_df["count"] = counts
+    winnings_df["prize"] = prizes
 
-        return won
+    return winnings_df
 
-    for n, x in cash5_df.iloc[pos:, ].iterrows():
-        match = x["bits"] & bits
 
-        if (match):
-            count = popcount64d(match)
-            prize = 0.0
+def back_test_matrix(tickets: Sequence[str],
+                     cash5_df: pd.DataFrame,
+                     dates: Sequence[str],
+                     ticket_block: int = 1024,
+                     rollovers: Optional[RolloverIndex] = None) -> np.ndarray:
+    """Back-tests every ticket from every start date at once.
 
-            if (count == CASH5_PICKED_COUNT):
-                if (x["prize_5"] == "Rollover"):
-                    prize = propagate_win(n, cash5_df)
-                else:
-                    prize = float(x["prize_5"]) * x["winners_5"]
-                    x["winners_5"] += 1
-                    prize /= x["winners_5"]
-            else:
-                prize = CASH5_PRIZE_DICT[count]
+    The match counts of each block of tickets upon every drawing are computed once,
+    as a (tickets × drawings) matrix, and mapped to prizes; the cumulative sums
+    thereof, along the drawings, yield the winnings from every start date by
+    difference. Duplicate tickets are back-tested once.
 
-            x = x.append(
-                pd.Series({"count": count,
-                           "prize": prize}))
+    Args:
+        tickets (Sequence[str]): the tickets, e.g. ["1, 2, 3, 4, 5", ...].
+        cash5_df (pd.DataFrame): joined Cash 5 data, as per 'join_cash5csv'.
+        dates (Sequence[str]): start dates, e.g. ["10/08/2007", ...], as per 'back_test'.
+        ticket_block (int, optional): tickets whose matrix is held at once.
+        rollovers (RolloverIndex, optional): as per 'build_rollover_index'.
 
-            winnings.append(x)
+    Returns:
+        np.ndarray: (tickets × dates) float64 winnings, each as the total 'prize' of
+        'back_test(ticket, cash5_df, date)'. Each
+        ticket's cost, a dollar per drawing played, is len(cash5_df) less the
+        date's 'date_positions'.
+    """
+    ticket_bits = BitSet.from_strings(tickets,
+                                      max_num=CASH5_FIELD_COUNT + 1,
+                                      bit_length=MAX_BITS,
+                                      delim=" ,").words[:, 0]
+    unique_bits, inverse = np.unique(ticket_bits, return_inverse=True)
 
-    winnings_df = pd.DataFrame(winnings)
-    return winnings_df
+    positions = date_positions(cash5_df, dates)
+    draw_bits = cash5_df["bits"].fillna(0).to_numpy(dtype=np.uint64)
+    if (rollovers is None):
+        rollovers = build_rollover_index(cash5_df)
+    winners_5 = cash5_df["winners_5"].fillna(0).to_numpy(dtype=np.float64)
+
+    winnings = np.empty((len(unique_bits), len(positions)), dtype=np.float64)
+
+    for t0 in range(0, len(unique_bits), ticket_block):
+        block_bits = unique_bits[t0:t0 + ticket_block]
+
+        counts = popcount64(block_bits[:, None] & draw_bits[None, :])
+        prizes = np.where(counts == CASH5_PICKED_COUNT,
+                          rollovers.prize[None, :],
+                          CASH5_PRIZES[counts])
+
+        # The repricing of a segment's end is counted from the start dates at, or
+        # before, the rollover win whereby it is repriced.
+        rollover_jackpots = counts[:, rollovers.rollover] == CASH5_PICKED_COUNT
+        for t in np.flatnonzero(rollover_jackpots.any(axis=1)):
+            won, _, deltas = segment_end_repricing(
+                rollovers, winners_5, np.flatnonzero(counts[t] == CASH5_PICKED_COUNT))
+            prizes[t, won] += deltas
+
+        # cumulative[:, p] is the total of the drawings before position p.
+        cumulative = np.zeros((len(block_bits), len(draw_bits) + 1), dtype=np.float64)
+        np.cumsum(prizes, axis=1, out=cumulative[:, 1:])
+
+        winnings[t0:t0 + ticket_block] = cumulative[:, -1:] - cumulative[:, positions]
 
+    return winnings[inverse.reshape(-1)]
 
-cash5_path = "cash345/data/cash5_winnings_1.csv"
 
-cash5_df = pd.read_csv(cash5_path)
+if __name__ == "__main__":
+    cash5_path = "cash345/data/cash5_winnings_1.csv"
 
+    cash5_df = pd.read_csv(cash5_path)
+    rollovers = build_rollover_index(cash5_df)
 
-nums = "1, 2, 3, 4, 5"
-date = "10/08/2007"
+    nums = "1, 2, 3, 4, 5"
+    date = "10/08/2007"
 
-winnings = back_test(nums, cash5_df, date)
-winnings.to_csv("cash345/data/tmp.csv")
+    winnings = back_test(nums, cash5_df, date, rollovers)
+    winnings.to_csv("cash345/data/tmp.csv")
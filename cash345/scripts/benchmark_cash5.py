@@ -0,0 +1,93 @@
+import argparse
+import tempfile
+from typing import *
+
+import pandas as pd
+
+from back_test import back_test
+from lottery_analysis.benchmark import Benchmark
+from lottery_analysis.synthetic import CASH5_START, write_cash5
+from process_cash5 import process_cash_n
+
+"""
+Benchmark of the Cash 5 pipeline upon synthetic data (see 'lottery_analysis.synthetic'):
+'process_cash_n' upon NCELCash5.csv, and thereafter 'back_test' upon its join
+with cash5_scraped.csv (as per 'join_cash5csv').
+
+    python benchmark_cash5.py --draws 5000 --save-baseline cash5_baseline.json
+    python benchmark_cash5.py --draws 5000 --baseline cash5_baseline.json
+
+When compared against a baseline, the script exits with 1 should any stage regress.
+"""
+
+
+def run_benchmark(ncel_path: str,
+                  scraped_path: str,
+                  benchmark: Benchmark,
+                  nums: str,
+                  date: str) -> None:
+    ncel_df = pd.read_csv(ncel_path)
+    scraped_df = pd.read_csv(scraped_path)
+
+    cash5_df = benchmark.run("process_cash_n", process_cash_n, ncel_df)
+
+    joined_df = scraped_df\
+        .merge(cash5_df,
+               left_on="date",
+               right_on="Date",
+               how="left")\
+        .drop("Date", axis=1)
+
+    # 'back_test' iterates over every drawing from 'date' onward.
+    rows = len(joined_df) - (joined_df["date"] == date).argmax()
+
+    benchmark.run("back_test", back_test, nums, joined_df, date, rows=rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--dirpath",
+                        default=None,
+                        help="Directory of the synthetic data; defaults to a temporary directory.")
+    parser.add_argument("--draws", type=int, default=5000)
+    parser.add_argument("--tickets-per-draw", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--nums", default="1, 2, 3, 4, 5")
+    parser.add_argument("--no-memory",
+                        action="store_true",
+                        help="Do not trace peak memory, which slows object-heavy stages.")
+    parser.add_argument("--save-baseline", help="Path whereto the results are saved.")
+    parser.add_argument("--baseline", help="Path of a baseline to compare against.")
+    parser.add_argument("--tolerance",
+                        type=float,
+                        default=0.2,
+                        help="Fraction by which a stage may exceed its baseline.")
+
+    args = parser.parse_args()
+
+    dirpath = args.dirpath or tempfile.mkdtemp(prefix="cash5_benchmark_")
+    params = {"draws": args.draws,
+              "tickets_per_draw": args.tickets_per_draw,
+              "seed": args.seed,
+              "nums": args.nums}
+
+    print(f"Generating {args.draws} drawings within {dirpath}.")
+    ncel_path, scraped_path = write_cash5(dirpath,
+                                          draws=args.draws,
+                                          tickets_per_draw=args.tickets_per_draw,
+                                          seed=args.seed)
+
+    benchmark = Benchmark("cash5", params, trace_memory=not args.no_memory)
+    run_benchmark(ncel_path, scraped_path, benchmark, args.nums, CASH5_START)
+    benchmark.report()
+
+    if (args.save_baseline is not None):
+        benchmark.save(args.save_baseline)
+
+    if (args.baseline is not None and benchmark.compare(args.baseline, args.tolerance)):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,7 @@
-import datetime
-import math
-import os
 from typing import Any, Callable, Dict, List, Optional, Union
-import textwrap
-import pandas as pd
-import string
+
+from lottery_analysis.bitset import (BitSet, nums_to_bits, bits_to_nums,
+                                     popcount64d)
 
 
 '''
@@ -18,6 +15,9 @@ e.g.: [0, 1, 0, 1, 0, ...].
 
 When 'int array' is used, this refers to the integer array representation of a bit array
 of length N, wherein the integer array's length is M = ~~(N / MAX_BITS) + 1.
+
+The bit and int array conversions themselves are shared with keno, and live within
+lottery_analysis.bitset; they're re-exported here for convenience.
 '''
 
 
@@ -157,93 +157,12 @@ def max_uniform_split(N: int,
     return group
 
 
-def nums_to_bits(nums: str,
-                 bit_length: int,
-                 max_num: int,
-                 delim: str = None,
-                 num_length: int = None) -> List[int]:
-    '''
-    Converts a given number or sequence of numbers into N bit_length integers,
-    where N = ceil(len(nums) / bit_length).
-
-    The process wherewith the conversion takes place is simple: if a
-    number is located within 'nums', set that numbers' bit
-    (located at [N - floor(num/bit_length) + 1][num % bit_length])
-    to 1, else 0.
-
-    @param nums: string of numbers deliminated by either 'delim' or 'num_length'
-    @param max_num: maximum number availed for use within 'nums'
-    @param bit_length: the interval therewith the integers are sized.
-    @param delim: delimiter used for 'nums'
-    @param num_length: if no delimiter is provided, split 'nums' at every 'num_length' interval.
-
-    @returns bits: array of bit flags masquerading as integers.
-    '''
-    arr = nums.split(delim)\
-        if delim is not None\
-        else textwrap.wrap(nums, num_length or -1)
-
-    N = math.ceil(max_num / bit_length)
-    bits = [0] * N
-
-    for i in arr:
-        n = int(i)
-        ix = n // bit_length
-        bits[ix] |= 1 << (n % bit_length)
-    return bits
-
-
-def bits_to_nums(bits: List[int],
-                 bit_length: int,
-                 delim: str = None,
-                 num_length: int = None) -> str:
-    '''
-    Converts an array of integers (therein an array of bit flags), into a
-    sequence of numbers delimited by 'delim' or separated by 'num_length'.
-
-    The function simply bit shifts each number therein 'bits' by 1 until a subsequent AND
-    with 1 results in a non-zero value.
-
-    @param bits: array of bit flags masquerading as integers.
-    @param delim: delimiter used for 'nums'
-    @param bit_length: the interval therewith the integers are sized.
-    @param num_length: if no delimiter is provided, split 'nums' at every 'num_length' interval.
-
-    @param return: string of numbers delimited by either 'delim' or 'num_length'
-    '''
-    nums = ""
-    for n, i in enumerate(bits):
-        num = n * bit_length
-        while (i != 0):
-            if (i & 1 != 0):
-                nums += f"{num}" if delim is None else f"{num}{delim}"
-            num += 1
-            i >>= 1
-    return nums if delim is None else nums[:-len(delim)]
-
-
-def popcount64d(num: int):
-    '''
-    Computes the Hamming Weight of a given binary number.
-    See https://en.wikipedia.org/wiki/Hamming_weight for more information.
-
-    @param num: input integer for which the Hamming Weight is computed.
-
-    @returns i: the corresponding Hamming Weight of num.
-    '''
-    i = 0
-    while (i < num):
-        num &= num - 1
-        i += 1
-    return i
-
-
 def example1():
     spots = "1,2,3,4,5,6,7,8,9,10,11,12,80,60,63"
     drawings = "1,2,3,4,12,13,14,15,20,30,40,50,60,70,80"
 
-    b1 = nums_to_bits_small(spots, 64, 80, ",")
-    b2 = nums_to_bits_small(drawings, 64, 80, ",")
+    b1 = nums_to_bits(spots, 64, 81, ",")
+    b2 = nums_to_bits(drawings, 64, 81, ",")
     t = list(map(lambda x: x[0] & x[1], zip(b1, b2)))
     print(b1)
     print(b2)
@@ -264,4 +183,7 @@ def example1():
     print(len(bs1))
     print(len(bs2))
     print(len(bs3))
-    print(bits_to_nums_small(b1, 64, ","))
+    print(bits_to_nums(b1, 64, ","))
+
+    bs = BitSet.from_strings([spots, drawings], max_num=81, delim=",")
+    print(bs.popcount(), (bs[0] & bs[1]).popcount())
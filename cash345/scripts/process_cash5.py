@@ -1,11 +1,12 @@
 import datetime
-import math
 import os
-from typing import Any, Callable, Dict, List, Optional, Union, Tuple
+from typing import Callable, Dict, List, Optional, Union, Tuple
 import csv
+import re
+import numpy as np
 import pandas as pd
+from dateutil.tz import tzlocal
 from utils import choose, file_components
-from bit_manipulations import nums_to_bits, bits_to_nums, popcount64d
 
 
 CASH5_FIELD_COUNT = 43
@@ -14,6 +15,8 @@ CASH5_PRIZE = 100000.0
 
 MAX_BITS = 63
 
+RE_NUMBER_COLUMN = re.compile(r"^Number \d+$")
+
 CASH5_ODDS_DICT = {CASH5_PICKED_COUNT - i:
                    choose(CASH5_PICKED_COUNT, CASH5_PICKED_COUNT - i) *
                    choose(CASH5_FIELD_COUNT - CASH5_PICKED_COUNT, i)
@@ -21,12 +24,26 @@ CASH5_ODDS_DICT = {CASH5_PICKED_COUNT - i:
                    for i in range(CASH5_PICKED_COUNT + 1)}
 
 
+def number_columns(cash_df: pd.DataFrame) -> List[str]:
+    """The "Number i" columns of a cash_n frame, in order of i."""
+    return sorted(filter(lambda x: RE_NUMBER_COLUMN.match(x), cash_df.columns),
+                  key=lambda x: int(x.split(" ")[1]))
+
+
 def detect_cash_type(cash_df: pd.DataFrame) -> int:
-    return int(
-        max(
-            filter(lambda x: x.find("Number") != -1, cash5_df.columns)
-        ).split(" ")[1]
-    )
+    """The game of a cash_n frame, e.g. 5 for Cash 5: the count of its number columns."""
+    return len(number_columns(cash_df))
+
+
+def local_epochs(dates: pd.Series) -> np.ndarray:
+    """Epoch seconds of local midnight upon each of the (naive) dates, as per strftime("%s")."""
+    # The local offset is resolved per date, slowly, hence only upon the unique dates.
+    unique_dates, inverse = np.unique(dates.to_numpy(dtype="datetime64[ns]"),
+                                      return_inverse=True)
+    local_dates = pd.DatetimeIndex(unique_dates)\
+        .tz_localize(tzlocal(), ambiguous="raise", nonexistent="raise")
+
+    return (local_dates.asi8 // 10**9)[inverse.reshape(-1)]
 
 
 def process_cash_n(cash_df: pd.DataFrame) -> pd.DataFrame:
@@ -38,48 +55,38 @@ def process_cash_n(cash_df: pd.DataFrame) -> pd.DataFrame:
     This adds the necessary bit fields and date components to calculate the total number of winners,
     numbers matched, and so forth.
 
+    Each column is computed at once over the whole frame: the bits by OR-ing the shifted
+    ones of each number column, the date components by parsing the 'Date' column.
 
     Args:
-        cash_df (pd.DataFrame): input dataframe.
+        cash_df (pd.DataFrame): input dataframe; its game is inferred from its number
+            columns (see 'detect_cash_type').
 
     Returns:
         pd.DataFrame: cash_n df with added bit fields.
     """
-    cash_type = detect_cash_type(cash_df)
+    columns = number_columns(cash_df)
 
-    if (cash_type == 5):
+    if (len(columns) == 5):
         max_num = CASH5_FIELD_COUNT
     else:
         max_num = 9
 
-    def to_int_str(x):
-        return str(int(x))
-
-    def process_row(row: pd.Series):
-
-        nums = ",".join(
-            map(to_int_str, [row[f"Number {i}"]
-                             for i in range(1, cash_type + 1)])
-        )
-
-        bits = nums_to_bits(nums=nums,
-                            bit_length=MAX_BITS,
-                            max_num=max_num + 1,
-                            delim=",")
-
-        date = datetime.datetime.strptime(row["Date"], "%m/%d/%Y")
+    numbers = cash_df[columns].to_numpy(dtype=np.int64)
+    if (((numbers < 0) | (numbers > max_num)).any()):
+        raise ValueError(f"Numbers must lie within [0, {max_num}].")
 
-        out_dict = {"epoch": int(date.strftime("%s")),
-                    "day": date.day,
-                    "weekday": date.weekday(),
-                    "month": date.month,
-                    "year": date.year,
-                    "bits": bits[0]}
+    bits = np.bitwise_or.reduce(np.left_shift(1, numbers), axis=1)
 
-        row = row.append(pd.Series(out_dict))
-        return row
+    dates = pd.to_datetime(cash_df["Date"], format="%m/%d/%Y")
 
-    cash_df = cash_df.apply(process_row, 1)
+    cash_df = cash_df.copy()
+    cash_df["epoch"] = local_epochs(dates)
+    cash_df["day"] = dates.dt.day
+    cash_df["weekday"] = dates.dt.weekday
+    cash_df["month"] = dates.dt.month
+    cash_df["year"] = dates.dt.year
+    cash_df["bits"] = bits
 
     return cash_df
 
@@ -114,15 +121,16 @@ def calc_tickets(cash_df: pd.DataFrame) -> pd.DataFrame:
     return cash_df
 
 
-# Be sure to process the original csv into a usable format.
-# cash5_df = pd.read_csv("cash345/data/cash5_winnings.csv")
-# t = detect_cash_type(cash5_df)
-# print(t)
+if __name__ == "__main__":
+    # Be sure to process the original csv into a usable format.
+    # cash5_df = pd.read_csv("cash345/data/cash5_winnings.csv")
+    # t = detect_cash_type(cash5_df)
+    # print(t)
 
-filepath = "cash345/data/NCELCash5.csv"
-dirpath, filename, ext = file_components(filepath)
-out_path = os.path.join(dirpath, filename + "_bits" + ext)
+    filepath = "cash345/data/NCELCash5.csv"
+    dirpath, filename, ext = file_components(filepath)
+    out_path = os.path.join(dirpath, filename + "_bits" + ext)
 
-cash5_df = pd.read_csv(filepath)
-cash5_df = process_cash_n(cash5_df)
-cash5_df.to_csv(out_path, index=False)
+    cash5_df = pd.read_csv(filepath)
+    cash5_df = process_cash_n(cash5_df)
+    cash5_df.to_csv(out_path, index=False)
@@ -1,6 +1,13 @@
+import argparse
+import asyncio
+import concurrent.futures
+import csv
 import datetime
+import http.client
+import os
+import random
 import time
-import urllib.request
+import urllib.parse
 
 import pandas as pd
 from lxml import etree
@@ -8,12 +15,29 @@ from lxml import etree
 from utils import dollar_to_float
 
 from typing import *
-from utils import file_components
 
-CALLS_PER_SECOND = 0.1
+"""
+Scrapes the prizes and winners of each Cash 5 drawing from nclottery.com, a page per day.
+
+The pages are fetched concurrently, by at most 'concurrency' requests in flight, over
+as many keep-alive connections, and at most 'rate' requests per second (a token bucket
+of 'burst' tokens). Failed requests are retried with an exponential backoff.
+
+Rows are appended to the output CSV as they complete, in date order, so an interrupted
+run loses at most those in flight; a rerun resumes from the day after the last date
+written. 'base_url' may point at a local stand-in server (see
+'lottery_analysis.synthetic.serve_cash5_pages').
+
+    python scrape_cash5.py --out cash345/data/cash5_scraped.csv --rate 10 --concurrency 4
+"""
+
+# Requests per second.
+REQUESTS_PER_SECOND = 10.0
 
 CASH5_START = datetime.datetime.strptime("10/27/2006", "%m/%d/%Y")
 
+BASE_URL = "https://nclottery.com/Cash5"
+
 
 PATHS = {"prize_5": '//*[@id="ctl00_MainContent_lblCash5Match5Prize"]',
          "prize_4": '//*[@id="ctl00_MainContent_lblCash5Match4Prize"]',
@@ -25,56 +49,283 @@ PATHS = {"prize_5": '//*[@id="ctl00_MainContent_lblCash5Match5Prize"]',
 
          "jackpot": '//*[@id="ctl00_MainContent_lblCash5TopPrize"]'}
 
+COLUMNS = sorted(["date", *PATHS.keys()])
+
 HEADER = {'User-Agent': 'Lottery Research 0.9.0'}
 
 
-def query_nclotto(date_string):
-    url = f"https://nclottery.com/Cash5?dd={date_string}"
-    req = urllib.request.Request(url, headers=HEADER)
-    response = urllib.request.urlopen(req)
-    data = response.read().decode('utf-8')
+class HTTPStatusError(Exception):
+    def __init__(self, status: int, url: str):
+        super().__init__(f"HTTP {status}: {url}")
+        self.status = status
+
+    @property
+    def retryable(self) -> bool:
+        return self.status == 429 or self.status >= 500
+
+
+def parse_cash5(cash5_html, date_string: str) -> Dict[str, str]:
+    """Extracts a row of the output from a drawing's page; a missing field is left empty."""
+    row = {"date": date_string}
+
+    for key, path in PATHS.items():
+        nodes = cash5_html.xpath(path) if (cash5_html is not None) else []
+
+        if (len(nodes) == 0 or nodes[0].text is None):
+            print(f"{date_string}: {key} not found.")
+            row[key] = ""
+            continue
+
+        value = nodes[0].text
+        dollars = dollar_to_float(value)
+        row[key] = str(dollars) if (dollars is not None) else value
+
+    return row
+
+
+class TokenBucket:
+    """Limits the rate of requests to 'rate' per second, in bursts of at most 'capacity'."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while (True):
+                now = time.monotonic()
+                self.tokens = min(self.capacity,
+                                  self.tokens + (now - self.last) * self.rate)
+                self.last = now
+
+                if (self.tokens >= 1):
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections to the host of 'base_url', each used by one request
+    at a time. Requests are blocking, hence run upon 'executor'.
+    """
+
+    def __init__(self,
+                 base_url: str,
+                 size: int,
+                 executor: concurrent.futures.Executor,
+                 timeout: float = 30.0):
+        url = urllib.parse.urlsplit(base_url)
+        connection_type = http.client.HTTPSConnection \
+            if (url.scheme == "https") else http.client.HTTPConnection
+
+        self.path = url.path or "/"
+        self.executor = executor
+        self.connections: asyncio.Queue = asyncio.Queue()
+        for _ in range(size):
+            self.connections.put_nowait(connection_type(url.netloc, timeout=timeout))
+
+    @staticmethod
+    def _get(connection: http.client.HTTPConnection, path: str) -> str:
+        try:
+            connection.request("GET", path, headers=HEADER)
+            response = connection.getresponse()
+            data = response.read()
+        except Exception:
+            # Reconnects upon the next request.
+            connection.close()
+            raise
+
+        if (response.status != 200):
+            raise HTTPStatusError(response.status, path)
+
+        return data.decode("utf-8")
+
+    async def get(self, query: str) -> str:
+        connection = await self.connections.get()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._get, connection, f"{self.path}?{query}")
+        finally:
+            self.connections.put_nowait(connection)
+
+    def close(self) -> None:
+        while (not self.connections.empty()):
+            self.connections.get_nowait().close()
+
+
+async def fetch_cash5(pool: ConnectionPool,
+                      bucket: TokenBucket,
+                      date_string: str,
+                      retries: int = 5,
+                      backoff: float = 1.0) -> Dict[str, str]:
+    """Fetches, and parses, the page of a drawing, retrying upon connection errors,
+    429s and 5xxs after backoff * 2^attempt seconds (jittered).
+    """
+    for attempt in range(retries + 1):
+        await bucket.acquire()
+        try:
+            data = await pool.get(f"dd={date_string}")
+            return parse_cash5(etree.HTML(data), date_string)
+        except (OSError, http.client.HTTPException, HTTPStatusError) as e:
+            if (attempt == retries or
+                    (isinstance(e, HTTPStatusError) and not e.retryable)):
+                raise
+            delay = backoff * 2**attempt * (0.5 + random.random())
+            print(f"{date_string}: {e!r}; retrying in {delay:.1f}s.")
+            await asyncio.sleep(delay)
 
-    return etree.HTML(data)
+
+def last_scraped_date(out_path: str) -> Optional[datetime.datetime]:
+    """The last date written to 'out_path', if any.
+
+    A trailing, partially written row (of an interrupted run) is truncated away.
+    """
+    if (not os.path.exists(out_path)):
+        return None
+
+    with open(out_path, "rb+") as file:
+        data = file.read()
+        if (not data.endswith(b"\n")):
+            file.truncate(data.rfind(b"\n") + 1)
+
+    with open(out_path, newline="") as file:
+        rows = list(csv.reader(file))
+
+    if (len(rows) == 0):
+        return None
+    elif (rows[0] != COLUMNS):
+        raise ValueError(f"{out_path} has columns {rows[0]}; expected {COLUMNS}.")
+    elif (len(rows) == 1):
+        return None
+
+    return datetime.datetime.strptime(rows[-1][COLUMNS.index("date")], "%m/%d/%Y")
+
+
+async def scrape_cash5_async(out_path: str,
+                             start_date: datetime.datetime,
+                             end_date: datetime.datetime,
+                             base_url: str = BASE_URL,
+                             rate: float = REQUESTS_PER_SECOND,
+                             burst: float = 1.0,
+                             concurrency: int = 4,
+                             retries: int = 5,
+                             backoff: float = 1.0) -> int:
+    """Scrapes each day within [start_date, end_date) into 'out_path', resuming after its
+    last date written.
+
+    Args:
+        rate (float): requests per second.
+        burst (float): requests that may be made at once, after a lull.
+        concurrency (int): requests in flight, and connections kept alive.
+        retries (int): attempts after the first, per day, ere the run is aborted.
+
+    Returns:
+        int: the number of rows appended.
+    """
+    last_date = last_scraped_date(out_path)
+    if (last_date is not None):
+        start_date = max(start_date, last_date + datetime.timedelta(1))
+
+    dates = [(start_date + datetime.timedelta(i)).strftime("%m/%d/%Y")
+             for i in range(max((end_date - start_date).days, 0))]
+
+    # Rows completed out of order wait here until those before them are written; the
+    # number of rows fetched ahead of the first pending one is thereby bounded.
+    pending: Dict[int, Dict[str, str]] = {}
+    written = 0
+    max_ahead = 8 * concurrency
+    window = asyncio.Condition()
+    indices = iter(range(len(dates)))
+
+    bucket = TokenBucket(rate, burst)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+    pool = ConnectionPool(base_url, concurrency, executor)
+
+    write_header = not os.path.exists(out_path) or os.path.getsize(out_path) == 0
+
+    with open(out_path, "a", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=COLUMNS)
+        if (write_header):
+            writer.writeheader()
+            file.flush()
+
+        async def worker():
+            nonlocal written
+
+            for ix in indices:
+                async with window:
+                    await window.wait_for(lambda: ix - written < max_ahead)
+
+                pending[ix] = await fetch_cash5(pool, bucket, dates[ix], retries, backoff)
+
+                while (written in pending):
+                    writer.writerow(pending.pop(written))
+                    written += 1
+                file.flush()
+
+                async with window:
+                    window.notify_all()
+
+        tasks = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            executor.shutdown(wait=True)
+            pool.close()
+
+    return written
 
 
 def scrape_cash5(out_path: str,
-                 start_date: datetime.time,
-                 end_date: datetime.time):
-    total_days = (end_date - start_date).days
-    data_dict = {key: [] for key in PATHS.keys()}
-    data_dict["date"] = []
-
-    for n, date in enumerate((start_date + datetime.timedelta(i)
-                              for i in range(total_days))):
-        date_string = date.strftime("%m/%d/%Y")
-        cash5_html = query_nclotto(date_string)
-        data_dict["date"].append(date_string)
-
-        for key, path in PATHS.items():
-            try:
-                node = cash5_html.xpath(path)[0]
-                value = node.text
-
-                dollars = dollar_to_float(value)
-                if (dollars is not None):
-                    data_dict[key].append(str(dollars))
-                else:
-                    data_dict[key].append(value)
-            except Exception as e:
-                print(e)
-
-        time.sleep(CALLS_PER_SECOND)
-
-    df = pd.DataFrame(data_dict)
-    df = df.reindex(list(sorted(df.columns)),
-                    axis=1)
-    df.to_csv(out_path, index=False)
-    return df
-
-
-start_date = datetime.datetime.strptime("11/27/2019", "%m/%d/%Y")
-end_date = datetime.datetime.now()
-
-out_path = f"cash345/data/cash5_scraped.csv"
-
-df = scrape_cash5(out_path, start_date, end_date)
+                 start_date: datetime.datetime,
+                 end_date: datetime.datetime,
+                 **kwargs) -> pd.DataFrame:
+    """Scrapes into 'out_path', as per 'scrape_cash5_async', and reads it back in full."""
+    asyncio.run(scrape_cash5_async(out_path, start_date, end_date, **kwargs))
+    return pd.read_csv(out_path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--out", default="cash345/data/cash5_scraped.csv")
+    parser.add_argument("--start",
+                        default=CASH5_START.strftime("%m/%d/%Y"),
+                        help="First date, e.g. 10/27/2006; or the day after the last written.")
+    parser.add_argument("--end", help="Date whereat to end, exclusively; defaults to today.")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND)
+    parser.add_argument("--burst", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--backoff", type=float, default=1.0)
+
+    args = parser.parse_args()
+
+    start_date = datetime.datetime.strptime(args.start, "%m/%d/%Y")
+    end_date = datetime.datetime.strptime(args.end, "%m/%d/%Y") \
+        if (args.end is not None) else datetime.datetime.now()
+
+    written = asyncio.run(scrape_cash5_async(args.out,
+                                             start_date,
+                                             end_date,
+                                             base_url=args.base_url,
+                                             rate=args.rate,
+                                             burst=args.burst,
+                                             concurrency=args.concurrency,
+                                             retries=args.retries,
+                                             backoff=args.backoff))
+    print(f"Appended {written} rows to {args.out}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import argparse
+import itertools
+import os
+from math import comb
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union, Tuple
+import numpy as np
+import pandas as pd
+from back_test import CASH5_FIELD_COUNT, CASH5_PICKED_COUNT, CASH5_PRIZES, MAX_BITS, \
+    build_rollover_index
+from lottery_analysis.bitset import BitSet
+from lottery_analysis.combinations import inclusion_exclusion_matrix, rank_combinations, \
+    subset_sums, unrank_combinations
+
+"""
+Subset-count index over the Cash 5 drawings, whence the match histogram of every one
+of the C(43, 5) = 962,598 tickets follows without back-testing any.
+
+The index counts how often each single number, pair, triple, quad and quint was drawn,
+by iterating the C(5, k) subsets of each drawing; each table is indexed by the
+colexicographic rank of its combinations (see 'lottery_analysis.combinations'). The
+number of drawings whereupon a ticket matched exactly j numbers then follows by
+inclusion-exclusion over the counts of its subsets.
+
+The tables are stored as .npy files, of the narrowest unsigned type holding the number
+of drawings (~2MB in all), and memory-mapped upon loading.
+
+    python subset_index.py --data cash345/data/joined.csv --index cash345/data/subset_index --out ranked.csv
+"""
+
+CASH5_COMBINATIONS = comb(CASH5_FIELD_COUNT, CASH5_PICKED_COUNT)
+
+
+def draw_combinations(cash5_df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Decodes the 'bits' column into each drawing's combination.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (D, 5) array of the 0-based numbers of the
+        valid drawings, and a boolean array flagging them: those of five numbers.
+    """
+    words = cash5_df["bits"].fillna(0).to_numpy(dtype=np.uint64)[:, None]
+    membership = BitSet(words, CASH5_FIELD_COUNT + 1, MAX_BITS).membership()[:, 1:]
+
+    valid = membership.sum(axis=1) == CASH5_PICKED_COUNT
+    numbers = np.nonzero(membership[valid])[1].reshape(-1, CASH5_PICKED_COUNT)
+
+    return numbers, valid
+
+
+def format_combinations(combos: np.ndarray) -> List[str]:
+    """Formats 0-based combinations as tickets, e.g. "1, 2, 3, 4, 5"."""
+    return BitSet.from_numbers(combos + 1, CASH5_FIELD_COUNT + 1, MAX_BITS)\
+        .to_strings(delim=", ")
+
+
+class SubsetIndex:
+    """Counts of every k-combination of the drawings, for k of 1 through 5.
+
+    Args:
+        counts (List[np.ndarray]): counts[k - 1], of every k-combination, by rank.
+        draws (np.ndarray): rank of each drawing's combination, in order; -1 for
+            those invalid, as per 'draw_combinations'.
+    """
+
+    def __init__(self, counts: List[np.ndarray], draws: np.ndarray):
+        self.counts = counts
+        self.draws = draws
+
+    @property
+    def n_draws(self) -> int:
+        return int((self.draws >= 0).sum())
+
+    @classmethod
+    def build(cls, cash5_df: pd.DataFrame) -> "SubsetIndex":
+        combos, valid = draw_combinations(cash5_df)
+        dtype = np.min_scalar_type(max(len(combos), 1))
+
+        counts = []
+        for k in range(1, CASH5_PICKED_COUNT + 1):
+            ranks = np.concatenate([
+                rank_combinations(combos[:, list(positions)], CASH5_FIELD_COUNT)
+                for positions in itertools.combinations(range(CASH5_PICKED_COUNT), k)])
+
+            counts.append(np.bincount(ranks, minlength=comb(CASH5_FIELD_COUNT, k))
+                          .astype(dtype))
+
+        draws = np.full(len(cash5_df), -1, dtype=np.int32)
+        draws[valid] = rank_combinations(combos, CASH5_FIELD_COUNT)
+
+        return cls(counts, draws)
+
+    def save(self, dirpath: str) -> None:
+        """Saves the index within 'dirpath', each file atomically."""
+        os.makedirs(dirpath, exist_ok=True)
+
+        arrays = {f"counts_{k}.npy": counts
+                  for k, counts in enumerate(self.counts, 1)}
+        arrays["draws.npy"] = self.draws
+
+        for filename, arr in arrays.items():
+            path = os.path.join(dirpath, filename)
+            with open(path + ".tmp", "wb") as file:
+                np.save(file, arr)
+            os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, dirpath: str) -> "SubsetIndex":
+        """Loads, memory-mapped, an index saved within 'dirpath'."""
+        counts = [np.load(os.path.join(dirpath, f"counts_{k}.npy"), mmap_mode="r")
+                  for k in range(1, CASH5_PICKED_COUNT + 1)]
+        draws = np.load(os.path.join(dirpath, "draws.npy"), mmap_mode="r")
+
+        return cls(counts, draws)
+
+    def histograms(self, ids: np.ndarray) -> np.ndarray:
+        """Match histograms of the tickets of the given ranked combination ids.
+
+        Returns:
+            np.ndarray: (len(ids), 6) int64 array: the number of drawings whereupon
+            each ticket matched 0 through 5 numbers.
+        """
+        combos = unrank_combinations(ids, CASH5_PICKED_COUNT, CASH5_FIELD_COUNT)
+
+        # P_i: the counts summed over each ticket's subsets of i numbers.
+        sums = np.empty((len(combos), CASH5_PICKED_COUNT + 1), dtype=np.int64)
+        sums[:, 0] = self.n_draws
+        for i in range(1, CASH5_PICKED_COUNT + 1):
+            sums[:, i] = subset_sums(combos, self.counts[i - 1], i, CASH5_FIELD_COUNT)
+
+        return sums @ inclusion_exclusion_matrix(CASH5_PICKED_COUNT).T
+
+    def winnings(self,
+                 ids: np.ndarray,
+                 jackpots: Optional[np.ndarray] = None,
+                 histograms: Optional[np.ndarray] = None) -> np.ndarray:
+        """Winnings of each ticket, as though played upon every valid drawing.
+
+        Args:
+            ids (np.ndarray): ranked combination ids.
+            jackpots (np.ndarray, optional): the prize of a five-number match upon
+                each drawing of the indexed frame, e.g. 'RolloverIndex.prize';
+                defaults to CASH5_PRIZES[5].
+            histograms (np.ndarray, optional): those of 'ids', if already at hand.
+
+        Returns:
+            np.ndarray: float64 winnings.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if (histograms is None):
+            histograms = self.histograms(ids)
+        winnings = histograms[:, :CASH5_PICKED_COUNT] @ CASH5_PRIZES[:CASH5_PICKED_COUNT]
+
+        if (jackpots is None):
+            return winnings + histograms[:, CASH5_PICKED_COUNT] * CASH5_PRIZES[-1]
+
+        # The five-number matches of a ticket are the drawings of its very combination.
+        valid = self.draws >= 0
+        jackpot_winnings = np.bincount(self.draws[valid],
+                                       weights=np.asarray(jackpots)[valid],
+                                       minlength=CASH5_COMBINATIONS)
+
+        return winnings + jackpot_winnings[ids]
+
+
+def rank_returns(index: SubsetIndex,
+                 jackpots: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """Ranks every Cash 5 ticket by its back-tested return, best first.
+
+    Returns:
+        pd.DataFrame: per ticket, its 'id', 'ticket', match histogram ('matched_0'
+        through 'matched_5'), 'winnings', and 'net' of a dollar per drawing.
+    """
+    ids = np.arange(CASH5_COMBINATIONS)
+    histograms = index.histograms(ids)
+    winnings = index.winnings(ids, jackpots, histograms)
+
+    order = np.argsort(-winnings, kind="stable")
+
+    ranked_df = pd.DataFrame(
+        histograms[order],
+        columns=[f"matched_{j}" for j in range(CASH5_PICKED_COUNT + 1)])
+    ranked_df.insert(0, "id", ids[order])
+    ranked_df.insert(1, "ticket", format_combinations(
+        unrank_combinations(ids[order], CASH5_PICKED_COUNT, CASH5_FIELD_COUNT)))
+    ranked_df["winnings"] = winnings[order]
+    ranked_df["net"] = winnings[order] - index.n_draws
+
+    return ranked_df
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--data",
+                        required=True,
+                        help="NCELCash5_bits.csv, or its join with the scraped prizes.")
+    parser.add_argument("--index", required=True, help="Directory of the index.")
+    parser.add_argument("--out", help="Path whereto the ranked tickets are written.")
+
+    args = parser.parse_args()
+
+    cash5_df = pd.read_csv(args.data)
+
+    index = SubsetIndex.build(cash5_df)
+    index.save(args.index)
+    print(f"Indexed {index.n_draws} drawings within {args.index}.")
+
+    if (args.out is not None):
+        # Jackpots as won, or rolled over, where the prizes are at hand.
+        jackpots = build_rollover_index(cash5_df).prize \
+            if ("prize_5" in cash5_df.columns) else None
+
+        rank_returns(SubsetIndex.load(args.index), jackpots)\
+            .to_csv(args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import argparse
+import os
+from typing import *
+
+import numpy as np
+import pandas as pd
+
+from keno import MAX_NUMBERS, PRIZE_MATRIX, get_bit_columns, get_bit_info
+from lottery_analysis.bitset import BitSet
+
+"""
+Batched back-testing of keno tickets: what if each of a set of candidate tickets had
+been played upon every drawing (or every n-th, as per the cadence) of a date range?
+
+Tickets and drawings are laid out as (tickets × 80) and (80 × draws) membership
+matrices, whose product is the match count of every ticket upon every drawing. The
+product is taken in blocks of 'ticket_block' × 'draw_block', and each block reduced
+at once into a histogram of the match counts of each ticket within each period
+(e.g.: day): the hit distributions, winnings and, thereby, the net winnings and
+drawdown curves all follow therefrom, by way of PRIZE_MATRIX. Only one block, and
+the per-period results, are held in memory at once.
+"""
+
+# Columns of PRIZE_MATRIX: the numbers matched, 0 through 10.
+MATCHED = PRIZE_MATRIX.shape[1]
+
+
+class BackTest(NamedTuple):
+    # Per ticket, in the order given: its number_string, numbers_played, draws
+    # played, cost, winnings, net (winnings - cost), and max_drawdown.
+    tickets: pd.DataFrame
+    # Per ticket, the number of draws whereupon 0 through 10 numbers were matched.
+    hits: pd.DataFrame
+    # Per period (rows) and ticket (columns): the cumulative net winnings at the
+    # period's end, and the drawdown thereof from its running peak.
+    net: pd.DataFrame
+    drawdown: pd.DataFrame
+
+
+def to_epoch(date: Union[str, int, pd.Timestamp]) -> int:
+    """Epoch seconds of a date, e.g.: "2019-01-01"; integers are taken as such."""
+    if isinstance(date, (int, np.integer)):
+        return int(date)
+    return pd.Timestamp(date).value // 10**9
+
+
+def select_draws(
+    drawings: pd.DataFrame,
+    start: Optional[Union[str, int]] = None,
+    end: Optional[Union[str, int]] = None,
+    cadence: int = 1,
+) -> pd.DataFrame:
+    """
+    The drawings within [start, end), in order, thinned to every 'cadence'-th.
+
+    @param drawings: DataFrame containing keno drawings data, the dates being
+                     epoch seconds.
+    """
+    drawings = drawings.sort_values("date", kind="stable")
+    dates = drawings["date"].to_numpy()
+
+    mask = np.ones(len(drawings), dtype=bool)
+    if start is not None:
+        mask &= dates >= to_epoch(start)
+    if end is not None:
+        mask &= dates < to_epoch(end)
+
+    return drawings.loc[mask].iloc[::cadence]
+
+
+def membership_matrix(bit_info: BitSet) -> np.ndarray:
+    """(N, 80) float32 matrix flagging the numbers, 1 through 80, of each row."""
+    return bit_info.membership()[:, 1:MAX_NUMBERS].astype(np.float32)
+
+
+def match_histograms(
+    tickets: np.ndarray,
+    draws: np.ndarray,
+    periods: np.ndarray,
+    ticket_block: int = 1024,
+    draw_block: int = 8192,
+) -> Iterator[Tuple[slice, int, np.ndarray]]:
+    """
+    Yields, per block, the histograms of the numbers matched by each of its tickets
+    within each of its periods.
+
+    @param tickets: (T, 80) ticket membership matrix.
+    @param draws: (80, D) draw membership matrix, the draws in period order.
+    @param periods: period of each draw, ascending from 0.
+
+    @returns (tickets, first_period, histograms): the block's slice of the tickets,
+             its first period, and int64 histograms of shape (tickets, periods, MATCHED).
+    """
+    for d0 in range(0, draws.shape[1], draw_block):
+        block_draws = draws[:, d0 : d0 + draw_block]
+        first_period = periods[d0]
+        local_periods = periods[d0 : d0 + draw_block] - first_period
+        block_periods = int(local_periods[-1]) + 1
+
+        # Each (ticket, period, matched) triple is assigned its own bin: the base
+        # bins of (ticket, period) are shared by all ticket blocks.
+        base_bins = (
+            np.arange(ticket_block)[:, None] * block_periods + local_periods
+        ) * MATCHED
+        bins = np.empty_like(base_bins)
+
+        for t0 in range(0, len(tickets), ticket_block):
+            block_tickets = tickets[t0 : t0 + ticket_block]
+            n = len(block_tickets)
+
+            # Exact, as the sums are at most 10.
+            matched = (block_tickets @ block_draws).astype(np.uint8)
+            np.add(base_bins[:n], matched, out=bins[:n])
+
+            histograms = np.bincount(
+                bins[:n].ravel(), minlength=n * block_periods * MATCHED
+            ).reshape(n, block_periods, MATCHED)
+
+            yield slice(t0, t0 + n), first_period, histograms
+
+
+def back_test(
+    tickets: Iterable[str],
+    drawings: pd.DataFrame,
+    start: Optional[Union[str, int]] = None,
+    end: Optional[Union[str, int]] = None,
+    cadence: int = 1,
+    wager: int = 1,
+    freq: str = "D",
+    ticket_block: int = 1024,
+    draw_block: int = 8192,
+) -> BackTest:
+    """
+    Back-tests each ticket as though it were played, for 'wager' dollars, upon every
+    'cadence'-th drawing within [start, end).
+
+    @param tickets: number strings, of 1 through 10 numbers each, e.g.: "01 02 03".
+    @param drawings: DataFrame containing keno drawings data, as per 'process_drawings'.
+    @param start: first date, e.g.: "2018-01-01", or epoch seconds.
+    @param end: date whereat the back-test ends, exclusively.
+    @param cadence: play every 'cadence'-th drawing of the range.
+    @param wager: dollars wagered per ticket per drawing; the prizes scale alike.
+    @param freq: period of the net and drawdown curves, as a NumPy datetime unit
+                 (e.g.: "D" daily, "W" weekly, "M" monthly).
+
+    @returns back_test: see 'BackTest'.
+    """
+    tickets = list(tickets)
+    bit_info, valid = get_bit_info(tickets)
+    if not valid.all():
+        invalid = [s for s, v in zip(tickets, valid) if not v][:5]
+        raise ValueError(f"Invalid number strings, e.g.: {invalid}.")
+
+    played = bit_info.popcount()
+    if ((played < 1) | (played > MATCHED - 1)).any():
+        raise ValueError(f"Tickets must play 1 through {MATCHED - 1} numbers.")
+
+    # Duplicate tickets are back-tested once.
+    _, unique_ix, inverse = np.unique(
+        bit_info.words, axis=0, return_index=True, return_inverse=True
+    )
+    inverse = inverse.reshape(-1)
+
+    draws = select_draws(drawings, start, end, cadence)
+    period_keys = (
+        draws["date"]
+        .to_numpy(dtype=np.int64)
+        .astype("datetime64[s]")
+        .astype(f"datetime64[{freq}]")
+    )
+    period_labels, periods = np.unique(period_keys, return_inverse=True)
+    n_periods = len(period_labels)
+
+    prizes = PRIZE_MATRIX[played[unique_ix]] * wager
+    hits = np.zeros((len(unique_ix), MATCHED), dtype=np.int64)
+    winnings = np.zeros((len(unique_ix), n_periods), dtype=np.int64)
+
+    for rows, first_period, histograms in match_histograms(
+        membership_matrix(bit_info[unique_ix]),
+        np.ascontiguousarray(membership_matrix(get_bit_columns(draws)).T),
+        periods,
+        ticket_block,
+        draw_block,
+    ):
+        hits[rows] += histograms.sum(axis=1)
+        columns = slice(first_period, first_period + histograms.shape[1])
+        winnings[rows, columns] += np.einsum("tpk,tk->tp", histograms, prizes[rows])
+
+    cost = np.bincount(periods, minlength=n_periods) * wager
+    net = np.cumsum(winnings - cost, axis=1)[inverse]
+    # Measured from the running peak, the start (0) included.
+    drawdown = np.maximum.accumulate(np.maximum(net, 0), axis=1) - net
+    hits = hits[inverse]
+
+    total_cost = len(draws) * wager
+    summary = pd.DataFrame(
+        {
+            "number_string": bit_info.to_strings(delim=","),
+            "numbers_played": played,
+            "draws": len(draws),
+            "cost": total_cost,
+            "winnings": winnings.sum(axis=1)[inverse],
+            "net": net[:, -1] if n_periods > 0 else 0,
+            "max_drawdown": drawdown.max(axis=1) if n_periods > 0 else 0,
+        }
+    )
+
+    index = pd.DatetimeIndex(period_labels.astype("datetime64[ns]"), name="period")
+
+    return BackTest(
+        tickets=summary,
+        hits=pd.DataFrame(hits, columns=pd.RangeIndex(MATCHED, name="matched")),
+        net=pd.DataFrame(net.T, index=index),
+        drawdown=pd.DataFrame(drawdown.T, index=index),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--drawings", required=True, help="drawings.csv, as written by keno_passf."
+    )
+    parser.add_argument(
+        "--tickets", required=True, help="File of number strings, one per line."
+    )
+    parser.add_argument("--start", help="First date, e.g.: 2018-01-01.")
+    parser.add_argument("--end", help="Date whereat to end, exclusively.")
+    parser.add_argument("--cadence", type=int, default=1)
+    parser.add_argument("--wager", type=int, default=1)
+    parser.add_argument("--freq", default="D")
+    parser.add_argument("--out", default=".", help="Directory of the results.")
+
+    args = parser.parse_args()
+
+    drawings = pd.read_csv(args.drawings, index_col="id")
+    with open(args.tickets) as file:
+        tickets = [line.strip() for line in file if line.strip()]
+
+    results = back_test(
+        tickets,
+        drawings,
+        start=args.start,
+        end=args.end,
+        cadence=args.cadence,
+        wager=args.wager,
+        freq=args.freq,
+    )
+
+    os.makedirs(args.out, exist_ok=True)
+    results.tickets.join(results.hits.add_prefix("matched_")).to_csv(
+        os.path.join(args.out, "back_test_tickets.csv"), index_label="ticket"
+    )
+    results.net.to_csv(os.path.join(args.out, "back_test_net.csv"))
+    results.drawdown.to_csv(os.path.join(args.out, "back_test_drawdown.csv"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import argparse
+import contextlib
+import os
+import tempfile
+from typing import *
+
+import numpy as np
+import pandas as pd
+
+from bulk_writer import BulkWriter
+from keno import (
+    KENO_TIMES,
+    create_numbers_wagered,
+    explode_wagers,
+    find_and_set_winnings,
+    map_wagers,
+    process_drawings,
+    process_wagers,
+)
+from keno_passf import DRAWINGS_NAMES, WAGERS_NAMES, concat_csv, get_split_paths
+from lottery_analysis.benchmark import Benchmark
+from lottery_analysis.synthetic import write_keno_split
+from sqlite_backend import create_sqlite_engine, create_tables
+
+"""
+End-to-end benchmark of the keno pipeline upon synthetic split files (see
+'lottery_analysis.synthetic'), run against a scratch SQLite database.
+
+Each stage is timed, and its peak memory traced: process_drawings, process_wagers,
+create_numbers_wagered, map_wagers, explode_wagers and find_and_set_winnings.
+
+    python benchmark_keno.py --wagers 1000000 --save-baseline keno_baseline.json
+    python benchmark_keno.py --wagers 1000000 --baseline keno_baseline.json
+
+When compared against a baseline, the script exits with 1 should any stage regress.
+"""
+
+
+def schedule_draws_per_day(start_date: str, days: int) -> np.ndarray:
+    """The number of draws of each day, as per its KenoTime schedule."""
+    dates = pd.date_range(start_date, periods=days, freq="D").to_numpy(
+        dtype="datetime64[s]"
+    )
+    start_dates = np.array([k.start_date for k in KENO_TIMES], dtype="datetime64[s]")
+    schedule = (np.searchsorted(start_dates, dates, side="left") - 1) % len(KENO_TIMES)
+
+    return np.array([k.intervals for k in KENO_TIMES])[schedule]
+
+
+def run_benchmark(dirpath: str, benchmark: Benchmark, batch_size: int) -> None:
+    drawings = concat_csv(
+        get_split_paths(dirpath, "split/*draw*"), sep=";", names=DRAWINGS_NAMES
+    )
+    wagers = concat_csv(
+        get_split_paths(dirpath, "split/*wager*"), sep=";", names=WAGERS_NAMES
+    )
+
+    drawings = benchmark.run("process_drawings", process_drawings, drawings)
+    wagers = benchmark.run("process_wagers", process_wagers, wagers)
+
+    db_path = os.path.join(dirpath, "benchmark.sqlite")
+    for path in (db_path, db_path + "-wal", db_path + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
+    with contextlib.closing(create_sqlite_engine(db_path).connect()) as conn:
+        create_tables(conn)
+
+        with BulkWriter(
+            "drawings", conn, batch_size=batch_size, report=False
+        ) as writer:
+            writer.write(drawings.reset_index())
+
+        writer_kwargs = dict(batch_size=batch_size, report=False)
+
+        numbers_wagered = benchmark.run(
+            "create_numbers_wagered",
+            create_numbers_wagered,
+            wagers,
+            conn,
+            rows=len(wagers),
+            **writer_kwargs,
+        )
+        wagers = benchmark.run("map_wagers", map_wagers, wagers, numbers_wagered)
+        exploded = benchmark.run(
+            "explode_wagers", explode_wagers, wagers, conn, **writer_kwargs
+        )
+        benchmark.run(
+            "find_and_set_winnings",
+            find_and_set_winnings,
+            exploded,
+            numbers_wagered,
+            drawings,
+            "wagers",
+            conn,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--dirpath",
+        default=None,
+        help="Directory of the synthetic data; defaults to a temporary directory.",
+    )
+    parser.add_argument("--wagers", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--start-date", default="2019-01-01")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rows-per-file", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    parser.add_argument(
+        "--reuse",
+        action="store_true",
+        help="Reuse the split files already within --dirpath, if any.",
+    )
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="Do not trace peak memory, which slows object-heavy stages.",
+    )
+    parser.add_argument("--save-baseline", help="Path whereto the results are saved.")
+    parser.add_argument("--baseline", help="Path of a baseline to compare against.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Fraction by which a stage may exceed its baseline.",
+    )
+
+    args = parser.parse_args()
+
+    dirpath = args.dirpath or tempfile.mkdtemp(prefix="keno_benchmark_")
+    params = {
+        "wagers": args.wagers,
+        "days": args.days,
+        "start_date": args.start_date,
+        "seed": args.seed,
+    }
+
+    if not (args.reuse and get_split_paths(dirpath, "split/*wager*")):
+        print(f"Generating {args.wagers} wagers within {dirpath}.")
+        for path in get_split_paths(dirpath, "split/*"):
+            os.remove(path)
+        write_keno_split(
+            dirpath,
+            wagers=args.wagers,
+            days=args.days,
+            start_date=args.start_date,
+            draws_per_day=schedule_draws_per_day(args.start_date, args.days),
+            seed=args.seed,
+            rows_per_file=args.rows_per_file,
+        )
+
+    benchmark = Benchmark("keno", params, trace_memory=not args.no_memory)
+    run_benchmark(dirpath, benchmark, args.batch_size)
+    benchmark.report()
+
+    if args.save_baseline is not None:
+        benchmark.save(args.save_baseline)
+
+    if args.baseline is not None and benchmark.compare(args.baseline, args.tolerance):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
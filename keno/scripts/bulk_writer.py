@@ -0,0 +1,288 @@
+import io
+import os
+import queue
+import tempfile
+import threading
+import time
+from typing import *
+
+import pandas as pd
+import sqlalchemy as sqla
+
+from instrumentation import METRICS
+
+"""
+Chunked bulk loading of DataFrames into a database table.
+
+Rows are written in batches of 'batch_size', one transaction per batch, either via
+a multi-row executemany (upon SQLite, of a single prepared statement over row tuples)
+or, for MySQL servers permitting it, LOAD DATA LOCAL INFILE.
+Batches are handed to a background thread through a bounded queue: once
+'max_pending' batches are waiting, 'write' blocks until the database catches up.
+"""
+
+_SENTINEL = None
+
+
+def frame_to_columns(frame: pd.DataFrame) -> List[List[Any]]:
+    """Converts each column into a list of native Python values (NaN becoming None)."""
+    columns = []
+
+    for col in frame.columns:
+        values = frame[col]
+        if values.hasnans:
+            values = values.astype(object).where(values.notna(), None)
+        columns.append(values.tolist())
+
+    return columns
+
+
+def frame_to_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Converts a DataFrame into a list of row dictionaries of native Python values,
+    as is expected by a DBAPI executemany.
+    """
+    names = list(frame.columns)
+    return [dict(zip(names, row)) for row in zip(*frame_to_columns(frame))]
+
+
+def frame_to_rows(frame: pd.DataFrame) -> List[Tuple[Any, ...]]:
+    """As 'frame_to_records', but of row tuples, for positional parameters."""
+    return list(zip(*frame_to_columns(frame)))
+
+
+# Characters escaped within LOAD DATA fields, as per its default ESCAPED BY '\\'.
+TSV_ESCAPES = [("\\", "\\\\"), ("\t", "\\t"), ("\n", "\\n"), ("\r", "\\r")]
+
+
+def tsv_fields(values: pd.Series) -> pd.Series:
+    """
+    Formats a column as LOAD DATA INFILE fields: NULL as \\N, and the backslashes,
+    tabs and line breaks of strings escaped.
+    """
+    fields = values.astype(str)
+
+    if values.dtype == object:
+        for char, escaped in TSV_ESCAPES:
+            fields = fields.str.replace(char, escaped, regex=False)
+
+    return fields.where(values.notna(), "\\N")
+
+
+def frame_to_tsv(frame: pd.DataFrame) -> io.StringIO:
+    """
+    Serializes a DataFrame into an in-memory, tab separated buffer
+    in the format expected by LOAD DATA INFILE (NULL as \\N).
+
+    The fields are escaped herein, rather than by the csv module: its escapechar
+    would escape \\N itself, and its quoting is not understood by LOAD DATA.
+    """
+    bool_cols = frame.select_dtypes(include="bool").columns
+    frame = frame.astype({col: "int8" for col in bool_cols})
+
+    columns = [tsv_fields(frame[col]) for col in frame.columns]
+    lines = columns[0].str.cat(columns[1:], sep="\t")
+
+    buffer = io.StringIO("".join(line + "\n" for line in lines))
+    return buffer
+
+
+class BulkWriter:
+    """
+    Bulk, chunked writer for a single table.
+
+    Usage:
+        with BulkWriter("wagers", conn, batch_size=50_000) as writer:
+            for df in batches:
+                writer.write(df)
+
+    @param table_name: name of the (existing) table written to.
+    @param conn: connection whereupon the rows are written. While the writer is
+                 open, it must not be used elsewhere.
+    @param batch_size: number of rows written per transaction.
+    @param max_pending: number of batches that may be queued before 'write' blocks;
+                        0 writes synchronously upon the calling thread
+                        (as is always the case for SQLite).
+    @param load_data: use LOAD DATA LOCAL INFILE when the backend is MySQL.
+                      The connection must be created with 'local_infile' enabled.
+    @param report: print a rows/sec report upon closing.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        conn: sqla.engine.Connection,
+        batch_size: int = 10_000,
+        max_pending: int = 2,
+        load_data: bool = False,
+        report: bool = True,
+    ):
+        self.table_name = table_name
+        self.conn = conn
+        self.batch_size = batch_size
+        self.load_data = load_data and conn.dialect.name == "mysql"
+        self.report = report
+
+        metadata = sqla.MetaData(bind=conn)
+        self.table = sqla.Table(table_name, metadata, autoload=True)
+
+        self.rows_written = 0
+        self.batches_written = 0
+        self.write_time = 0.0
+
+        self._start_time = time.perf_counter()
+        self._error: Optional[BaseException] = None
+        self._closed = False
+
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+
+        # pysqlite connections are bound to their creating thread;
+        # SQLite's writes are local, so there is little latency to hide regardless.
+        if conn.dialect.name == "sqlite":
+            max_pending = 0
+
+        if max_pending > 0:
+            self._queue = queue.Queue(maxsize=max_pending)
+            self._thread = threading.Thread(target=self._drain, daemon=True)
+            self._thread.start()
+
+    def __enter__(self) -> "BulkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._shutdown()
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = time.perf_counter() - self._start_time
+        return self.rows_written / elapsed if elapsed > 0 else 0.0
+
+    def write(self, frame: pd.DataFrame) -> None:
+        """
+        Splits 'frame' into batches of 'batch_size' rows and queues them for writing.
+        Blocks whilst the queue is full.
+        """
+        if self._closed:
+            raise ValueError(f"BulkWriter for '{self.table_name}' is closed.")
+
+        for start in range(0, len(frame), self.batch_size):
+            batch = frame.iloc[start : start + self.batch_size]
+
+            self._raise_error()
+            if self._queue is not None:
+                self._queue.put(batch)
+            else:
+                self._write_batch(batch)
+
+        self._raise_error()
+
+    def close(self) -> None:
+        """Flushes all queued batches, then stops the writer thread."""
+        if self._closed:
+            return
+
+        self._shutdown()
+        self._raise_error()
+
+        if self.report:
+            elapsed = time.perf_counter() - self._start_time
+            print(
+                f"{self.table_name}: wrote {self.rows_written} rows "
+                f"in {self.batches_written} batches, {elapsed:.2f}s "
+                f"({self.rows_per_second:,.0f} rows/s)"
+            )
+
+    def _shutdown(self) -> None:
+        self._closed = True
+
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_SENTINEL)
+            self._thread.join()
+
+    def insert_batch(self, batch: pd.DataFrame) -> None:
+        """
+        Writes 'batch' via the configured method, without any transaction
+        handling of its own: for use within a caller's transaction.
+        """
+        if batch.empty:
+            return
+
+        if self.load_data:
+            self._load_data(batch)
+        elif self.conn.dialect.name == "sqlite":
+            self._executemany(batch)
+        else:
+            self.conn.execute(self.table.insert(), frame_to_records(batch))
+
+    def _executemany(self, batch: pd.DataFrame) -> None:
+        # One prepared statement, executed over plain row tuples, bypassing
+        # SQLAlchemy's per-row parameter processing. The DBAPI connection is that
+        # of 'conn', so the rows remain within the caller's transaction.
+        cols = ", ".join(f'"{col}"' for col in batch.columns)
+        params = ", ".join("?" * len(batch.columns))
+
+        cursor = self.conn.connection.cursor()
+        try:
+            cursor.executemany(
+                f'INSERT INTO "{self.table_name}" ({cols}) VALUES ({params})',
+                frame_to_rows(batch),
+            )
+        finally:
+            cursor.close()
+
+    def _write_batch(self, batch: pd.DataFrame) -> None:
+        t = time.perf_counter()
+
+        with self.conn.begin():
+            self.insert_batch(batch)
+
+        self.write_time += time.perf_counter() - t
+        self.rows_written += len(batch)
+        METRICS.count(f"{self.table_name}_rows_written", len(batch))
+        self.batches_written += 1
+
+    def _load_data(self, batch: pd.DataFrame) -> None:
+        # The MySQL client protocol requests LOCAL INFILE contents by path,
+        # so the in-memory buffer is spilled to a temporary file beforehand.
+        buffer = frame_to_tsv(batch)
+
+        with tempfile.NamedTemporaryFile("w", suffix=".tsv", delete=False) as file:
+            file.write(buffer.getvalue())
+            path = file.name
+
+        try:
+            cols = ",".join(f"`{col}`" for col in batch.columns)
+            self.conn.execute(
+                sqla.text(
+                    f"""LOAD DATA LOCAL INFILE '{path}'
+                    INTO TABLE `{self.table_name}`
+                    FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+                    LINES TERMINATED BY '\\n'
+                    ({cols})"""
+                )
+            )
+        finally:
+            os.remove(path)
+
+    def _drain(self) -> None:
+        assert self._queue is not None
+
+        while True:
+            batch = self._queue.get()
+            if batch is _SENTINEL:
+                return
+            if self._error is not None:
+                # Keep draining so that producers never block upon a dead writer.
+                continue
+            try:
+                self._write_batch(batch)
+            except BaseException as e:
+                self._error = e
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,174 @@
+import hashlib
+import io
+import os
+from typing import *
+
+import pandas as pd
+import sqlalchemy as sqla
+
+"""
+Checkpointed, resumable processing of large CSV files.
+
+A file is read in seekable, line-aligned chunks of roughly 'chunk_bytes'. Upon
+processing a chunk, its byte offsets and content hash are recorded within the
+'checkpoints' table, within the very same transaction as the chunk's rows: a chunk is
+thereby either entirely committed and journaled, or neither. On resume, reading
+seeks past the last committed chunk, so neither the committed rows are re-read,
+nor any rows deleted.
+"""
+
+CHECKPOINTS_TABLE_NAME = "checkpoints"
+
+
+class Chunk(NamedTuple):
+    index: int
+    offset_start: int
+    offset_end: int
+    digest: str
+    frame: pd.DataFrame
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class CheckpointJournal:
+    """
+    Journal of the committed chunks of each pipeline stage.
+
+    @param conn: connection whereupon the journal table is stored; the same
+                 connection wherewith the chunks' rows are written.
+    @param table_name: name of the journal table; created if absent.
+    """
+
+    def __init__(
+        self, conn: sqla.engine.Connection, table_name: str = CHECKPOINTS_TABLE_NAME
+    ):
+        self.conn = conn
+
+        metadata = sqla.MetaData(bind=conn)
+        self.table = sqla.Table(
+            table_name,
+            metadata,
+            sqla.Column("stage", sqla.String(64), primary_key=True),
+            sqla.Column("chunk", sqla.Integer, primary_key=True),
+            sqla.Column("source", sqla.String(255)),
+            sqla.Column("offset_start", sqla.BigInteger),
+            sqla.Column("offset_end", sqla.BigInteger),
+            sqla.Column("rows", sqla.Integer),
+            sqla.Column("digest", sqla.String(64)),
+        )
+        metadata.create_all(conn, checkfirst=True)
+
+    def last(self, stage: str) -> Optional[Dict[str, Any]]:
+        """The last committed chunk of 'stage', if any."""
+        row = self.conn.execute(
+            self.table.select()
+            .where(self.table.c.stage == stage)
+            .order_by(self.table.c.chunk.desc())
+            .limit(1)
+        ).fetchone()
+
+        return dict(row) if row is not None else None
+
+    def record(self, stage: str, source: str, chunk: Chunk, rows: int) -> None:
+        """
+        Journals 'chunk' as committed. Call within the transaction
+        wherein the chunk's rows are written.
+        """
+        self.conn.execute(
+            self.table.insert(),
+            stage=stage,
+            chunk=chunk.index,
+            source=os.path.basename(source),
+            offset_start=chunk.offset_start,
+            offset_end=chunk.offset_end,
+            rows=rows,
+            digest=chunk.digest,
+        )
+
+    def clear(self, stage: str) -> None:
+        self.conn.execute(self.table.delete().where(self.table.c.stage == stage))
+
+
+def iter_csv_chunks(
+    filepath: str,
+    chunk_bytes: int = 64 * 2**20,
+    offset: Optional[int] = None,
+    first_index: int = 0,
+    **read_csv_kwargs: Any,
+) -> Iterator[Chunk]:
+    """
+    Reads a CSV file, with a header, in line-aligned chunks of about 'chunk_bytes'.
+
+    @param offset: byte offset whence to begin; must lie at the start of a line.
+                   Defaults to just after the header.
+    @param first_index: index of the first chunk read.
+    @param read_csv_kwargs: keyword arguments passed along to pd.read_csv.
+    """
+    with open(filepath, "rb") as file:
+        header = file.readline()
+
+        if offset is not None:
+            file.seek(offset)
+
+        index = first_index
+
+        while True:
+            offset_start = file.tell()
+            data = file.read(chunk_bytes)
+            if not data:
+                return
+            if not data.endswith(b"\n"):
+                data += file.readline()
+
+            frame = pd.read_csv(io.BytesIO(header + data), **read_csv_kwargs)
+
+            yield Chunk(index, offset_start, file.tell(), hash_bytes(data), frame)
+            index += 1
+
+
+def read_byte_range(filepath: str, offset_start: int, offset_end: int) -> bytes:
+    with open(filepath, "rb") as file:
+        file.seek(offset_start)
+        return file.read(offset_end - offset_start)
+
+
+def iter_uncommitted_chunks(
+    filepath: str,
+    stage: str,
+    journal: CheckpointJournal,
+    chunk_bytes: int = 64 * 2**20,
+    **read_csv_kwargs: Any,
+) -> Iterator[Chunk]:
+    """
+    Yields the chunks of 'filepath' not yet committed for 'stage', as per 'journal'.
+
+    Before resuming, the last committed chunk is re-hashed from the file; should it
+    differ, the file has changed since, and resuming therefrom is refused.
+    """
+    last = journal.last(stage)
+
+    if last is None:
+        yield from iter_csv_chunks(filepath, chunk_bytes, **read_csv_kwargs)
+        return
+
+    data = read_byte_range(filepath, last["offset_start"], last["offset_end"])
+    if hash_bytes(data) != last["digest"]:
+        raise ValueError(
+            f"'{filepath}' differs from that journaled for stage '{stage}' "
+            f"(chunk {last['chunk']}); clear the stage to start over."
+        )
+
+    print(
+        f"{stage}: resuming after chunk {last['chunk']} "
+        f"(byte offset {last['offset_end']})."
+    )
+
+    yield from iter_csv_chunks(
+        filepath,
+        chunk_bytes,
+        offset=last["offset_end"],
+        first_index=last["chunk"] + 1,
+        **read_csv_kwargs,
+    )
@@ -0,0 +1,304 @@
+import json
+import os
+from typing import *
+
+import numpy as np
+import pandas as pd
+
+"""
+A local, memory-mapped columnar store for the keno tables: drawings, numbers_wagered,
+wagers (as per 'schemas'), and scored wagers.
+
+Each table is a directory of partitions, and each partition a directory of column
+files: the raw, fixed-dtype bytes of one column, opened via np.memmap. Strings are
+stored as fixed-width bytes. Tables with a date column (epoch seconds) are
+partitioned by its month, e.g.: "drawings/2019-03/low_bits.bin"; others are stored
+within a single partition. The dtypes are recorded within each table's '_schema.json'.
+
+Rows are only ever appended. A partition's row count is committed last, and
+atomically, within its '_rows' file: any bytes past it, left over by an interrupted
+write, are ignored, and truncated upon the next.
+"""
+
+SCHEMA_FILENAME = "_schema.json"
+ROWS_FILENAME = "_rows"
+UNPARTITIONED = "all"
+
+PARTITION_COLUMNS = {
+    "drawings": "date",
+    "wagers": "date",
+    "scored_wagers": "date",
+    "numbers_wagered": None,
+}
+# Minimum widths of the string columns: ten, comma delimited, two digit numbers.
+STRING_WIDTHS = {"number_string": 29}
+
+
+def partition_keys(dates: np.ndarray, freq: str = "M") -> np.ndarray:
+    """Partition key, e.g.: "2019-03", of each date in epoch seconds."""
+    return np.datetime_as_string(
+        np.asarray(dates, dtype=np.int64)
+        .astype("datetime64[s]")
+        .astype(f"datetime64[{freq}]")
+    )
+
+
+def write_atomic(path: str, data: str) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+class ColumnStore:
+    """
+    @param dirpath: directory wherein the tables are (or are to be) stored.
+    @param freq: partition frequency of the dated tables, as a NumPy datetime unit
+                 (e.g.: "M" monthly, "D" daily); fixed upon a table's creation.
+    """
+
+    def __init__(self, dirpath: str, freq: str = "M"):
+        self.dirpath = dirpath
+        self.freq = freq
+
+        os.makedirs(dirpath, exist_ok=True)
+
+    def _table_path(self, table_name: str) -> str:
+        return os.path.join(self.dirpath, table_name)
+
+    def _column_path(self, table_name: str, partition: str, column: str) -> str:
+        return os.path.join(self._table_path(table_name), partition, f"{column}.bin")
+
+    def exists(self, table_name: str) -> bool:
+        return os.path.exists(
+            os.path.join(self._table_path(table_name), SCHEMA_FILENAME)
+        )
+
+    def schema(self, table_name: str) -> Dict[str, Any]:
+        with open(os.path.join(self._table_path(table_name), SCHEMA_FILENAME)) as file:
+            return json.load(file)
+
+    def _create(
+        self, table_name: str, frame: pd.DataFrame, partition_col: Optional[str]
+    ) -> Dict[str, Any]:
+        columns = {}
+
+        for col in frame.columns:
+            values = frame[col]
+            if values.dtype == object:
+                width = max(int(values.str.len().max() or 0), STRING_WIDTHS.get(col, 1))
+                columns[col] = np.dtype(f"S{width}").str
+            else:
+                columns[col] = values.dtype.str
+
+        schema = {
+            "columns": columns,
+            "partition_col": partition_col,
+            "freq": self.freq,
+        }
+
+        os.makedirs(self._table_path(table_name), exist_ok=True)
+        write_atomic(
+            os.path.join(self._table_path(table_name), SCHEMA_FILENAME),
+            json.dumps(schema, indent=4),
+        )
+
+        return schema
+
+    def partitions(
+        self,
+        table_name: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> List[str]:
+        """
+        The partitions of 'table_name', in order; if a date range, in epoch seconds,
+        is provided, only those which may contain dates within [start, end].
+        """
+        path = self._table_path(table_name)
+        partitions = sorted(
+            name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name))
+        )
+
+        schema = self.schema(table_name)
+        if schema["partition_col"] is None:
+            return partitions
+
+        if start is not None:
+            first = partition_keys([start], schema["freq"])[0]
+            partitions = [p for p in partitions if p >= first]
+        if end is not None:
+            last = partition_keys([end], schema["freq"])[0]
+            partitions = [p for p in partitions if p <= last]
+
+        return partitions
+
+    def rows(self, table_name: str, partition: str) -> int:
+        path = os.path.join(self._table_path(table_name), partition, ROWS_FILENAME)
+        if not os.path.exists(path):
+            return 0
+        with open(path) as file:
+            return int(file.read())
+
+    def write(
+        self,
+        table_name: str,
+        frame: pd.DataFrame,
+        partition_col: Optional[str] = None,
+    ) -> None:
+        """
+        Appends 'frame' to 'table_name', creating the table upon the first write.
+
+        A named index is stored as a column. The table's columns, and dtypes,
+        are those of the first write; subsequent frames are cast thereto.
+
+        @param partition_col: date column, in epoch seconds, whereby the rows are
+                              partitioned; defaults to that of PARTITION_COLUMNS.
+        """
+        if frame.index.name is not None:
+            frame = frame.reset_index()
+
+        if self.exists(table_name):
+            schema = self.schema(table_name)
+        else:
+            schema = self._create(
+                table_name,
+                frame,
+                partition_col or PARTITION_COLUMNS.get(table_name),
+            )
+
+        columns = schema["columns"]
+        partition_col = schema["partition_col"]
+
+        missing = set(columns) - set(frame.columns)
+        if missing:
+            raise KeyError(f"Missing columns for '{table_name}': {sorted(missing)}.")
+
+        if partition_col is None:
+            keys = np.full(len(frame), UNPARTITIONED)
+        else:
+            keys = partition_keys(frame[partition_col], schema["freq"])
+
+        for partition in np.unique(keys):
+            self._append(table_name, partition, frame.loc[keys == partition], columns)
+
+    def _append(
+        self,
+        table_name: str,
+        partition: str,
+        frame: pd.DataFrame,
+        columns: Dict[str, str],
+    ) -> None:
+        dirpath = os.path.join(self._table_path(table_name), partition)
+        os.makedirs(dirpath, exist_ok=True)
+
+        rows = self.rows(table_name, partition)
+
+        for col, dtype in columns.items():
+            dtype = np.dtype(dtype)
+            values = frame[col].to_numpy()
+
+            if dtype.kind == "S":
+                values = values.astype(str).astype(bytes)
+                if values.dtype.itemsize > dtype.itemsize:
+                    raise ValueError(
+                        f"Column '{col}' of '{table_name}' holds strings "
+                        f"of at most {dtype.itemsize} characters."
+                    )
+
+            path = self._column_path(table_name, partition, col)
+            with open(path, "ab") as file:
+                # Discard bytes left over by an interrupted write.
+                file.truncate(rows * dtype.itemsize)
+                file.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+        write_atomic(os.path.join(dirpath, ROWS_FILENAME), str(rows + len(frame)))
+
+    def open(
+        self, table_name: str, partition: str, columns: Optional[List[str]] = None
+    ) -> Dict[str, np.ndarray]:
+        """Memory-maps the given columns (defaulting to all) of a single partition."""
+        schema_columns = self.schema(table_name)["columns"]
+        rows = self.rows(table_name, partition)
+
+        arrays = {}
+        for col in columns or list(schema_columns):
+            dtype = np.dtype(schema_columns[col])
+            if rows == 0:
+                arrays[col] = np.zeros(0, dtype=dtype)
+            else:
+                arrays[col] = np.memmap(
+                    self._column_path(table_name, partition, col),
+                    dtype=dtype,
+                    mode="r",
+                    shape=(rows,),
+                )
+
+        return arrays
+
+    def scan(
+        self,
+        table_name: str,
+        columns: Optional[List[str]] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> Iterator[Tuple[str, Dict[str, np.ndarray]]]:
+        """
+        Yields (partition, columns) of each partition touched by [start, end],
+        the columns memory-mapped; nothing is read until accessed.
+        """
+        for partition in self.partitions(table_name, start, end):
+            yield partition, self.open(table_name, partition, columns)
+
+    def read(
+        self,
+        table_name: str,
+        columns: Optional[List[str]] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        index_col: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """
+        Reads the given columns of 'table_name' into a DataFrame. Should a date range
+        be provided, the rows are filtered thereto, by the table's partition column.
+        """
+        schema = self.schema(table_name)
+        partition_col = schema["partition_col"]
+
+        read_columns = list(columns or schema["columns"])
+        for col in (partition_col, index_col):
+            if col is not None and col not in read_columns:
+                read_columns.append(col)
+
+        frames = []
+        for _, arrays in self.scan(table_name, read_columns, start, end):
+            frame = pd.DataFrame({col: np.asarray(arr) for col, arr in arrays.items()})
+
+            if partition_col is not None:
+                dates = frame[partition_col]
+                mask = np.ones(len(frame), dtype=bool)
+                if start is not None:
+                    mask &= dates >= start
+                if end is not None:
+                    mask &= dates <= end
+                frame = frame[mask]
+
+            frames.append(frame)
+
+        if frames:
+            frame = pd.concat(frames, ignore_index=True)
+        else:
+            frame = pd.DataFrame(
+                {col: np.zeros(0, dtype=schema["columns"][col]) for col in read_columns}
+            )
+
+        for col in read_columns:
+            if np.dtype(schema["columns"][col]).kind == "S":
+                frame[col] = frame[col].str.decode("utf-8")
+
+        if index_col is not None:
+            frame = frame.set_index(index_col)
+
+        return frame[
+            [col for col in (columns or schema["columns"]) if col != index_col]
+        ]
@@ -0,0 +1,482 @@
+import argparse
+import concurrent.futures
+import hashlib
+import heapq
+import json
+import os
+import time
+from math import comb
+from typing import *
+
+import numpy as np
+import pandas as pd
+
+from back_test import back_test, select_draws
+from columnar import write_atomic
+from keno import MAX_NUMBERS, PRIZE_MATRIX, get_bit_columns
+from lottery_analysis.combinations import (
+    inclusion_exclusion_matrix,
+    subset_sums,
+    unrank_combinations,
+)
+
+"""
+Exhaustive search of the best, and worst, paying keno tickets of k spots (1 through
+MAX_SEARCH_SPOTS) over a range of drawings: every one of the C(80, k) combinations is
+scored, as though played upon each drawing therein.
+
+The winnings of a combination U follow from the co-occurrence counts, N_S, of its
+subsets (the number of drawings whereupon all of S's numbers were drawn) by
+inclusion-exclusion: the number of drawings whereupon exactly j of its numbers were
+drawn is
+
+    E_j = sum_{i >= j} (-1)^(i - j) C(i, j) P_i,  P_i = sum_{S ⊆ U, |S| = i} N_S,
+
+and its winnings sum_j prize_j E_j = sum_i coef_i P_i. The counts of the proper
+subsets (at most C(80, 3) of them) are tabulated once; only the count of U itself is
+computed per combination.
+
+The combinations are enumerated in colexicographic order, in chunks of ranks
+unranked upon the fly. Consecutive combinations thereby share all but their least
+number: the drawings of each such suffix are found once, by intersecting the (cached)
+drawings of its own suffix with those of one more number, and the counts of every
+least number follow at once, by summing those drawings' membership rows eight bytes
+(eight numbers) to a word.
+
+Each chunk's best and worst are merged into streaming top-k and bottom-k heaps, so
+that memory is independent of the number of combinations. Chunks are scored within
+worker processes, and the completed chunks and heaps are saved, atomically, to a
+state file whence an interrupted search resumes.
+"""
+
+NUMBERS = MAX_NUMBERS - 1
+MAX_SEARCH_SPOTS = 4
+
+# Rows summed per byte lane before it might overflow.
+LANE_ROWS = 255
+
+
+def draw_membership(draws: pd.DataFrame) -> np.ndarray:
+    """(D, 80) boolean matrix flagging the numbers, 1 through 80, of each drawing."""
+    return np.ascontiguousarray(get_bit_columns(draws).membership()[:, 1:MAX_NUMBERS])
+
+
+class Cooccurrences:
+    """
+    Counts the drawings whereupon all the numbers of each of a run of combinations
+    were drawn.
+
+    @param membership: (D, 80) boolean matrix, as per 'draw_membership'.
+    """
+
+    def __init__(self, membership: np.ndarray):
+        # Each drawing's membership row as ten words of eight 0/1 bytes.
+        self.rows = membership.view(np.uint8).view(np.uint64)
+        self.columns = np.ascontiguousarray(membership.T)
+
+        # The drawings of each leading part of the latest suffix.
+        self._suffix: Tuple[int, ...] = ()
+        self._draws = [np.arange(len(membership))]
+
+    def drawings_of(self, suffix: Tuple[int, ...]) -> np.ndarray:
+        """The drawings whereupon all of 'suffix' was drawn, its greatest first."""
+        p = 0
+        while p < min(len(suffix), len(self._suffix)) and suffix[p] == self._suffix[p]:
+            p += 1
+
+        del self._draws[p + 1 :]
+        for n in suffix[p:]:
+            draws = self._draws[-1]
+            self._draws.append(draws[self.columns[n, draws]])
+        self._suffix = suffix
+
+        return self._draws[-1]
+
+    def column_sums(self, draws: np.ndarray) -> np.ndarray:
+        """
+        The number of the given drawings whereupon each number was drawn: their
+        rows are summed as words, each byte lane counting one number, in groups
+        few enough that no lane overflows.
+        """
+        if len(draws) == 0:
+            return np.zeros(NUMBERS, dtype=np.int64)
+
+        words = np.take(self.rows, draws, axis=0)
+        sums = np.add.reduceat(words, np.arange(0, len(words), LANE_ROWS), axis=0)
+
+        return sums.view(np.uint8).sum(axis=0, dtype=np.int64)
+
+    def count(self, combos: np.ndarray) -> np.ndarray:
+        """
+        @param combos: (n, k) combinations, in colexicographic order.
+        """
+        counts = np.empty(len(combos), dtype=np.int64)
+
+        # Runs of combinations sharing all but their least number.
+        changes = (np.diff(combos[:, 1:], axis=0) != 0).any(axis=1)
+        bounds = np.concatenate([[0], np.flatnonzero(changes) + 1, [len(combos)]])
+
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            suffix = tuple(combos[a, :0:-1].tolist())
+            sums = self.column_sums(self.drawings_of(suffix))
+            counts[a:b] = sums[combos[a:b, 0]]
+
+        return counts
+
+
+def inclusion_exclusion_coefficients(prizes: np.ndarray) -> np.ndarray:
+    """
+    coef_i = sum_{j <= i} (-1)^(i - j) C(i, j) prize_j, whereby the winnings are
+    sum_i coef_i P_i.
+
+    @param prizes: prize of each number of matches, 0 through k.
+    """
+    return prizes.astype(np.int64) @ inclusion_exclusion_matrix(len(prizes) - 1)
+
+
+def subset_tables(cooccurrences: Cooccurrences, k: int) -> List[np.ndarray]:
+    """
+    The co-occurrence counts of every combination of 1 through k - 1 numbers,
+    indexed by colexicographic rank.
+    """
+    return [
+        cooccurrences.count(
+            unrank_combinations(np.arange(comb(NUMBERS, i)), i, NUMBERS)
+        )
+        for i in range(1, k)
+    ]
+
+
+class TopK:
+    """
+    Streaming selection of the 'size' greatest scores, ties being broken toward the
+    lesser rank, so that the selection is independent of the order of pushing.
+    """
+
+    def __init__(self, size: int, items: Iterable[Tuple[int, int]] = ()):
+        self.size = size
+        # Min-heap of (score, -rank): its root is the least of those selected.
+        self.heap: List[Tuple[int, int]] = [(s, -r) for s, r in items]
+        heapq.heapify(self.heap)
+
+    def push(self, scores: Iterable[int], ranks: Iterable[int]) -> None:
+        for score, rank in zip(scores, ranks):
+            item = (int(score), -int(rank))
+            if len(self.heap) < self.size:
+                heapq.heappush(self.heap, item)
+            elif item > self.heap[0]:
+                heapq.heapreplace(self.heap, item)
+
+    def items(self) -> List[Tuple[int, int]]:
+        """(score, rank) pairs, best first."""
+        return [(s, -r) for s, r in sorted(self.heap, reverse=True)]
+
+
+def select_chunk(
+    scores: np.ndarray, ranks: np.ndarray, size: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """The chunk's 'size' greatest scores, as would 'TopK' select them."""
+    order = np.lexsort((ranks, -scores))[:size]
+    return scores[order], ranks[order]
+
+
+class SearchContext(NamedTuple):
+    membership: np.ndarray
+    tables: List[np.ndarray]
+    coefficients: np.ndarray
+    n_draws: int
+    k: int
+    chunk_size: int
+    top: int
+
+
+# Set within each worker process by '_init_worker'.
+_CONTEXT: Optional[SearchContext] = None
+_COOCCURRENCES: Optional[Cooccurrences] = None
+
+
+def _init_worker(context: SearchContext) -> None:
+    global _CONTEXT, _COOCCURRENCES
+    _CONTEXT = context
+    _COOCCURRENCES = Cooccurrences(context.membership)
+
+
+def score_combinations(
+    combos: np.ndarray, context: SearchContext, cooccurrences: Cooccurrences
+) -> np.ndarray:
+    """The net winnings, per $1 wagered upon each drawing, of each combination."""
+    k = context.k
+    coefficients = context.coefficients
+
+    # P_0 is every drawing, each costing $1.
+    net = np.full(len(combos), (coefficients[0] - 1) * context.n_draws, np.int64)
+    net += coefficients[k] * cooccurrences.count(combos)
+
+    for i in range(1, k):
+        if coefficients[i] == 0:
+            continue
+        net += coefficients[i] * subset_sums(combos, context.tables[i - 1], i, NUMBERS)
+
+    return net
+
+
+def score_chunk(
+    index: int,
+    context: Optional[SearchContext] = None,
+    cooccurrences: Optional[Cooccurrences] = None,
+) -> Tuple[int, Tuple[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]:
+    """
+    Scores the 'index'-th chunk of combinations; within a worker, as per its
+    '_init_worker'.
+
+    @returns (index, (top scores, ranks), (bottom scores, ranks)): the latter
+             being negated, as per 'TopK'.
+    """
+    context = context or _CONTEXT
+    cooccurrences = cooccurrences or _COOCCURRENCES
+    start = index * context.chunk_size
+    stop = min(start + context.chunk_size, comb(NUMBERS, context.k))
+
+    ranks = np.arange(start, stop, dtype=np.int64)
+    net = score_combinations(
+        unrank_combinations(ranks, context.k, NUMBERS), context, cooccurrences
+    )
+
+    return (
+        index,
+        select_chunk(net, ranks, context.top),
+        select_chunk(-net, ranks, context.top),
+    )
+
+
+class SearchState:
+    """
+    The progress of a search: its completed chunks and its heaps, saved as JSON.
+
+    The completed chunks are kept as 'done_below', all chunks below which are
+    complete, and the few complete beyond it, whose number is bounded by those
+    in flight.
+    """
+
+    def __init__(self, params: Dict[str, Any], top: int):
+        self.params = params
+        self.done_below = 0
+        self.done: Set[int] = set()
+        self.best = TopK(top)
+        self.worst = TopK(top)
+
+    def is_done(self, index: int) -> bool:
+        return index < self.done_below or index in self.done
+
+    def complete(self, index: int) -> None:
+        self.done.add(index)
+        while self.done_below in self.done:
+            self.done.remove(self.done_below)
+            self.done_below += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "params": self.params,
+            "done_below": self.done_below,
+            "done": sorted(self.done),
+            "best": self.best.items(),
+            "worst": self.worst.items(),
+        }
+
+    def save(self, path: str) -> None:
+        write_atomic(path, json.dumps(self.to_dict()))
+
+    @classmethod
+    def load(cls, path: str, params: Dict[str, Any], top: int) -> "SearchState":
+        """
+        Loads the state at 'path', if any, else begins anew.
+
+        Raises a ValueError should the state be that of a search of other params.
+        """
+        state = cls(params, top)
+        if not os.path.exists(path):
+            return state
+
+        with open(path) as file:
+            data = json.load(file)
+
+        if data["params"] != params:
+            raise ValueError(
+                f"The search state at '{path}' is of {data['params']}, not {params}; "
+                "remove it to search anew."
+            )
+
+        state.done_below = data["done_below"]
+        state.done = set(data["done"])
+        state.best = TopK(top, data["best"])
+        state.worst = TopK(top, data["worst"])
+
+        return state
+
+
+def search_combinations(
+    drawings: pd.DataFrame,
+    spots: int,
+    start: Optional[Union[str, int]] = None,
+    end: Optional[Union[str, int]] = None,
+    cadence: int = 1,
+    top: int = 10,
+    workers: Optional[int] = None,
+    chunk_size: int = 4096,
+    state_path: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Searches every combination of 'spots' numbers for the 'top' best, and worst,
+    paying over every 'cadence'-th drawing within [start, end).
+
+    @param drawings: DataFrame containing keno drawings data, as per 'process_drawings'.
+    @param workers: number of worker processes; defaults to the number of CPUs.
+                    With 1, the chunks are scored within this process.
+    @param chunk_size: combinations scored per chunk.
+    @param state_path: file whereto the search's progress is saved, and whence it
+                       is resumed.
+
+    @returns results: per ticket found, its 'side' ("best" or "worst"), its place
+             thereupon, and its 'back_test' summary and hit distribution.
+    """
+    if not 1 <= spots <= MAX_SEARCH_SPOTS:
+        raise ValueError(f"Spots must be 1 through {MAX_SEARCH_SPOTS}.")
+
+    draws = select_draws(drawings, start, end, cadence)
+    membership = draw_membership(draws)
+    n_combinations = comb(NUMBERS, spots)
+    n_chunks = -(-n_combinations // chunk_size)
+
+    params = {
+        "spots": spots,
+        "start": start,
+        "end": end,
+        "cadence": cadence,
+        "chunk_size": chunk_size,
+        "n_draws": len(draws),
+        "draws_digest": hashlib.sha256(np.packbits(membership).tobytes()).hexdigest(),
+    }
+    state = (
+        SearchState.load(state_path, params, top)
+        if state_path is not None
+        else SearchState(params, top)
+    )
+
+    workers = workers or os.cpu_count()
+
+    t = time.perf_counter()
+    cooccurrences = Cooccurrences(membership)
+    context = SearchContext(
+        membership=membership,
+        tables=subset_tables(cooccurrences, spots),
+        coefficients=inclusion_exclusion_coefficients(PRIZE_MATRIX[spots, : spots + 1]),
+        n_draws=len(draws),
+        k=spots,
+        chunk_size=chunk_size,
+        top=top,
+    )
+    pending = (i for i in range(n_chunks) if not state.is_done(i))
+
+    def complete(result) -> None:
+        index, (best, best_ranks), (worst, worst_ranks) = result
+        state.best.push(best, best_ranks)
+        state.worst.push(worst, worst_ranks)
+        state.complete(index)
+        if state_path is not None:
+            state.save(state_path)
+
+    if workers == 1:
+        for index in pending:
+            complete(score_chunk(index, context, cooccurrences))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(context,)
+        ) as executor:
+            # At most two chunks in flight per worker.
+            in_flight = set()
+
+            for index in pending:
+                if len(in_flight) >= 2 * workers:
+                    finished, in_flight = concurrent.futures.wait(
+                        in_flight, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in finished:
+                        complete(future.result())
+                in_flight.add(executor.submit(score_chunk, index))
+
+            for future in concurrent.futures.as_completed(in_flight):
+                complete(future.result())
+
+    print(
+        f"Searched {n_combinations} combinations of {spots} over {len(draws)} "
+        f"drawings: {time.perf_counter() - t:.2f}s"
+    )
+
+    sides = [
+        ("best", [rank for _, rank in state.best.items()]),
+        ("worst", [rank for _, rank in state.worst.items()]),
+    ]
+    ranks = [rank for _, side_ranks in sides for rank in side_ranks]
+    tickets = [
+        " ".join(f"{n + 1:02d}" for n in combo)
+        for combo in unrank_combinations(ranks, spots, NUMBERS).tolist()
+    ]
+
+    results = back_test(tickets, draws)
+
+    return pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "side": [side for side, side_ranks in sides for _ in side_ranks],
+                    "place": [
+                        p for _, side_ranks in sides for p in range(len(side_ranks))
+                    ],
+                }
+            ),
+            results.tickets.drop(["draws", "cost"], axis=1),
+            results.hits.iloc[:, : spots + 1].add_prefix("matched_"),
+        ],
+        axis=1,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--drawings", required=True, help="drawings.csv, as written by keno_passf."
+    )
+    parser.add_argument("--spots", type=int, required=True)
+    parser.add_argument("--start", help="First date, e.g.: 2018-01-01.")
+    parser.add_argument("--end", help="Date whereat to end, exclusively.")
+    parser.add_argument("--cadence", type=int, default=1)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    parser.add_argument(
+        "--state", help="File whereto progress is saved, and whence it is resumed."
+    )
+    parser.add_argument("--out", default="combination_search.csv")
+
+    args = parser.parse_args()
+
+    drawings = pd.read_csv(args.drawings, index_col="id")
+
+    results = search_combinations(
+        drawings,
+        args.spots,
+        start=args.start,
+        end=args.end,
+        cadence=args.cadence,
+        top=args.top,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        state_path=args.state,
+    )
+    results.to_csv(args.out, index=False)
+    print(results.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import contextlib
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import *
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+"""
+Lightweight instrumentation of the keno pipeline's stages.
+
+A stage is measured within a span: its wall time, the rows it processed, and thereby
+its throughput, along with the process's RSS high-water mark upon its end. An
+exception raised within a span is counted against its stage, and re-raised.
+Named counters (e.g.: of skipped rows) are kept alongside.
+
+Spans are recorded upon the module's METRICS, which emits nothing unless configured
+(see 'Metrics.configure'): each span may then be appended, as it ends, to a JSON
+lines file, and the totals of each stage written to a Prometheus-format text file.
+
+Profiling is opt-in, per stage: either cProfile, whose stats are dumped to
+'<profile_dir>/<stage>.prof', accumulated over all its spans, or tracemalloc, whose
+top allocations during the stage's latest span are written to
+'<profile_dir>/<stage>.tracemalloc.txt'. A stage nested within one already profiled
+is not profiled itself.
+
+Usage:
+    with METRICS.span("score") as span:
+        scores = score_wager_ranges(...)
+        span.rows = len(scores)
+"""
+
+PROFILERS = ("cprofile", "tracemalloc")
+TRACEMALLOC_TOP = 25
+
+
+def max_rss_bytes() -> Optional[int]:
+    """The process's RSS high-water mark; None where unavailable."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes upon Linux, bytes upon macOS.
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class Span:
+    def __init__(self, stage: str, parent: Optional[str], rows: int = 0):
+        self.stage = stage
+        self.parent = parent
+        self.rows = rows
+        self.seconds = 0.0
+        self.error: Optional[str] = None
+        self.max_rss_bytes: Optional[int] = None
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.stage,
+            "parent": self.parent,
+            "rows": self.rows,
+            "seconds": self.seconds,
+            "rows_per_second": self.rows_per_second,
+            "max_rss_bytes": self.max_rss_bytes,
+            "error": self.error,
+        }
+
+
+class StageTotals:
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.errors = 0
+        self.rows_per_second = 0.0
+
+    def add(self, span: Span) -> None:
+        self.calls += 1
+        self.rows += span.rows
+        self.seconds += span.seconds
+        self.errors += span.error is not None
+        # The throughput of the latest span, as a gauge.
+        self.rows_per_second = span.rows_per_second
+
+
+class Metrics:
+    """
+    @param prefix: prefix of the Prometheus metric names.
+    """
+
+    def __init__(self, prefix: str = "keno"):
+        self.prefix = prefix
+        self.totals: Dict[str, StageTotals] = {}
+        self.counters: Dict[str, int] = {}
+
+        self.jsonl_path: Optional[str] = None
+        self.prometheus_path: Optional[str] = None
+        self.profiler: Optional[str] = None
+        self.profile_stages: Optional[Set[str]] = None
+        self.profile_dir = "profiles"
+
+        self._stack: List[str] = []
+        self._profiling = False
+        self._profiles: Dict[str, cProfile.Profile] = {}
+
+    def configure(
+        self,
+        jsonl_path: Optional[str] = None,
+        prometheus_path: Optional[str] = None,
+        profiler: Optional[str] = None,
+        profile_stages: Optional[Iterable[str]] = None,
+        profile_dir: str = "profiles",
+    ) -> None:
+        """
+        @param jsonl_path: file whereto each span is appended, as it ends.
+        @param prometheus_path: file whereto the stage totals and counters are
+                                written, atomically, as each span ends.
+        @param profiler: one of PROFILERS, or None.
+        @param profile_stages: the stages profiled; defaults to all.
+        @param profile_dir: directory wherein the profiles are written.
+        """
+        if profiler is not None and profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler '{profiler}'; use one of {PROFILERS}.")
+
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.profiler = profiler
+        self.profile_stages = set(profile_stages) if profile_stages else None
+        self.profile_dir = profile_dir
+
+        if profiler is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def _should_profile(self, stage: str) -> bool:
+        return (
+            self.profiler is not None
+            and not self._profiling
+            and (self.profile_stages is None or stage in self.profile_stages)
+        )
+
+    @contextlib.contextmanager
+    def _profile(self, stage: str) -> Iterator[None]:
+        if not self._should_profile(stage):
+            yield
+            return
+
+        self._profiling = True
+        path = os.path.join(self.profile_dir, stage)
+
+        try:
+            if self.profiler == "cprofile":
+                # Accumulated over each of the stage's spans.
+                profile = self._profiles.setdefault(stage, cProfile.Profile())
+                profile.enable()
+                try:
+                    yield
+                finally:
+                    profile.disable()
+                    profile.dump_stats(f"{path}.prof")
+            else:
+                tracing = tracemalloc.is_tracing()
+                if not tracing:
+                    tracemalloc.start()
+                try:
+                    yield
+                finally:
+                    snapshot = tracemalloc.take_snapshot()
+                    peak = tracemalloc.get_traced_memory()[1]
+                    if not tracing:
+                        tracemalloc.stop()
+                    with open(f"{path}.tracemalloc.txt", "w") as file:
+                        file.write(f"Peak traced memory: {peak / 2**20:,.1f} MiB\n")
+                        for stat in snapshot.statistics("lineno")[:TRACEMALLOC_TOP]:
+                            file.write(f"{stat}\n")
+        finally:
+            self._profiling = False
+
+    @contextlib.contextmanager
+    def span(self, stage: str, rows: int = 0) -> Iterator[Span]:
+        """
+        Measures the enclosed block as 'stage'. The span's 'rows' may be set,
+        or added to, therein.
+        """
+        span = Span(stage, self._stack[-1] if self._stack else None, rows)
+        self._stack.append(stage)
+
+        t = time.perf_counter()
+        try:
+            with self._profile(stage):
+                yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.seconds = time.perf_counter() - t
+            span.max_rss_bytes = max_rss_bytes()
+            self._stack.pop()
+            self._record(span)
+
+    def iter(
+        self,
+        stage: str,
+        iterable: Iterable[Any],
+        rows: Optional[Callable[[Any], int]] = None,
+    ) -> Iterator[Any]:
+        """
+        Yields the items of 'iterable', measuring the production of each as a span
+        of 'stage' (e.g.: reading a chunk), with 'rows(item)' rows. The final,
+        exhausting call is measured too, as it may well have read something.
+        """
+        iterator = iter(iterable)
+
+        while True:
+            with self.span(stage) as span:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                span.rows = rows(item) if rows is not None else 1
+            yield item
+
+    def _record(self, span: Span) -> None:
+        self.totals.setdefault(span.stage, StageTotals()).add(span)
+
+        if self.jsonl_path is not None:
+            record = dict(span.to_dict(), time=time.time())
+            with open(self.jsonl_path, "a") as file:
+                file.write(json.dumps(record) + "\n")
+
+        if self.prometheus_path is not None:
+            self.write_prometheus(self.prometheus_path)
+
+    def to_prometheus(self) -> str:
+        stage_metrics = [
+            ("stage_calls_total", "counter", "Spans ended.", "calls"),
+            ("stage_rows_total", "counter", "Rows processed.", "rows"),
+            ("stage_seconds_total", "counter", "Wall time spent.", "seconds"),
+            ("stage_errors_total", "counter", "Spans ended by an error.", "errors"),
+            (
+                "stage_rows_per_second",
+                "gauge",
+                "Throughput of the latest span.",
+                "rows_per_second",
+            ),
+        ]
+
+        lines = []
+        for name, kind, help_text, attr in stage_metrics:
+            name = f"{self.prefix}_{name}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for stage, totals in sorted(self.totals.items()):
+                lines.append(f'{name}{{stage="{stage}"}} {getattr(totals, attr)}')
+
+        max_rss = max_rss_bytes()
+        if max_rss is not None:
+            name = f"{self.prefix}_max_rss_bytes"
+            lines += [
+                f"# HELP {name} RSS high-water mark of the process.",
+                f"# TYPE {name} gauge",
+                f"{name} {max_rss}",
+            ]
+
+        for counter, value in sorted(self.counters.items()):
+            name = f"{self.prefix}_{counter}_total"
+            lines += [f"# TYPE {name} counter", f"{name} {value}"]
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as file:
+            file.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def summary(self) -> str:
+        lines = []
+        for stage, totals in self.totals.items():
+            line = (
+                f"{stage}: {totals.calls} calls, {totals.rows} rows, "
+                f"{totals.seconds:.2f}s"
+            )
+            if totals.errors:
+                line += f", {totals.errors} errors"
+            lines.append(line)
+        for counter, value in self.counters.items():
+            lines.append(f"{counter}: {value}")
+        return "\n".join(lines)
+
+
+METRICS = Metrics()
@@ -1,18 +1,29 @@
 import argparse
-import bisect
 import contextlib
 import json
 import os
 from datetime import datetime, timedelta
 from typing import *
 
+import numpy as np
 import pandas as pd
 import sqlalchemy as sqla
-from sqlalchemy import func
 
-from bit_manipulations import bits_to_nums, nums_to_bits, popcount64d
+from bulk_writer import BulkWriter
+from checkpoint import CheckpointJournal, iter_uncommitted_chunks
+from columnar import ColumnStore
+from instrumentation import METRICS, PROFILERS
+from lottery_analysis.bitset import BitSet
 from schemas import *
-from utils import create_sqla_engine_str, read_sql_table_tmpfile
+from scoring import (
+    SCORE_COLUMNS,
+    build_prize_matrix,
+    score_wager_ranges,
+    score_wagers,
+)
+from sqlite_backend import bulk_load, create_sqlite_engine, create_tables
+from summaries import SummaryTables
+from utils import create_sqla_engine_str, read_sql_table_stream, time_table_readers
 
 MAX_BITS = 63
 MAX_NUMBERS = 80 + 1
@@ -29,6 +40,7 @@ PRIZE_DICT: Dict[int, Dict[int, int]] = {
     2: {2: 11},
     1: {1: 2},
 }
+PRIZE_MATRIX = build_prize_matrix(PRIZE_DICT)
 
 
 class KenoTime:
@@ -40,63 +52,116 @@ class KenoTime:
         self.intervals = ((end_date + timedelta(days=1)) - start_date) // delta + 1
 
 
-def normalize_draw_dates(dates: pd.Series) -> Callable[[int], str]:
-    KENO_TIMES = [
-        KenoTime(
-            datetime.fromisoformat("1970-01-01T05:05"),
-            datetime.fromisoformat("1970-01-01T01:45"),
-            timedelta(minutes=5),
-        ),
-        KenoTime(
-            datetime.fromisoformat("2020-01-01T05:05"),
-            datetime.fromisoformat("2020-01-01T01:45"),
-            timedelta(minutes=4),
-        ),
-    ]
-    START_DATES = list(map(lambda x: x.start_date, KENO_TIMES))
-    # Each day's worth of draws should equal exactly
-    # to the number of KenoTime intervals (249 up until 2020).
-    # If this isn't the case, then that day is malformed in some way.
-    offsets = dates.value_counts().to_dict()
-
-    prev_date: Optional[datetime] = None
-
-    def calc_dates(time: int) -> str:
-        nonlocal prev_date
-        date = datetime.strptime(str(time), "%Y%m%d")
-
-        ix = bisect.bisect_left(START_DATES, date) - 1
-        keno_time = KENO_TIMES[ix]
-
-        offset = keno_time.intervals - offsets[time]
-
-        if offset > 0:
-            prev_date = None
-            return date.isoformat()
-        else:
-            if prev_date is None or prev_date.time() == keno_time.end_date.time():
-                start_date = keno_time.start_date
-                prev_date = date.replace(hour=start_date.hour, minute=start_date.minute)
-            else:
-                prev_date += keno_time.delta
+SECOND = timedelta(seconds=1)
+KENO_TIMES = [
+    KenoTime(
+        datetime.fromisoformat("1970-01-01T05:05"),
+        datetime.fromisoformat("1970-01-01T01:45"),
+        timedelta(minutes=5),
+    ),
+    KenoTime(
+        datetime.fromisoformat("2020-01-01T05:05"),
+        datetime.fromisoformat("2020-01-01T01:45"),
+        timedelta(minutes=4),
+    ),
+]
 
-            return prev_date.isoformat()
 
-    return calc_dates
+def normalize_draw_dates(dates: pd.Series) -> pd.Series:
+    """
+    Normalizes the drawing dates, formatted as YYYYMMDD, into evenly spaced
+    drawing times, as integer epoch seconds (UTC).
 
+    Each day is assigned the KenoTime schedule wherein it falls. A day's worth of
+    draws should equal exactly the number of its schedule's intervals (249 up until
+    2020); if fewer, that day is malformed in some way, and its draws are left
+    at midnight. Runs of consecutive, well-formed draws are otherwise spaced
+    by the schedule's delta, starting anew at the schedule's start time every
+    'intervals' draws, upon the date of the draw whereat the cycle began.
 
-def get_bit_info(number_string: str) -> Tuple[int, int]:
-    bit_info = nums_to_bits(
-        number_string,
-        bit_length=MAX_BITS,
+    Computed upon whole columns: the result is that of accumulating, row by row,
+    over 'dates' in order; a run is however also restarted at a schedule change.
+
+    @param dates: Series of drawing dates, in drawing order.
+
+    @returns times: int64 Series of epoch seconds, indexed as 'dates'.
+    """
+    codes, uniques = pd.factorize(dates)
+    days = pd.to_datetime(pd.Index(uniques).astype(str), format="%Y%m%d")
+    day = days.to_numpy(dtype="datetime64[s]")[codes]
+
+    start_dates = np.array([k.start_date for k in KENO_TIMES], dtype="datetime64[s]")
+    # As 'bisect_left(START_DATES, date) - 1': a day lying upon, or before,
+    # a start time belongs to the preceding schedule.
+    schedule = np.searchsorted(start_dates, day, side="left") - 1
+    schedule %= len(KENO_TIMES)
+
+    intervals = np.array([k.intervals for k in KENO_TIMES], dtype=np.int64)[schedule]
+    delta = np.array([k.delta // SECOND for k in KENO_TIMES], dtype=np.int64)[schedule]
+    start_time = np.array(
+        [
+            (k.start_date - k.start_date.replace(hour=0, minute=0)) // SECOND
+            for k in KENO_TIMES
+        ],
+        dtype=np.int64,
+    )[schedule]
+
+    counts = np.bincount(codes)[codes]
+    well_formed = counts >= intervals
+
+    # Label each run of consecutive, well-formed draws of the same schedule,
+    # and find each draw's position p therein.
+    ix = np.arange(len(dates))
+    run_start = well_formed.copy()
+    run_start[1:] &= ~well_formed[:-1] | (schedule[1:] != schedule[:-1])
+    first = np.maximum.accumulate(np.where(run_start, ix, 0))
+    p = ix - first
+
+    # Every 'intervals' draws, the cycle restarts upon the current draw's date.
+    cycle_start = first + (p // intervals) * intervals
+    epoch_day = day.astype(np.int64)
+
+    times = np.where(
+        well_formed,
+        epoch_day[cycle_start] + start_time + (p % intervals) * delta,
+        epoch_day,
+    )
+
+    return pd.Series(times, index=dates.index, name=dates.name)
+
+
+def get_bit_info(number_strings: Iterable[str]) -> Tuple[BitSet, np.ndarray]:
+    """
+    Parses fixed-width (e.g.: "0102"), or delimited (e.g.: "01 02"), number strings.
+
+    @returns (bit_info, valid): boolean array flagging the validly formatted rows.
+    """
+    return BitSet.parse_strings(
+        number_strings,
         max_num=MAX_NUMBERS,
+        bit_length=MAX_BITS,
+        delim=" ,",
         num_length=2,
     )
-    return (bit_info[0], bit_info[1])
 
 
-def get_number_string(bit_info: List[int]) -> str:
-    return bits_to_nums(bit_info, delim=",", bit_length=MAX_BITS)
+def drop_invalid(frame: pd.DataFrame, valid: np.ndarray, name: str) -> pd.DataFrame:
+    if not valid.all():
+        METRICS.count(f"{name}_invalid", (~valid).sum())
+        print(f"Skipping {(~valid).sum()} {name} with invalid number strings.")
+    return frame.loc[valid]
+
+
+def get_number_strings(bit_info: BitSet) -> List[str]:
+    return bit_info.to_strings(delim=",")
+
+
+def get_bit_columns(frame: pd.DataFrame) -> BitSet:
+    return BitSet.from_columns(
+        [frame["low_bits"], frame["high_bits"]],
+        max_num=MAX_NUMBERS,
+        bit_length=MAX_BITS,
+    )
 
 
 def process_drawings(drawings: pd.DataFrame) -> pd.DataFrame:
@@ -104,61 +169,49 @@ def process_drawings(drawings: pd.DataFrame) -> pd.DataFrame:
 
     Processes the lottery numbers into their corresponding
     bit and integer array counterparts.
-    Thereinafter, the dates are formatted (by accumulation)
-    into evenly spaced intervals of 5, 24.
+    Thereinafter, the dates are formatted into evenly spaced intervals
+    of 5, or 4, minutes, stored as integer epoch seconds.
 
     @param drawings: DataFrame containing keno drawings data.
 
     @returns drawings: modified 'drawings' DataFrame.
     """
-    drawings = (
-        drawings.rename(
-            columns={
-                "Draw Nbr": "id",
-                "Draw Date": "date",
-                "Winning Number String": "number_string",
-            }
-        )
-        .set_index("id")
-        .assign(low_bits=0, high_bits=0)
+    drawings = drawings.rename(
+        columns={
+            "Draw Nbr": "id",
+            "Draw Date": "date",
+            "Winning Number String": "number_string",
+        }
+    ).set_index("id")
+    bit_info, valid = get_bit_info(drawings["number_string"])
+    low_bits, high_bits = bit_info.columns()
+
+    # The dates are normalized beforehand, as the malformed rows still count
+    # toward their day's draws.
+    drawings = drawings.assign(
+        date=normalize_draw_dates(drawings["date"]),
+        number_string=get_number_strings(bit_info),
+        low_bits=low_bits.astype(np.int64),
+        high_bits=high_bits.astype(np.int64),
     )
 
-    normalize_draw_dates_func = normalize_draw_dates(drawings["date"])
-
-    def process(row: pd.Series) -> pd.Series:
-        low_bits, high_bits = get_bit_info(row["number_string"])
-
-        row["number_string"] = get_number_string([low_bits, high_bits])
-        row["low_bits"] = low_bits
-        row["high_bits"] = high_bits
-
-        row["date"] = normalize_draw_dates_func(row["date"])
-
-        return row
-
-    return drawings.apply(process, axis=1)
+    return drop_invalid(drawings, valid, "drawings")
 
 
 def process_wagers(wagers: pd.DataFrame) -> pd.DataFrame:
-    def process(row: pd.Series) -> pd.Series:
-        low_bits, high_bits = get_bit_info(row["numbers_wagered"])
-
-        row["low_bits"] = low_bits
-        row["high_bits"] = high_bits
-
-        row["qp"] = row["qp"] == "T"
-
-        return row
+    bit_info, valid = get_bit_info(wagers["numbers_wagered"])
+    wagers = drop_invalid(wagers, valid, "wagers")
+    low_bits, high_bits = bit_info[valid].columns()
 
-    return (
-        wagers.assign(low_bits=0, high_bits=0)
-        .apply(process, 1)
-        .drop("numbers_wagered", axis=1)
-    )
+    return wagers.assign(
+        qp=wagers["qp"] if wagers["qp"].dtype == bool else wagers["qp"] == "T",
+        low_bits=low_bits.astype(np.int64),
+        high_bits=high_bits.astype(np.int64),
+    ).drop("numbers_wagered", axis=1)
 
 
 def create_numbers_wagered(
-    wagers: pd.DataFrame, conn: sqla.engine.Connection
+    wagers: pd.DataFrame, conn: sqla.engine.Connection, **writer_kwargs: Any
 ) -> pd.DataFrame:
     """For the creation of the secondary foreign key table 'numbers_wagered'.
     Allows for once-over preprocessing of unique ticket lottery numbers.
@@ -168,6 +221,7 @@ def create_numbers_wagered(
     the lottery numbers.
 
     @param wagers: DataFrame containing keno wagers data.
+    @param writer_kwargs: keyword arguments passed along to the BulkWriter.
 
     @returns number_wagered: new 'number_wagered' DataFrame wherewith the
                     subsequent ticket lottery numbers are stored.
@@ -175,21 +229,14 @@ def create_numbers_wagered(
     table_name = "numbers_wagered"
     pk = ["low_bits", "high_bits"]
 
-    def get_number_strings(row: pd.Series) -> pd.Series:
-        bit_info = [row[i] for i in pk]
-        row["numbers_played"] = sum(map(popcount64d, bit_info))
-        row["number_string"] = get_number_string(bit_info)
-
-        return row
-
     # A number string is the normalized number list;
     # numbers_wagered is what the user selected.
-    t_numbers_wagered = (
-        wagers[pk]
-        .drop_duplicates()
-        .reset_index(drop=True)
-        .assign(numbers_played=0, number_string="")
-        .apply(get_number_strings, axis=1)
+    t_numbers_wagered = wagers[pk].drop_duplicates().reset_index(drop=True)
+    bit_info = get_bit_columns(t_numbers_wagered)
+
+    t_numbers_wagered = t_numbers_wagered.assign(
+        numbers_played=bit_info.popcount(),
+        number_string=get_number_strings(bit_info),
     )
 
     numbers_wagered = pd.read_sql_table(table_name, con=conn, index_col="id")
@@ -200,13 +247,53 @@ def create_numbers_wagered(
         )
         t_numbers_wagered = t_numbers_wagered.loc[~dups]
 
-    t_numbers_wagered.to_sql(
-        table_name, con=conn, if_exists="append", index=False, method="multi"
-    )
+    with BulkWriter(table_name, conn, **writer_kwargs) as writer:
+        writer.write(t_numbers_wagered)
 
     return pd.read_sql_table(table_name, con=conn, index_col="id")
 
 
+def explode_numbers(bit_info: BitSet, ids: np.ndarray, id_name: str) -> pd.DataFrame:
+    """
+    Normalizes each row's numbers into (id, number) rows, as stored within the
+    bridge tables, wherewith the SQL analyses group by number in place of
+    joining upon bitwise ANDs.
+    """
+    rows, numbers = np.nonzero(bit_info.membership())
+    return pd.DataFrame({id_name: np.asarray(ids)[rows], "number": numbers})
+
+
+def create_number_bridges(
+    numbers_wagered: pd.DataFrame,
+    drawings: pd.DataFrame,
+    conn: sqla.engine.Connection,
+    **writer_kwargs: Any,
+) -> None:
+    """
+    Fills the 'drawing_numbers' and 'wager_numbers' bridge tables
+    with the numbers of any drawings, or numbers_wagered, not yet therein.
+
+    @param numbers_wagered: DataFrame containing numbers_wagered data, indexed by id.
+    @param drawings: DataFrame containing keno drawings data, indexed by id.
+    @param writer_kwargs: keyword arguments passed along to the BulkWriter.
+    """
+    bridges = [
+        ("drawing_numbers", "draw_id", drawings),
+        ("wager_numbers", "numbers_wagered_id", numbers_wagered),
+    ]
+
+    for table_name, id_name, frame in bridges:
+        existing = pd.read_sql(
+            f"SELECT DISTINCT {id_name} FROM {table_name}", con=conn
+        )[id_name]
+        frame = frame.loc[~frame.index.isin(existing)]
+
+        numbers = explode_numbers(get_bit_columns(frame), frame.index, id_name)
+
+        with BulkWriter(table_name, conn, **writer_kwargs) as writer:
+            writer.write(numbers)
+
+
 def map_wagers(wagers: pd.DataFrame, numbers_wagered: pd.DataFrame) -> pd.DataFrame:
     pk = ["low_bits", "high_bits"]
 
@@ -218,15 +305,19 @@ def map_wagers(wagers: pd.DataFrame, numbers_wagered: pd.DataFrame) -> pd.DataFr
     return wagers
 
 
-def explode_wagers(wagers: pd.DataFrame, conn: sqla.engine.Connection) -> pd.DataFrame:
+def explode_wagers(
+    wagers: pd.DataFrame, conn: sqla.engine.Connection, **writer_kwargs: Any
+) -> pd.DataFrame:
     tmp_table_name = "tmp_wagers"
-    wagers.to_sql(
-        tmp_table_name,
-        con=conn,
-        index_label="wager_id",
-        if_exists="replace",
-        method="multi",
+    tmp_wagers = wagers.rename_axis("wager_id").reset_index()
+
+    # Only the table's schema is created here; the rows are bulk loaded thereafter.
+    tmp_wagers.head(0).to_sql(
+        tmp_table_name, con=conn, index=False, if_exists="replace"
     )
+    with BulkWriter(tmp_table_name, conn, **writer_kwargs) as writer:
+        writer.write(tmp_wagers)
+
     sql = f"""SELECT
     {tmp_table_name}. *,
     drawings.id AS tmp_draw_number_id
@@ -242,21 +333,31 @@ FROM
     return tmp_table
 
 
-def trim_to_max_pk(
-    table_name: str,
-    pk: str,
-    conn: sqla.engine.Connection,
-) -> int:
-    metadata = sqla.MetaData(bind=conn)
-    table = sqla.Table(table_name, metadata, autoload=True)
+def set_winnings(
+    wagers: pd.DataFrame, numbers_wagered: pd.DataFrame, drawings: pd.DataFrame
+) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Sets the SCORE_COLUMNS of a batch of wagers (see 'scoring.score_wagers').
+
+    @returns (wagers, valid): the scored wagers, and a boolean array flagging
+                              those whose ids were found.
+    """
+    scores, valid = score_wagers(
+        wagers["numbers_wagered_id"],
+        wagers["draw_number_id"],
+        numbers_wagered,
+        drawings,
+        PRIZE_MATRIX,
+    )
+    wagers = wagers.drop(SCORE_COLUMNS, axis=1, errors="ignore").assign(
+        **{col: scores[col].to_numpy() for col in SCORE_COLUMNS}
+    )
 
-    start_id = conn.execute(func.max(table.c[pk])).scalar()
+    if not valid.all():
+        METRICS.count("wagers_unknown_ids", (~valid).sum())
+        print(f"Skipping {(~valid).sum()} wagers with unknown ids.")
 
-    if start_id is not None:
-        conn.execute(table.delete().where(table.c[pk] == start_id))
-        return start_id
-    else:
-        return -1
+    return wagers, valid
 
 
 def find_and_set_winnings(
@@ -265,90 +366,220 @@ def find_and_set_winnings(
     drawings: pd.DataFrame,
     wagers_table_name: str,
     conn: sqla.engine.Connection,
+    batch_size: int = 1_000_000,
+    writer: Optional[BulkWriter] = None,
 ) -> pd.DataFrame:
     """
     Function to find the prize amount of each item in the
     'wagers' DataFrame.
 
+    Principally, this is done by the bit-wise AND'ing of each wager's
+    numbers with those of its drawing, allowing for fast matching of theretofore
+    mentioned numbers. Scoring is performed column-wise (see 'scoring.score_wagers')
+    over batches of 'batch_size' rows, each of which is thereafter handed to
+    'writer' for insertion.
+
+    Wagers whose 'numbers_wagered_id' or 'draw_number_id' cannot be found are
+    left with zeroed scores and are not inserted.
+
     @param wagers: DataFrame containing keno wagers data.
-    @param numbers_wagered: DataFrame containing numbers_wagered data.
-    @param drawings: DataFrame containing keno drawings data.
+    @param numbers_wagered: DataFrame containing numbers_wagered data, indexed by id.
+    @param drawings: DataFrame containing keno drawings data, indexed by id.
+    @param batch_size: number of wagers scored at once.
+    @param writer: BulkWriter for the wagers table; if None, one is created
+                   (and closed) herein.
 
     @returns wagers: modified 'wagers' DataFrame.
 
     """
-    metadata = sqla.MetaData(bind=conn)
-    wagers_table = sqla.Table(wagers_table_name, metadata, autoload=True)
+    # A writer created herein is closed, or upon an error shut down, herein.
+    writer_context = (
+        BulkWriter(wagers_table_name, conn)
+        if writer is None
+        else contextlib.nullcontext(writer)
+    )
 
-    def calculate_prize(row: pd.Series) -> pd.Series:
-        """
-        Function applied to all rows in the 'wagers' DataFrame.
-        Utilized normally via pd.apply.
+    scored_batches = []
 
-        Principally, this function is responsible for the bit-wise AND'ing of
-        two lottery numbers, allowing for fast matching of theretofore
-        mentioned numbers.
+    with writer_context as writer:
+        for start in range(0, len(wagers), batch_size):
+            batch = wagers.iloc[start : start + batch_size]
 
-        @param x: 'numbers_wagered_id' and 'draw_number_id' element of the 'wagers' DataFrame
-        @param spots: DataFrame containing spots data.
-        @param drawings: DataFrame containing keno drawings data.
+            with METRICS.span("score_batch", rows=len(batch)):
+                batch, valid = set_winnings(batch, numbers_wagered, drawings)
+            with METRICS.span("write_batch", rows=valid.sum()):
+                writer.write(batch[valid])
+            scored_batches.append(batch)
 
-        @returns match_mask: array of high and low bits of the match,
-                            hamming weight (number of spots played),
-                            and date.
-        """
-        try:
-            numbers_wagered_id = row["numbers_wagered_id"]
-            draw_number_id = row["draw_number_id"]
+    if not scored_batches:
+        return wagers.assign(**{col: 0 for col in SCORE_COLUMNS})
 
-            high_bits1 = numbers_wagered.at[numbers_wagered_id, "high_bits"]
-            low_bits1 = numbers_wagered.at[numbers_wagered_id, "low_bits"]
-            number_played = numbers_wagered.at[numbers_wagered_id, "numbers_played"]
+    return pd.concat(scored_batches)
 
-            high_bits2 = drawings.at[draw_number_id, "high_bits"]
-            low_bits2 = drawings.at[draw_number_id, "low_bits"]
 
-            match_mask = [low_bits1 & low_bits2, high_bits1 & high_bits2]
-            numbers_matched = sum(map(popcount64d, match_mask))
+def find_and_set_winnings_checkpointed(
+    filepath: str,
+    numbers_wagered: pd.DataFrame,
+    drawings: pd.DataFrame,
+    wagers_table_name: str,
+    conn: sqla.engine.Connection,
+    stage: str = "find_and_set_winnings",
+    chunk_bytes: int = 64 * 2**20,
+    load_data: bool = False,
+    summaries: Optional[SummaryTables] = None,
+) -> int:
+    """
+    Resumable variant of 'find_and_set_winnings', reading the exploded wagers
+    straight from 'filepath' in chunks of about 'chunk_bytes'.
 
-            row["low_match_mask"] = match_mask[0]
-            row["high_match_mask"] = match_mask[1]
+    Each chunk's scored rows are inserted, and the chunk journaled, within one
+    transaction (see 'checkpoint.CheckpointJournal'); when re-run, only those chunks
+    not yet committed are read.
 
-            row["numbers_matched"] = numbers_matched
-            row["prize"] = PRIZE_DICT.get(number_played, {}).get(numbers_matched, 0)
+    @param filepath: path to the exploded wagers CSV.
+    @param stage: name of the stage within the journal.
+    @param summaries: if provided, the summary tables updated within each
+                      chunk's transaction.
 
-            conn.execute(wagers_table.insert(), **row)
+    @returns rows: number of rows inserted by this run.
+    """
+    journal = CheckpointJournal(conn)
+    writer = BulkWriter(
+        wagers_table_name, conn, max_pending=0, load_data=load_data, report=False
+    )
 
-        except Exception as e:
-            print(e)
+    rows = 0
 
-        return row
+    chunks = METRICS.iter(
+        "read_chunk",
+        iter_uncommitted_chunks(filepath, stage, journal, chunk_bytes),
+        rows=lambda chunk: len(chunk.frame),
+    )
 
-    return wagers.assign(
-        low_match_mask=0, high_match_mask=0, numbers_matched=0, prize=0
-    ).apply(calculate_prize, axis=1)
+    for chunk in chunks:
+        with METRICS.span("score_chunk", rows=len(chunk.frame)):
+            wagers, valid = set_winnings(chunk.frame, numbers_wagered, drawings)
+            wagers = wagers[valid]
 
+        with METRICS.span("commit_chunk", rows=len(wagers)), conn.begin():
+            writer.insert_batch(wagers)
+            if summaries is not None:
+                summaries.update(wagers)
+            journal.record(stage, filepath, chunk, rows=len(wagers))
 
-def trim_imported_wagers(
-    wagers: pd.DataFrame, wagers_table_name: str, conn: sqla.engine.Connection
-) -> pd.DataFrame:
-    pk = "wager_id"
-    start_id = trim_to_max_pk(wagers_table_name, pk=pk, conn=conn)
-    return wagers[wagers[pk] >= start_id]
+        rows += len(wagers)
+        print(f"{stage}: committed chunk {chunk.index}, {rows} rows this run.")
+
+    return rows
 
 
 def main():
     parser = argparse.ArgumentParser()
 
-    parser.add_argument("--config", required=True)
+    backend = parser.add_mutually_exclusive_group(required=True)
+    backend.add_argument("--config", help="JSON config of the MySQL connection.")
+    backend.add_argument(
+        "--sqlite", help="Path of a local SQLite database, used in place of MySQL."
+    )
     parser.add_argument("--dirpath", required=True)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--max-pending", type=int, default=2)
+    parser.add_argument(
+        "--chunk-mb",
+        type=int,
+        default=64,
+        help="Size of each checkpointed chunk of exploded_wagers.csv, in MiB.",
+    )
+    parser.add_argument(
+        "--load-data",
+        action="store_true",
+        help="Bulk load via LOAD DATA LOCAL INFILE (MySQL only).",
+    )
+    parser.add_argument(
+        "--score-ranges",
+        action="store_true",
+        help="Score the unexploded wagers.csv by draw range into scored_wagers.csv.",
+    )
+    parser.add_argument(
+        "--store",
+        help="Directory of the local columnar store: drawings and numbers_wagered are "
+        "read therefrom (once copied from MySQL, and thereafter extended with its "
+        "newer rows), and scored wagers written thereto.",
+    )
+    parser.add_argument(
+        "--benchmark-readers",
+        action="store_true",
+        help="Time the tmpfile, and streaming, readers upon the drawings and "
+        "numbers_wagered tables, then exit.",
+    )
+    parser.add_argument(
+        "--number-bridges",
+        action="store_true",
+        help="Fill the drawing_numbers and wager_numbers bridge tables.",
+    )
+    parser.add_argument(
+        "--summaries",
+        action="store_true",
+        help="Maintain the summary tables alongside the scored wagers.",
+    )
+    parser.add_argument(
+        "--verify-summaries",
+        action="store_true",
+        help="Recompute the summary tables from the wagers table, diff, then exit.",
+    )
+    parser.add_argument(
+        "--rebuild-summaries",
+        action="store_true",
+        help="Replace the summary tables by those recomputed from the wagers table, "
+        "then exit.",
+    )
+
+    parser.add_argument(
+        "--metrics-jsonl", help="File whereto each stage's span is appended, as JSON."
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        help="Prometheus-format text file of the stage totals, rewritten as each "
+        "stage ends.",
+    )
+    parser.add_argument(
+        "--profile", choices=PROFILERS, help="Profile each stage with this profiler."
+    )
+    parser.add_argument(
+        "--profile-stages",
+        nargs="+",
+        help="Stages to profile, e.g.: score_wager_ranges; defaults to all.",
+    )
+    parser.add_argument("--profile-dir", default="profiles")
 
     args = parser.parse_args()
 
-    CONFIG = json.load(open(args.config, "r"))
-    MYSQL = CONFIG["mysql"]
+    METRICS.configure(
+        jsonl_path=args.metrics_jsonl,
+        prometheus_path=args.metrics_prom,
+        profiler=args.profile,
+        profile_stages=args.profile_stages,
+        profile_dir=args.profile_dir,
+    )
+
+    try:
+        run(args)
+    finally:
+        summary = METRICS.summary()
+        if summary:
+            print(summary)
+
+
+def run(args: argparse.Namespace) -> None:
+    def open_conn() -> sqla.engine.Connection:
+        if args.sqlite is not None:
+            conn = create_sqlite_engine(args.sqlite).connect()
+            create_tables(conn)
+            return conn
+
+        CONFIG = json.load(open(args.config, "r"))
+        MYSQL = CONFIG["mysql"]
 
-    def open_mysql_conn() -> sqla.engine.Connection:
         engine_str = create_sqla_engine_str(
             username=MYSQL["username"],
             password=MYSQL["password"],
@@ -356,39 +587,138 @@ def main():
             port=MYSQL["port"],
             database=MYSQL["database"],
         )
-        engine = sqla.create_engine(engine_str)
+        connect_args = {"local_infile": True} if args.load_data else {}
+        engine = sqla.create_engine(engine_str, connect_args=connect_args)
         return engine.connect()
 
+    writer_kwargs = dict(
+        batch_size=args.batch_size,
+        max_pending=args.max_pending,
+        load_data=args.load_data,
+    )
+
     wagers_table_name = "wagers"
     numbers_wagered_table_name = "numbers_wagered"
     drawings_table_name = "drawings"
 
-    with contextlib.closing(open_mysql_conn()) as conn:
+    store = ColumnStore(args.store) if args.store is not None else None
+
+    def read_table(table_name: str, conn: sqla.engine.Connection) -> pd.DataFrame:
+        with METRICS.span(f"read_{table_name}") as span:
+            if store is not None and store.exists(table_name):
+                table = store.read(table_name, index_col="id")
+
+                # The store is a copy of the table as of its last read: the rows
+                # since inserted, their ids being auto-incremented, are appended.
+                max_id = int(table.index.max()) if len(table) else 0
+                new_rows = read_sql_table_stream(
+                    table_name, con=conn, index_col="id", where=f"id > {max_id}"
+                )
+                if len(new_rows):
+                    store.write(table_name, new_rows)
+                    table = pd.concat([table, new_rows])
+            else:
+                table = read_sql_table_stream(table_name, con=conn, index_col="id")
+                if store is not None:
+                    store.write(table_name, table)
+
+            span.rows = len(table)
+            return table
+
+    with contextlib.closing(open_conn()) as conn:
+        if args.benchmark_readers:
+            for table_name in (drawings_table_name, numbers_wagered_table_name):
+                time_table_readers(table_name, conn, index_col="id")
+            return
+
         # numbers_wagered = pd.read_sql_table(numbers_wagered_table_name, con=conn)
 
-        numbers_wagered = read_sql_table_tmpfile(numbers_wagered_table_name, con=conn)
+        numbers_wagered = read_table(numbers_wagered_table_name, conn)
 
         # drawings = process_drawings(drawings)
         # drawings.to_sql("drawings", con=conn, if_exists="append", index=False, method="multi")
-        drawings = read_sql_table_tmpfile(drawings_table_name, con=conn, index_col="id")
+        drawings = read_table(drawings_table_name, conn)
+
+        summaries = (
+            SummaryTables(conn, numbers_wagered, drawings)
+            if args.summaries or args.verify_summaries or args.rebuild_summaries
+            else None
+        )
+        if args.verify_summaries:
+            with METRICS.span("verify_summaries"):
+                ok = summaries.verify(wagers_table_name)
+            if not ok:
+                print(
+                    "To repair the summary tables, rerun with --rebuild-summaries: "
+                    "they are then recomputed from the wagers table."
+                )
+                raise SystemExit(1)
+            return
+
+        # Summaries first maintained over already scored wagers are built in full,
+        # lest they only count the wagers scored hereafter.
+        if args.rebuild_summaries or (
+            summaries is not None and summaries.missing(wagers_table_name)
+        ):
+            with METRICS.span("rebuild_summaries"):
+                summaries.rebuild(wagers_table_name)
+            if args.rebuild_summaries:
+                return
+
+        if args.number_bridges:
+            with METRICS.span("number_bridges"):
+                create_number_bridges(numbers_wagered, drawings, conn, **writer_kwargs)
 
         # wagers = process_wagers(wagers)
-        # numbers_wagered = create_numbers_wagered(wagers, conn)
+        # numbers_wagered = create_numbers_wagered(wagers, conn, **writer_kwargs)
 
         # wagers = map_wagers(wagers, numbers_wagered)
         # wagers.to_csv(os.path.join(args.dirpath, "wagers.csv"), index=False)
         # del wagers
         # input("Explode the wagers.")
 
-        wagers = pd.read_csv(os.path.join(args.dirpath, "exploded_wagers.csv"))
-        wagers = trim_imported_wagers(wagers, wagers_table_name, conn)
-
-        wagers = find_and_set_winnings(
-            wagers, numbers_wagered, drawings, wagers_table_name, conn
+        if args.score_ranges:
+            with METRICS.span("read_wagers_csv") as span:
+                wagers = pd.read_csv(os.path.join(args.dirpath, "wagers.csv"))
+                span.rows = len(wagers)
+
+            with METRICS.span("score_wager_ranges", rows=len(wagers)):
+                scores = score_wager_ranges(
+                    wagers, numbers_wagered, drawings, PRIZE_MATRIX
+                )
+            scored_wagers = wagers.join(scores).rename_axis("wager_id")
+
+            with METRICS.span("write_scored_wagers", rows=len(scored_wagers)):
+                if store is not None:
+                    # Partitioned by the date of each wager's first drawing;
+                    # that of an unknown drawing is taken as 0.
+                    date = drawings["date"].reindex(wagers["begin_draw"]).fillna(0)
+                    store.write(
+                        "scored_wagers",
+                        scored_wagers.assign(date=date.to_numpy(dtype=np.int64)),
+                    )
+                else:
+                    scored_wagers.to_csv(
+                        os.path.join(args.dirpath, "scored_wagers.csv")
+                    )
+            return
+
+        load_context = (
+            bulk_load(conn, [wagers_table_name])
+            if conn.dialect.name == "sqlite"
+            else contextlib.nullcontext()
         )
-        # wagers.to_sql(
-        #     "wagers", con=conn, if_exists="append", index=False, method="multi"
-        # )
+        with METRICS.span("find_and_set_winnings") as span, load_context:
+            span.rows = find_and_set_winnings_checkpointed(
+                os.path.join(args.dirpath, "exploded_wagers.csv"),
+                numbers_wagered,
+                drawings,
+                wagers_table_name,
+                conn,
+                chunk_bytes=args.chunk_mb * 2**20,
+                load_data=args.load_data,
+                summaries=summaries,
+            )
 
 
 if __name__ == "__main__":
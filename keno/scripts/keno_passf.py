@@ -1,8 +1,49 @@
+import argparse
+import concurrent.futures
+import os
 import pathlib
+import time
 from typing import *
 
+import numpy as np
 import pandas as pd
 
+from keno import (
+    PRIZE_MATRIX,
+    get_bit_columns,
+    get_number_strings,
+    process_drawings,
+    process_wagers,
+)
+from scoring import score_wager_ranges
+
+WAGERS_NAMES = "begin_draw;end_draw;qp;ticket_cost;numbers_wagered".split(";")
+DRAWINGS_NAMES = "Draw Nbr;Draw Date;Winning Number String".split(";")
+
+WAGERS_DTYPES = {
+    "begin_draw": np.int32,
+    "end_draw": np.int32,
+    "qp": bool,
+    "ticket_cost": np.int16,
+    "numbers_wagered": str,
+}
+DRAWINGS_DTYPES = {
+    "Draw Nbr": np.int32,
+    "Draw Date": np.int32,
+    "Winning Number String": str,
+}
+
+PK = ["low_bits", "high_bits"]
+
+
+class WagerShard(NamedTuple):
+    path: str
+    # Wagers, with each row's 'ticket' the position of its numbers within 'tickets'.
+    wagers: pd.DataFrame
+    # Unique (low_bits, high_bits), in order of first appearance.
+    tickets: pd.DataFrame
+    elapsed: float
+
 
 def concat_csv(
     filepaths: List[str],
@@ -18,28 +59,399 @@ def concat_csv(
     return pd.concat(dfs)
 
 
-def process_keno_split_data(dirpath: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    get_paths = lambda glob: list(
-        sorted(map(lambda x: str(x), pathlib.Path(dirpath).glob(glob)))
+def read_typed_csv(
+    filepath: str,
+    names: List[str],
+    dtypes: Dict[str, Any],
+    sep: str = ";",
+    **kwargs: Any,
+) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+    """
+    Reads a headerless split file with its columns' dtypes: the number strings, of
+    fixed-width numbers, thereby keep their leading zeros (e.g.: "0506" is 05, 06,
+    not 506). Boolean columns are read from "T" and "F".
+
+    @param kwargs: passed along to pd.read_csv, e.g.: 'chunksize'.
+    """
+    return pd.read_csv(
+        filepath,
+        sep=sep,
+        names=names,
+        header=None,
+        dtype=dtypes,
+        true_values=["T"],
+        false_values=["F"],
+        **kwargs,
     )
 
-    wagers_paths = get_paths("split/*wager*")
-    wagers_names = "begin_draw;end_draw;qp;ticket_cost;numbers_wagered".split(";")
+
+def iter_csv_batches(
+    filepaths: List[str],
+    names: List[str],
+    dtypes: Dict[str, Any],
+    batch_size: int = 1_000_000,
+    sep: str = ";",
+) -> Iterator[pd.DataFrame]:
+    """
+    Streams headerless CSV files as typed batches of exactly 'batch_size' rows
+    (the last excepted), read across the files' boundaries. Only about one batch
+    is held in memory at once.
+
+    The files are read by 'read_typed_csv'. Each batch is indexed by its rows'
+    positions across all files, so that row ids are stable between batch sizes.
+
+    @param filepaths: files, read in the order given.
+    @param names: column names.
+    @param dtypes: column dtypes, passed along to pd.read_csv.
+    @param batch_size: number of rows per batch.
+    """
+    pending: List[pd.DataFrame] = []
+    n_pending = 0
+    start = 0
+
+    def take(n: int) -> pd.DataFrame:
+        nonlocal pending, n_pending, start
+
+        frame = pd.concat(pending, ignore_index=True)
+        batch, rest = frame.iloc[:n], frame.iloc[n:]
+        batch.index = pd.RangeIndex(start, start + len(batch))
+
+        pending, n_pending = [rest], len(rest)
+        start += len(batch)
+        return batch
+
+    for filepath in filepaths:
+        reader = read_typed_csv(filepath, names, dtypes, sep=sep, chunksize=batch_size)
+        for chunk in reader:
+            pending.append(chunk)
+            n_pending += len(chunk)
+
+            while n_pending >= batch_size:
+                yield take(batch_size)
+
+    if n_pending > 0:
+        yield take(n_pending)
+
+
+class TicketRegistry:
+    """
+    Incrementally assigns numbers_wagered ids, from 1, to the unique tickets
+    (low_bits, high_bits) in order of first appearance.
+    """
+
+    def __init__(self):
+        self.index = pd.MultiIndex.from_arrays(
+            [np.zeros(0, dtype=np.int64)] * len(PK), names=PK
+        )
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def map(self, tickets: pd.DataFrame) -> np.ndarray:
+        """Registers any new tickets; returns the numbers_wagered id of each row."""
+        keys = pd.MultiIndex.from_frame(tickets[PK].astype(np.int64))
+        positions = self.index.get_indexer(keys)
+
+        new = keys[positions < 0].unique()
+        if len(new) > 0:
+            self.index = self.index.append(new)
+            positions = self.index.get_indexer(keys)
+
+        return positions + 1
+
+    def numbers_wagered(self, ids: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """
+        The numbers_wagered table, indexed by id: all thereof,
+        or only that of the given ids.
+        """
+        ids = np.arange(1, len(self) + 1) if ids is None else np.unique(ids)
+
+        tickets = self.index[ids - 1].to_frame(index=False)
+        bit_info = get_bit_columns(tickets)
+
+        numbers_wagered = tickets.assign(
+            numbers_played=bit_info.popcount(),
+            number_string=get_number_strings(bit_info),
+        )
+        numbers_wagered.index = pd.Index(ids, name="id")
+
+        return numbers_wagered
+
+
+def get_split_paths(dirpath: str, glob: str) -> List[str]:
+    return list(sorted(map(lambda x: str(x), pathlib.Path(dirpath).glob(glob))))
+
+
+def process_keno_split_data(dirpath: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    wagers_paths = get_split_paths(dirpath, "split/*wager*")
     wagers = concat_csv(
         wagers_paths,
         sep=";",
-        names=wagers_names,
+        names=WAGERS_NAMES,
     )
 
-    drawings_paths = get_paths("split/*draw*")
-    drawings_names = "Draw Nbr;Draw Date;Winning Number String".split(";")
+    drawings_paths = get_split_paths(dirpath, "split/*draw*")
     drawings = concat_csv(
         drawings_paths,
         sep=";",
-        names=drawings_names,
+        names=DRAWINGS_NAMES,
     )
 
     return wagers, drawings
 
 
-wagers, drawings = process_keno_split_data("keno/data/keno_2017_2019")
+def process_wager_shard(path: str) -> WagerShard:
+    """
+    Parses, encodes and deduplicates a single wagers split file.
+    Run within a worker process by 'process_keno_split_data_parallel'.
+    """
+    t = time.perf_counter()
+
+    wagers = read_typed_csv(path, WAGERS_NAMES, WAGERS_DTYPES)
+    wagers = process_wagers(wagers)
+
+    # Groups are numbered in order of first appearance, as are the deduplicated rows.
+    codes = wagers.groupby(PK, sort=False).ngroup().to_numpy()
+    tickets = wagers[PK].drop_duplicates(ignore_index=True)
+    wagers = wagers.drop(PK, axis=1).assign(ticket=codes).reset_index(drop=True)
+
+    return WagerShard(path, wagers, tickets, time.perf_counter() - t)
+
+
+def merge_wager_shards(
+    shards: Sequence[WagerShard],
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Merges the shards, in the order given, into the wagers and numbers_wagered tables.
+
+    Global numbers_wagered ids are assigned, from 1, in order of first appearance
+    across the shards; both the ids and the wagers' order are thereby determined by
+    the shard order alone, and not by which worker finished first.
+
+    @returns (wagers, numbers_wagered): wagers, as per 'map_wagers', and
+                                        numbers_wagered, indexed by id.
+    """
+    registry = TicketRegistry()
+    wagers = []
+
+    for shard in shards:
+        # Local ticket codes to global ids.
+        ids = registry.map(shard.tickets)[shard.wagers["ticket"].to_numpy()]
+
+        wagers.append(
+            shard.wagers.drop("ticket", axis=1).assign(numbers_wagered_id=ids)
+        )
+
+    wagers = pd.concat(wagers, ignore_index=True)
+
+    return wagers, registry.numbers_wagered()
+
+
+def process_keno_split_data_parallel(
+    dirpath: str, workers: Optional[int] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Processes the keno split files, each wagers file being a shard processed
+    within its own worker process.
+
+    @param dirpath: directory whereunder the 'split' directory is located.
+    @param workers: number of worker processes; defaults to the number of CPUs.
+                    With 1, the shards are processed within this process.
+
+    @returns (wagers, numbers_wagered, drawings): as per 'merge_wager_shards'
+                                                  and 'process_drawings'.
+    """
+    wagers_paths = get_split_paths(dirpath, "split/*wager*")
+
+    t = time.perf_counter()
+
+    if workers == 1:
+        shard_iter = map(process_wager_shard, wagers_paths)
+        executor = None
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        # Results are yielded in the order of 'wagers_paths'.
+        shard_iter = executor.map(process_wager_shard, wagers_paths)
+
+    shards = []
+    try:
+        for shard in shard_iter:
+            print(
+                f"{os.path.basename(shard.path)}: {len(shard.wagers)} wagers, "
+                f"{len(shard.tickets)} unique tickets, {shard.elapsed:.2f}s"
+            )
+            shards.append(shard)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    wagers, numbers_wagered = merge_wager_shards(shards)
+
+    print(
+        f"Processed {len(shards)} shards: {len(wagers)} wagers, "
+        f"{len(numbers_wagered)} unique tickets, {time.perf_counter() - t:.2f}s"
+    )
+
+    drawings_paths = get_split_paths(dirpath, "split/*draw*")
+    drawings = process_drawings(
+        concat_csv(drawings_paths, sep=";", names=DRAWINGS_NAMES)
+    )
+
+    return wagers, numbers_wagered, drawings
+
+
+def stream_wagers(
+    dirpath: str, registry: TicketRegistry, batch_size: int = 1_000_000
+) -> Iterator[pd.DataFrame]:
+    """
+    Streams the keno wagers split files as processed batches of 'batch_size':
+    parsed, encoded, and mapped onto their numbers_wagered ids by 'registry'.
+
+    Memory is thereby bounded by the batch size, and the number of unique tickets,
+    rather than by the size of the dataset.
+
+    @returns wagers: batches, as per 'map_wagers', indexed by their row positions.
+    """
+    wagers_paths = get_split_paths(dirpath, "split/*wager*")
+
+    for batch in iter_csv_batches(
+        wagers_paths, WAGERS_NAMES, WAGERS_DTYPES, batch_size
+    ):
+        wagers = process_wagers(batch)
+        ids = registry.map(wagers)
+
+        yield wagers.drop(PK, axis=1).assign(numbers_wagered_id=ids)
+
+
+def stream_keno_split_data(
+    dirpath: str, batch_size: int = 1_000_000, score: bool = False
+) -> None:
+    """
+    Streams the keno split files into 'wagers.csv' (or, if scoring, 'scored_wagers.csv'),
+    'numbers_wagered.csv' and 'drawings.csv', one batch at a time.
+    """
+    drawings_paths = get_split_paths(dirpath, "split/*draw*")
+    drawings = process_drawings(
+        pd.concat(
+            iter_csv_batches(drawings_paths, DRAWINGS_NAMES, DRAWINGS_DTYPES),
+            ignore_index=True,
+        )
+    )
+    drawings.to_csv(os.path.join(dirpath, "drawings.csv"))
+
+    registry = TicketRegistry()
+    filename = "scored_wagers.csv" if score else "wagers.csv"
+    filepath = os.path.join(dirpath, filename)
+
+    t = time.perf_counter()
+    rows = 0
+
+    for i, wagers in enumerate(stream_wagers(dirpath, registry, batch_size)):
+        if score:
+            numbers_wagered = registry.numbers_wagered(wagers["numbers_wagered_id"])
+            wagers = wagers.join(
+                score_wager_ranges(wagers, numbers_wagered, drawings, PRIZE_MATRIX)
+            )
+
+        wagers.to_csv(
+            filepath,
+            mode="w" if i == 0 else "a",
+            header=i == 0,
+            index_label="wager_id",
+        )
+
+        rows += len(wagers)
+        print(
+            f"{filename}: batch {i}, {rows} wagers, "
+            f"{len(registry)} unique tickets, {time.perf_counter() - t:.2f}s"
+        )
+
+    registry.numbers_wagered().to_csv(os.path.join(dirpath, "numbers_wagered.csv"))
+
+
+def verify_split_readers(dirpath: str, batch_size: int = 1_000_000) -> bool:
+    """
+    Checks that the parallel ('process_keno_split_data_parallel') and streaming
+    ('stream_wagers') paths read the very same tickets from the split files: the
+    same numbers_wagered table, and the same numbers_wagered id for every wager.
+
+    @returns ok: whether the two agree; any disagreement is printed.
+    """
+    wagers, numbers_wagered, _ = process_keno_split_data_parallel(dirpath, workers=1)
+
+    registry = TicketRegistry()
+    streamed_ids = np.concatenate(
+        [
+            batch["numbers_wagered_id"].to_numpy()
+            for batch in stream_wagers(dirpath, registry, batch_size)
+        ]
+        or [np.zeros(0, dtype=np.int64)]
+    )
+    streamed_numbers_wagered = registry.numbers_wagered()
+
+    ok = True
+    if not numbers_wagered.equals(streamed_numbers_wagered):
+        print(
+            f"numbers_wagered differ: {len(numbers_wagered)} tickets in parallel, "
+            f"{len(streamed_numbers_wagered)} streamed."
+        )
+        ok = False
+    if not np.array_equal(wagers["numbers_wagered_id"].to_numpy(), streamed_ids):
+        print("The wagers' numbers_wagered ids differ.")
+        ok = False
+
+    if ok:
+        print(f"Both paths read {len(numbers_wagered)} identical tickets.")
+
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--dirpath", default="keno/data/keno_2017_2019")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes; defaults to the number of CPUs.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Stream the split files in batches of this many rows, within one process.",
+    )
+    parser.add_argument(
+        "--score",
+        action="store_true",
+        help="Whilst streaming, score each batch by draw range.",
+    )
+
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Check that the parallel and streaming paths read the same tickets.",
+    )
+
+    args = parser.parse_args()
+
+    if args.verify:
+        ok = verify_split_readers(args.dirpath, args.batch_size or 1_000_000)
+        raise SystemExit(0 if ok else 1)
+
+    if args.batch_size is not None:
+        stream_keno_split_data(args.dirpath, args.batch_size, args.score)
+        return
+
+    wagers, numbers_wagered, drawings = process_keno_split_data_parallel(
+        args.dirpath, args.workers
+    )
+
+    wagers.to_csv(os.path.join(args.dirpath, "wagers.csv"), index=False)
+    numbers_wagered.to_csv(os.path.join(args.dirpath, "numbers_wagered.csv"))
+    drawings.to_csv(os.path.join(args.dirpath, "drawings.csv"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import os
+from typing import *
+
+import numpy as np
+import pandas as pd
+
+from lottery_analysis.bitset import popcount64
+
+"""
+A persistent cache of the numbers matched by each unique ticket (numbers_wagered)
+against each drawing: one uint8 per pair.
+
+The matrix is stored in column tiles of 'tile_size' drawings, each a row-major,
+memory-mapped file of shape (tickets, tile_size). New tickets are appended to the end
+of every tile file; new drawings fill the last tile's free columns, and thereafter new
+tiles. Neither requires the rewriting of any prior cell.
+
+Scoring does not read it: gathering each wager's cell from the tiles is slower than
+popcounting the bits of its ticket and drawing afresh (see 'scoring.score_wagers').
+"""
+
+INDEX_FILENAME = "index.npz"
+
+
+class MatchCountCache:
+    """
+    @param dirpath: directory wherein the cache is (or is to be) stored.
+    @param tile_size: number of drawings per tile; fixed upon creation.
+    @param block_rows: number of tickets matched at once whilst filling a tile,
+                       bounding memory to roughly block_rows × tile_size × 24 bytes.
+    """
+
+    def __init__(self, dirpath: str, tile_size: int = 4096, block_rows: int = 1024):
+        self.dirpath = dirpath
+        self.block_rows = block_rows
+
+        os.makedirs(dirpath, exist_ok=True)
+
+        index_path = os.path.join(dirpath, INDEX_FILENAME)
+        if os.path.exists(index_path):
+            with np.load(index_path) as index:
+                self.tile_size = int(index["tile_size"])
+                self.ticket_ids = index["ticket_ids"]
+                self.draw_ids = index["draw_ids"]
+        else:
+            self.tile_size = tile_size
+            self.ticket_ids = np.zeros(0, dtype=np.int64)
+            self.draw_ids = np.zeros(0, dtype=np.int64)
+
+        self._ticket_index = pd.Index(self.ticket_ids)
+        self._draw_index = pd.Index(self.draw_ids)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return (len(self.ticket_ids), len(self.draw_ids))
+
+    @property
+    def n_tiles(self) -> int:
+        return -(-len(self.draw_ids) // self.tile_size)
+
+    def _tile_path(self, tile: int) -> str:
+        return os.path.join(self.dirpath, f"tile_{tile:05d}.u8")
+
+    def _open_tile(self, tile: int, n_rows: int, mode: str = "r") -> np.memmap:
+        return np.memmap(
+            self._tile_path(tile),
+            dtype=np.uint8,
+            mode=mode,
+            shape=(n_rows, self.tile_size),
+        )
+
+    def _match_counts(
+        self,
+        tickets: pd.DataFrame,
+        drawings: pd.DataFrame,
+        ticket_ids: np.ndarray,
+        draw_ids: np.ndarray,
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yields (row offset, block) of the match counts, 'block_rows' at a time."""
+        ticket_pos = tickets.index.get_indexer(ticket_ids)
+        draw_pos = drawings.index.get_indexer(draw_ids)
+
+        if (ticket_pos < 0).any() or (draw_pos < 0).any():
+            raise KeyError("Cache update is missing the bits of cached ids.")
+
+        draw_low = drawings["low_bits"].to_numpy(dtype=np.uint64)[draw_pos]
+        draw_high = drawings["high_bits"].to_numpy(dtype=np.uint64)[draw_pos]
+
+        ticket_low = tickets["low_bits"].to_numpy(dtype=np.uint64)[ticket_pos]
+        ticket_high = tickets["high_bits"].to_numpy(dtype=np.uint64)[ticket_pos]
+
+        for start in range(0, len(ticket_pos), self.block_rows):
+            rows = slice(start, start + self.block_rows)
+            counts = popcount64(ticket_low[rows, None] & draw_low) + popcount64(
+                ticket_high[rows, None] & draw_high
+            )
+            yield start, counts
+
+    def update(self, numbers_wagered: pd.DataFrame, drawings: pd.DataFrame) -> None:
+        """
+        Extends the cache with any tickets, or drawings, not yet therein.
+
+        @param numbers_wagered: DataFrame of numbers_wagered data, indexed by id;
+                                must include all previously cached tickets
+                                should new drawings be added, and vice versa.
+        @param drawings: DataFrame containing keno drawings data, indexed by id.
+        """
+        new_ticket_ids = numbers_wagered.index[
+            ~numbers_wagered.index.isin(self.ticket_ids)
+        ].to_numpy(dtype=np.int64)
+        new_draw_ids = drawings.index[~drawings.index.isin(self.draw_ids)].to_numpy(
+            dtype=np.int64
+        )
+
+        n_rows, n_cols = self.shape
+        tile_bytes = n_rows * self.tile_size
+
+        # Rows: append the new tickets, against the cached drawings, to each tile.
+        for tile in range(self.n_tiles):
+            path = self._tile_path(tile)
+            cols = self.draw_ids[tile * self.tile_size : (tile + 1) * self.tile_size]
+
+            # Discard rows left over by an interrupted update.
+            with open(path, "r+b") as file:
+                file.truncate(tile_bytes)
+
+            with open(path, "ab") as file:
+                for _, counts in self._match_counts(
+                    numbers_wagered, drawings, new_ticket_ids, cols
+                ):
+                    block = np.zeros((len(counts), self.tile_size), dtype=np.uint8)
+                    block[:, : len(cols)] = counts
+                    file.write(block.tobytes())
+
+        ticket_ids = np.concatenate([self.ticket_ids, new_ticket_ids])
+        draw_ids = np.concatenate([self.draw_ids, new_draw_ids])
+        n_rows = len(ticket_ids)
+
+        # Columns: fill the new drawings, against all tickets, tile by tile.
+        col_start = n_cols
+        while col_start < len(draw_ids):
+            tile = col_start // self.tile_size
+            tile_start = tile * self.tile_size
+            col_stop = min(tile_start + self.tile_size, len(draw_ids))
+
+            path = self._tile_path(tile)
+            if col_start == tile_start:
+                with open(path, "wb") as file:
+                    file.truncate(n_rows * self.tile_size)
+
+            mm = self._open_tile(tile, n_rows, mode="r+")
+            for start, counts in self._match_counts(
+                numbers_wagered, drawings, ticket_ids, draw_ids[col_start:col_stop]
+            ):
+                mm[
+                    start : start + len(counts),
+                    col_start - tile_start : col_stop - tile_start,
+                ] = counts
+            mm.flush()
+            del mm
+
+            col_start = col_stop
+
+        # The index is replaced last, and atomically: it alone marks the update as
+        # committed, and any rows, or tiles, past it are ignored (then overwritten).
+        index_path = os.path.join(self.dirpath, INDEX_FILENAME)
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            np.savez(
+                file,
+                tile_size=self.tile_size,
+                ticket_ids=ticket_ids,
+                draw_ids=draw_ids,
+            )
+        os.replace(tmp_path, index_path)
+
+        self.ticket_ids = ticket_ids
+        self.draw_ids = draw_ids
+        self._ticket_index = pd.Index(ticket_ids)
+        self._draw_index = pd.Index(draw_ids)
+
+    def lookup(
+        self,
+        numbers_wagered_ids: Union[pd.Series, np.ndarray],
+        draw_number_ids: Union[pd.Series, np.ndarray],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Looks up the numbers matched of each (numbers_wagered_id, draw_number_id) pair.
+
+        @returns (counts, valid): uint8 array of the numbers matched, and a boolean
+                                  array flagging the pairs found within the cache.
+        """
+        rows = self._ticket_index.get_indexer(np.asarray(numbers_wagered_ids))
+        cols = self._draw_index.get_indexer(np.asarray(draw_number_ids))
+
+        valid = (rows >= 0) & (cols >= 0)
+        counts = np.zeros(len(rows), dtype=np.uint8)
+
+        # Offsets within each tile's flattened file; pairs are grouped by tile, in a
+        # single pass, so that each tile's cells are gathered at once.
+        tiles, tile_cols = np.divmod(cols, self.tile_size)
+        offsets = rows.astype(np.int64) * self.tile_size + tile_cols
+
+        order = np.flatnonzero(valid)
+        order = order[np.argsort(tiles[order], kind="stable")]
+        bounds = np.searchsorted(tiles[order], np.arange(self.n_tiles + 1))
+
+        n_rows = len(self.ticket_ids)
+        for tile in range(self.n_tiles):
+            sel = order[bounds[tile] : bounds[tile + 1]]
+            if len(sel) == 0:
+                continue
+
+            mm = self._open_tile(tile, n_rows)
+            counts[sel] = np.asarray(mm).reshape(-1)[offsets[sel]]
+            del mm
+
+        return counts, valid
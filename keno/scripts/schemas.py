@@ -13,6 +13,7 @@ CREATE TABLE "drawings" (
 WAGERS_SCHEMA = """
 CREATE TABLE "wagers" (
 	"id"	INTEGER PRIMARY KEY AUTOINCREMENT,
+    "wager_id"  INTEGER,
     "date" INTEGER,
 	"draw_number_id"	INTEGER,
     "begin_draw"  INTEGER,
@@ -26,16 +27,34 @@ CREATE TABLE "wagers" (
 	"prize"	UNSIGNED INT,
 	FOREIGN KEY("draw_number_id") REFERENCES "drawings"("id"),
 	FOREIGN KEY("date") REFERENCES "drawings"("date"),
-	FOREIGN KEY("numbers_wagered") REFERENCES "numbers_wagered"("id")
+	FOREIGN KEY("numbers_wagered_id") REFERENCES "numbers_wagered"("id")
 );
 """
 
 NUMBERS_WAGERED_SCHEMA = """
 CREATE TABLE "numbers_wagered" (
 	"id"	INTEGER PRIMARY KEY AUTOINCREMENT,
-	"numbers_string"	TEXT,
+	"number_string"	TEXT,
 	"high_bits"	UNSIGNED SMALL INTEGER,
 	"low_bits"	UNSIGNED INTEGER,
 	"numbers_played"	TINY INTEGER
 );
 """
+
+DRAWING_NUMBERS_SCHEMA = """
+CREATE TABLE "drawing_numbers" (
+	"draw_id"	INTEGER NOT NULL,
+	"number"	TINY INTEGER NOT NULL,
+	PRIMARY KEY("draw_id", "number"),
+	FOREIGN KEY("draw_id") REFERENCES "drawings"("id")
+) WITHOUT ROWID;
+"""
+
+WAGER_NUMBERS_SCHEMA = """
+CREATE TABLE "wager_numbers" (
+	"numbers_wagered_id"	INTEGER NOT NULL,
+	"number"	TINY INTEGER NOT NULL,
+	PRIMARY KEY("numbers_wagered_id", "number"),
+	FOREIGN KEY("numbers_wagered_id") REFERENCES "numbers_wagered"("id")
+) WITHOUT ROWID;
+"""
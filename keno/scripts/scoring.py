@@ -0,0 +1,332 @@
+from typing import *
+
+import numpy as np
+import pandas as pd
+
+from lottery_analysis.bitset import popcount64
+
+"""
+Column-wise prize scoring of keno wagers.
+
+Wherein the bits of each wager's numbers and its drawing are gathered by their
+integer positions, AND'ed, popcount'ed, and priced all at once: no row-wise apply,
+nor label lookups, are performed.
+"""
+
+SCORE_COLUMNS = ["low_match_mask", "high_match_mask", "numbers_matched", "prize"]
+
+
+def build_prize_matrix(prize_dict: Dict[int, Dict[int, int]]) -> np.ndarray:
+    """
+    Densifies a nested prize dictionary, {spots: {matched: prize}}, into a
+    (spots × matched) matrix; absent entries are thereupon worth 0.
+
+    @param prize_dict: nested mapping of the numbers played and matched to a prize.
+
+    @returns prize_matrix: int64 matrix of shape (max_spots + 1, max_spots + 1).
+    """
+    max_spots = max(prize_dict)
+    prize_matrix = np.zeros((max_spots + 1, max_spots + 1), dtype=np.int64)
+
+    for spots, prizes in prize_dict.items():
+        for matched, prize in prizes.items():
+            prize_matrix[spots, matched] = prize
+
+    return prize_matrix
+
+
+def lookup_prizes(
+    prize_matrix: np.ndarray, spots: np.ndarray, matched: np.ndarray
+) -> np.ndarray:
+    """
+    Maps arrays of the numbers played and matched to their prizes,
+    equivalent to PRIZE_DICT.get(spots, {}).get(matched, 0) per element.
+    """
+    spots = np.asarray(spots, dtype=np.int64)
+    matched = np.asarray(matched, dtype=np.int64)
+
+    max_ix = prize_matrix.shape[0] - 1
+    in_range = (spots >= 0) & (spots <= max_ix) & (matched >= 0) & (matched <= max_ix)
+
+    prizes = prize_matrix[
+        np.where(in_range, spots, 0), np.where(in_range, matched, 0)
+    ]
+    return np.where(in_range, prizes, 0)
+
+
+def column_positions(frame: pd.DataFrame, ids: Union[pd.Series, np.ndarray]) -> np.ndarray:
+    """
+    Translates index labels into integer positions of 'frame';
+    labels absent therefrom (or NaN) are mapped to -1.
+    """
+    return frame.index.get_indexer(np.asarray(ids))
+
+
+def score_wagers(
+    numbers_wagered_ids: Union[pd.Series, np.ndarray],
+    draw_number_ids: Union[pd.Series, np.ndarray],
+    numbers_wagered: pd.DataFrame,
+    drawings: pd.DataFrame,
+    prize_matrix: np.ndarray,
+) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Scores a batch of wagers against their respective drawings.
+
+    Each wager's low and high bits are gathered via the integer positions of
+    'numbers_wagered_ids' and 'draw_number_ids', AND'ed with those of the drawing,
+    and then popcount'ed to find the numbers matched; the prize is then a single
+    gather from 'prize_matrix'.
+
+    @param numbers_wagered_ids: ids into 'numbers_wagered', one per wager.
+    @param draw_number_ids: ids into 'drawings', one per wager.
+    @param numbers_wagered: DataFrame of numbers_wagered data, indexed by id.
+    @param drawings: DataFrame containing keno drawings data, indexed by id.
+    @param prize_matrix: dense prize matrix, as built by 'build_prize_matrix'.
+
+    @returns (scores, valid): DataFrame of the SCORE_COLUMNS, one row per wager,
+                              and a boolean array flagging the wagers whose ids
+                              were found. Invalid wagers are scored as all zeros.
+    """
+    nw_pos = column_positions(numbers_wagered, numbers_wagered_ids)
+    draw_pos = column_positions(drawings, draw_number_ids)
+
+    valid = (nw_pos >= 0) & (draw_pos >= 0)
+    nw_pos = np.where(valid, nw_pos, 0)
+    draw_pos = np.where(valid, draw_pos, 0)
+
+    def gather(frame: pd.DataFrame, col: str, pos: np.ndarray) -> np.ndarray:
+        return frame[col].to_numpy(dtype=np.uint64)[pos]
+
+    zero = np.uint64(0)
+
+    low_match_mask = np.where(
+        valid,
+        gather(numbers_wagered, "low_bits", nw_pos)
+        & gather(drawings, "low_bits", draw_pos),
+        zero,
+    )
+    high_match_mask = np.where(
+        valid,
+        gather(numbers_wagered, "high_bits", nw_pos)
+        & gather(drawings, "high_bits", draw_pos),
+        zero,
+    )
+
+    numbers_matched = popcount64(low_match_mask).astype(np.int64) + popcount64(
+        high_match_mask
+    )
+    numbers_played = numbers_wagered["numbers_played"].to_numpy(dtype=np.int64)[nw_pos]
+
+    prize = np.where(
+        valid, lookup_prizes(prize_matrix, numbers_played, numbers_matched), 0
+    )
+
+    scores = pd.DataFrame(
+        {
+            "low_match_mask": low_match_mask.astype(np.int64),
+            "high_match_mask": high_match_mask.astype(np.int64),
+            "numbers_matched": numbers_matched,
+            "prize": prize.astype(np.int64),
+        }
+    )
+
+    return scores, valid
+
+
+def draw_positions(
+    drawings: pd.DataFrame,
+    begin_draws: Union[pd.Series, np.ndarray],
+    end_draws: Union[pd.Series, np.ndarray],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Translates inclusive draw id ranges, [begin_draw, end_draw], into half-open
+    ranges of positions, [begin, end), over the drawings sorted by id; only ids
+    present within 'drawings' are thereby covered, as with a BETWEEN join.
+
+    @returns (order, begin, end): the sorting permutation of 'drawings', and the
+                                  beginning and end positions thereinto.
+    """
+    draw_ids = drawings.index.to_numpy()
+    order = np.argsort(draw_ids, kind="stable")
+    sorted_ids = draw_ids[order]
+
+    begin = np.searchsorted(sorted_ids, np.asarray(begin_draws), side="left")
+    end = np.searchsorted(sorted_ids, np.asarray(end_draws), side="right")
+
+    return order, begin, np.maximum(end, begin)
+
+
+def range_sums(
+    values: np.ndarray, rows: np.ndarray, start: np.ndarray, stop: np.ndarray
+) -> np.ndarray:
+    """
+    Sums values[rows[i], start[i]:stop[i]] for each i, by way of
+    prefix sums taken along the second axis of 'values'.
+    """
+    cum = np.zeros((values.shape[0], values.shape[1] + 1), dtype=np.int64)
+    np.cumsum(values, axis=1, out=cum[:, 1:])
+
+    return cum[rows, stop] - cum[rows, start]
+
+
+def score_wager_ranges(
+    wagers: pd.DataFrame,
+    numbers_wagered: pd.DataFrame,
+    drawings: pd.DataFrame,
+    prize_matrix: np.ndarray,
+    block_size: int = 256,
+    ticket_block_size: int = 4096,
+) -> pd.DataFrame:
+    """
+    Scores multi-draw wagers over their entire [begin_draw, end_draw] range,
+    without exploding them into one row per drawing.
+
+    The drawings are walked in blocks of 'block_size'. For each, the unique
+    tickets (numbers_wagered) of the wagers overlapping the block are matched
+    against all of its drawings at once, and prefix sums of the prizes, and of each
+    match count, are taken along the drawings; a wager's clipped range within the
+    block then costs a single subtraction. Memory is bounded by
+    ticket_block_size × block_size.
+
+    @param wagers: unexploded wagers, with 'begin_draw', 'end_draw' and
+                   'numbers_wagered_id' columns (as produced by 'map_wagers').
+    @param numbers_wagered: DataFrame of numbers_wagered data, indexed by id.
+    @param drawings: DataFrame containing keno drawings data, indexed by id.
+    @param prize_matrix: dense prize matrix, as built by 'build_prize_matrix'.
+    @param block_size: number of drawings matched at once.
+    @param ticket_block_size: number of unique tickets matched at once.
+
+    @returns scores: DataFrame, indexed as 'wagers', of the number of 'draws'
+                     covered, 'matched_{k}': the number thereof wherein k numbers
+                     matched, and the total 'prize' over the range.
+    """
+    order, begin, end = draw_positions(
+        drawings, wagers["begin_draw"], wagers["end_draw"]
+    )
+
+    draws = end - begin
+
+    # Wagers of unknown tickets cover their draws, but score nothing.
+    nw_pos = column_positions(numbers_wagered, wagers["numbers_wagered_id"])
+    end = np.where(nw_pos >= 0, end, begin)
+
+    nw_low = numbers_wagered["low_bits"].to_numpy(dtype=np.uint64)
+    nw_high = numbers_wagered["high_bits"].to_numpy(dtype=np.uint64)
+    nw_played = numbers_wagered["numbers_played"].to_numpy(dtype=np.int64)
+
+    draw_low = drawings["low_bits"].to_numpy(dtype=np.uint64)[order]
+    draw_high = drawings["high_bits"].to_numpy(dtype=np.uint64)[order]
+
+    n_bins = max(prize_matrix.shape[0], int(nw_played.max(initial=0)) + 1)
+
+    hist = np.zeros((len(wagers), n_bins), dtype=np.int64)
+    prize = np.zeros(len(wagers), dtype=np.int64)
+
+    by_begin = np.argsort(begin, kind="stable")
+    sorted_begin = begin[by_begin]
+    max_draws = int((end - begin).max(initial=0))
+
+    for block_start in range(0, len(order), block_size):
+        block_end = min(block_start + block_size, len(order))
+
+        # Candidates begin no earlier than max_draws before the block.
+        lo = np.searchsorted(sorted_begin, block_start - max_draws, side="left")
+        hi = np.searchsorted(sorted_begin, block_end, side="left")
+        ix = by_begin[lo:hi]
+        ix = ix[end[ix] > block_start]
+
+        if len(ix) == 0:
+            continue
+
+        # Clipped, block-relative ranges.
+        start = np.maximum(begin[ix], block_start) - block_start
+        stop = np.minimum(end[ix], block_end) - block_start
+
+        tickets, inverse = np.unique(nw_pos[ix], return_inverse=True)
+        by_ticket = np.argsort(inverse, kind="stable")
+        ticket_bounds = np.searchsorted(
+            inverse[by_ticket], np.arange(0, len(tickets) + 1, ticket_block_size)
+        )
+        ticket_bounds = np.append(ticket_bounds, len(ix))
+
+        block_low = draw_low[block_start:block_end]
+        block_high = draw_high[block_start:block_end]
+
+        for t0, (w0, w1) in enumerate(zip(ticket_bounds[:-1], ticket_bounds[1:])):
+            if w0 == w1:
+                continue
+
+            t_ix = tickets[t0 * ticket_block_size : (t0 + 1) * ticket_block_size]
+            matched = popcount64(nw_low[t_ix, None] & block_low).astype(
+                np.int64
+            ) + popcount64(nw_high[t_ix, None] & block_high)
+
+            w = by_ticket[w0:w1]
+            row = inverse[w] - t0 * ticket_block_size
+            w_start, w_stop = start[w], stop[w]
+
+            spots = nw_played[t_ix, None]
+            prizes = lookup_prizes(prize_matrix, spots, matched)
+            prize[ix[w]] += range_sums(prizes, row, w_start, w_stop)
+
+            for k in range(n_bins):
+                hist[ix[w], k] += range_sums(matched == k, row, w_start, w_stop)
+
+    scores = pd.DataFrame({"draws": draws}, index=wagers.index)
+    for k in range(n_bins):
+        scores[f"matched_{k}"] = hist[:, k]
+    scores["prize"] = prize
+
+    return scores
+
+
+def iter_exploded_scores(
+    wagers: pd.DataFrame,
+    numbers_wagered: pd.DataFrame,
+    drawings: pd.DataFrame,
+    prize_matrix: np.ndarray,
+    batch_size: int = 100_000,
+) -> Iterator[pd.DataFrame]:
+    """
+    Lazily explodes, and scores, the unexploded 'wagers' into one row per drawing
+    within each wager's range: equivalent to the rows of 'explode_wagers' (sans
+    those without any drawing), scored by 'score_wagers'.
+
+    Rows are only materialized as the iterator is consumed, 'batch_size'
+    wagers at a time.
+
+    @returns batches: DataFrames of each wager's columns, with a 'wager_id' column
+                      of the wager's index label, the 'draw_number_id', and the
+                      SCORE_COLUMNS.
+    """
+    order, begin, end = draw_positions(
+        drawings, wagers["begin_draw"], wagers["end_draw"]
+    )
+    sorted_ids = drawings.index.to_numpy()[order]
+
+    for batch_start in range(0, len(wagers), batch_size):
+        batch = slice(batch_start, batch_start + batch_size)
+        counts = end[batch] - begin[batch]
+
+        rows = np.repeat(np.arange(len(counts)), counts)
+        # Offset of each exploded row within its wager's range.
+        offsets = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        exploded = (
+            wagers.iloc[batch]
+            .rename_axis("wager_id")
+            .reset_index()
+            .iloc[rows]
+            .reset_index(drop=True)
+        )
+        exploded["draw_number_id"] = sorted_ids[begin[batch][rows] + offsets]
+
+        scores, _ = score_wagers(
+            exploded["numbers_wagered_id"],
+            exploded["draw_number_id"],
+            numbers_wagered,
+            drawings,
+            prize_matrix,
+        )
+
+        yield pd.concat([exploded, scores], axis=1)
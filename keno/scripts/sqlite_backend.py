@@ -0,0 +1,162 @@
+import contextlib
+from typing import *
+
+import sqlalchemy as sqla
+
+from schemas import *
+
+"""
+A local SQLite backend for the keno pipeline, wherewith the tables of 'schemas'
+are created, bulk loaded and queried without any database server.
+
+Connections are opened in WAL mode, so that the analysis queries may read whilst a
+load is underway. During a bulk load ('bulk_load'), durability is relaxed, and the
+secondary indexes are dropped; they are recreated, and the tables analyzed, once
+the load completes, which is far cheaper than maintaining them row by row.
+"""
+
+TABLE_SCHEMAS = {
+    "drawings": DRAWINGS_SCHEMA,
+    "numbers_wagered": NUMBERS_WAGERED_SCHEMA,
+    "wagers": WAGERS_SCHEMA,
+    "drawing_numbers": DRAWING_NUMBERS_SCHEMA,
+    "wager_numbers": WAGER_NUMBERS_SCHEMA,
+}
+
+# Secondary indexes, by table, as used by the queries of keno/sql:
+# joins upon numbers_wagered_id and draw_number_id, the (numbers_played,
+# numbers_matched, prize) aggregations, and the (low_bits, high_bits) lookups
+# whereby the wagers are mapped onto their numbers_wagered ids. The bridge tables
+# are indexed number first, for the per-number GROUP BYs.
+INDEXES = {
+    "wagers": {
+        "ix_wagers_numbers_wagered_id": (
+            "numbers_wagered_id",
+            "numbers_matched",
+            "prize",
+        ),
+        "ix_wagers_draw_number_id": ("draw_number_id",),
+    },
+    "numbers_wagered": {
+        "ix_numbers_wagered_bits": ("low_bits", "high_bits"),
+    },
+    "drawings": {
+        "ix_drawings_date": ("date",),
+    },
+    "drawing_numbers": {
+        "ix_drawing_numbers_number": ("number", "draw_id"),
+    },
+    "wager_numbers": {
+        "ix_wager_numbers_number": ("number", "numbers_wagered_id"),
+    },
+}
+
+# Pragmas set upon every connection.
+CONNECT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -256 * 1024,
+    "mmap_size": 2**30,
+}
+
+# Pragmas set for the duration of a bulk load, then reset to CONNECT_PRAGMAS.
+BULK_LOAD_PRAGMAS = {
+    "synchronous": "OFF",
+    "cache_size": -1024 * 1024,
+}
+
+
+def set_pragmas(dbapi_conn: Any, pragmas: Dict[str, Any]) -> None:
+    cursor = dbapi_conn.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+
+def create_sqlite_engine(path: str) -> sqla.engine.Engine:
+    """
+    Creates an engine for the SQLite database at 'path',
+    each connection whereof is set with CONNECT_PRAGMAS.
+    """
+    engine = sqla.create_engine(f"sqlite:///{path}")
+
+    @sqla.event.listens_for(engine, "connect")
+    def on_connect(dbapi_conn, connection_record):
+        set_pragmas(dbapi_conn, CONNECT_PRAGMAS)
+
+    return engine
+
+
+def table_names(conn: sqla.engine.Connection) -> List[str]:
+    return [
+        row[0]
+        for row in conn.execute(
+            sqla.text("SELECT name FROM sqlite_master WHERE type = 'table'")
+        )
+    ]
+
+
+def create_tables(conn: sqla.engine.Connection) -> None:
+    """Creates those tables of 'schemas' not yet present, along with their indexes."""
+    existing = table_names(conn)
+
+    for table_name, schema in TABLE_SCHEMAS.items():
+        if table_name not in existing:
+            conn.execute(sqla.text(schema))
+
+    create_indexes(conn)
+
+
+def create_indexes(
+    conn: sqla.engine.Connection, tables: Optional[Iterable[str]] = None
+) -> None:
+    existing = table_names(conn)
+
+    for table_name in tables or INDEXES:
+        if table_name not in existing:
+            continue
+
+        for index_name, columns in INDEXES.get(table_name, {}).items():
+            cols = ", ".join(f'"{col}"' for col in columns)
+            conn.execute(
+                sqla.text(
+                    f'CREATE INDEX IF NOT EXISTS "{index_name}" '
+                    f'ON "{table_name}" ({cols})'
+                )
+            )
+
+        conn.execute(sqla.text(f'ANALYZE "{table_name}"'))
+
+
+def drop_indexes(conn: sqla.engine.Connection, tables: Iterable[str]) -> None:
+    for table_name in tables:
+        for index_name in INDEXES.get(table_name, {}):
+            conn.execute(sqla.text(f'DROP INDEX IF EXISTS "{index_name}"'))
+
+
+@contextlib.contextmanager
+def bulk_load(conn: sqla.engine.Connection, tables: Iterable[str]) -> Iterator[None]:
+    """
+    Prepares 'conn' for the bulk loading of 'tables': their secondary indexes
+    are dropped, and durability relaxed: the load survives a crash of the process,
+    but not necessarily one of the machine. Upon exiting, the indexes are recreated.
+
+    Usage:
+        with bulk_load(conn, ["wagers"]):
+            with BulkWriter("wagers", conn, batch_size=100_000) as writer:
+                writer.write(wagers)
+    """
+    tables = list(tables)
+    dbapi_conn = conn.connection
+
+    drop_indexes(conn, tables)
+    set_pragmas(dbapi_conn, BULK_LOAD_PRAGMAS)
+
+    try:
+        yield
+    finally:
+        set_pragmas(
+            dbapi_conn, {name: CONNECT_PRAGMAS[name] for name in BULK_LOAD_PRAGMAS}
+        )
+        create_indexes(conn, tables)
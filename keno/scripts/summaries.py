@@ -0,0 +1,263 @@
+from typing import *
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as sqla
+
+from utils import iter_sql_chunks
+
+"""
+Aggregate tables of the scored wagers, maintained incrementally as they are written,
+so that the prize and match distributions need not rescan the wagers table.
+
+Each summary holds, per key, the number of 'wagers', 'winners' (prize > 0) and
+'losers', and the 'prize' sum:
+
+    summary_played_matched: by (numbers_played, numbers_matched).
+    summary_time_of_day: by the (hour, minute) of the drawing.
+    summary_day: by the day of the drawing, as epoch seconds of its midnight.
+
+'SummaryTables.update' is to be called within the very transaction wherein a batch
+of wagers is inserted; 'SummaryTables.verify' recomputes the summaries from the
+wagers table, and reports any difference; 'SummaryTables.rebuild' replaces them by
+those recomputed.
+"""
+
+VALUE_COLUMNS = ["wagers", "winners", "losers", "prize"]
+
+SUMMARY_KEYS = {
+    "summary_played_matched": ["numbers_played", "numbers_matched"],
+    "summary_time_of_day": ["hour", "minute"],
+    "summary_day": ["day"],
+}
+
+
+def aggregate_wagers(
+    wagers: pd.DataFrame, numbers_wagered: pd.DataFrame, drawings: pd.DataFrame
+) -> Dict[str, pd.DataFrame]:
+    """
+    Aggregates a batch of scored wagers into each summary.
+
+    @param wagers: scored wagers, with 'numbers_wagered_id', 'draw_number_id',
+                   'numbers_matched' and 'prize' columns.
+    @param numbers_wagered: DataFrame containing numbers_wagered data, indexed by id.
+    @param drawings: DataFrame containing keno drawings data, indexed by id,
+                     the dates being epoch seconds.
+
+    @returns summaries: DataFrame of the VALUE_COLUMNS of each summary, by its keys.
+    """
+    prize = wagers["prize"].to_numpy(dtype=np.int64)
+
+    nw_pos = numbers_wagered.index.get_indexer(wagers["numbers_wagered_id"])
+    draw_pos = drawings.index.get_indexer(wagers["draw_number_id"])
+
+    numbers_played = numbers_wagered["numbers_played"].to_numpy(dtype=np.int64)
+    dates = drawings["date"].to_numpy(dtype=np.int64)
+
+    # Unknown ids are keyed as -1.
+    played = np.where(nw_pos >= 0, numbers_played[nw_pos], -1)
+    date = np.where(draw_pos >= 0, dates[draw_pos], -1)
+    seconds = date % 86400
+
+    frame = pd.DataFrame(
+        {
+            "numbers_played": played,
+            "numbers_matched": wagers["numbers_matched"].to_numpy(dtype=np.int64),
+            "hour": np.where(draw_pos >= 0, seconds // 3600, -1),
+            "minute": np.where(draw_pos >= 0, seconds % 3600 // 60, -1),
+            "day": np.where(draw_pos >= 0, date - seconds, -1),
+            "wagers": 1,
+            "winners": (prize > 0).astype(np.int64),
+            "losers": (prize == 0).astype(np.int64),
+            "prize": prize,
+        }
+    )
+
+    return {
+        table_name: frame.groupby(keys)[VALUE_COLUMNS].sum().reset_index()
+        for table_name, keys in SUMMARY_KEYS.items()
+    }
+
+
+def add_summaries(
+    a: Dict[str, pd.DataFrame], b: Dict[str, pd.DataFrame]
+) -> Dict[str, pd.DataFrame]:
+    summaries = {}
+
+    for table_name, keys in SUMMARY_KEYS.items():
+        frame = pd.concat([a[table_name], b[table_name]], ignore_index=True)
+        summaries[table_name] = frame.groupby(keys)[VALUE_COLUMNS].sum().reset_index()
+
+    return summaries
+
+
+class SummaryTables:
+    """
+    The summary tables, created upon 'conn' if absent.
+
+    @param conn: connection whereupon the summaries are stored; the same
+                 connection wherewith the wagers are written.
+    @param numbers_wagered: DataFrame containing numbers_wagered data, indexed by id.
+    @param drawings: DataFrame containing keno drawings data, indexed by id.
+    """
+
+    def __init__(
+        self,
+        conn: sqla.engine.Connection,
+        numbers_wagered: pd.DataFrame,
+        drawings: pd.DataFrame,
+    ):
+        self.conn = conn
+        self.numbers_wagered = numbers_wagered
+        self.drawings = drawings
+
+        metadata = sqla.MetaData(bind=conn)
+        self.tables = {
+            table_name: sqla.Table(
+                table_name,
+                metadata,
+                *[sqla.Column(key, sqla.BigInteger, primary_key=True) for key in keys],
+                *[sqla.Column(col, sqla.BigInteger) for col in VALUE_COLUMNS],
+            )
+            for table_name, keys in SUMMARY_KEYS.items()
+        }
+        metadata.create_all(conn, checkfirst=True)
+
+    def update(self, wagers: pd.DataFrame) -> None:
+        """
+        Adds a batch of scored wagers to the summaries. Call within the transaction
+        wherein the batch is inserted.
+        """
+        for table_name, delta in aggregate_wagers(
+            wagers, self.numbers_wagered, self.drawings
+        ).items():
+            self._add(table_name, delta)
+
+    def _add(self, table_name: str, delta: pd.DataFrame) -> None:
+        if delta.empty:
+            return
+
+        table = self.tables[table_name]
+        keys = SUMMARY_KEYS[table_name]
+
+        existing = pd.read_sql(sqla.select([table.c[key] for key in keys]), self.conn)
+        exists = pd.MultiIndex.from_frame(delta[keys]).isin(
+            pd.MultiIndex.from_frame(existing[keys])
+        )
+
+        rows = [
+            {k: int(v) for k, v in row.items()}
+            for row in delta.to_dict(orient="records")
+        ]
+        updates = [row for row, e in zip(rows, exists) if e]
+        inserts = [row for row, e in zip(rows, exists) if not e]
+
+        if updates:
+            # Bound as 'b_<column>', as bind names may not shadow the column names.
+            stmt = (
+                table.update()
+                .where(
+                    sqla.and_(
+                        *[table.c[key] == sqla.bindparam(f"b_{key}") for key in keys]
+                    )
+                )
+                .values(
+                    {
+                        col: table.c[col] + sqla.bindparam(f"b_{col}")
+                        for col in VALUE_COLUMNS
+                    }
+                )
+            )
+            self.conn.execute(
+                stmt,
+                [{f"b_{k}": v for k, v in row.items()} for row in updates],
+            )
+        if inserts:
+            self.conn.execute(table.insert(), inserts)
+
+    def missing(self, wagers_table_name: str = "wagers") -> bool:
+        """
+        Whether the summaries are empty whilst the wagers table is not: as when they
+        are first maintained after wagers were already scored.
+        """
+
+        def is_empty(table: sqla.sql.expression.TableClause) -> bool:
+            query = sqla.select([1]).select_from(table).limit(1)
+            return self.conn.execute(query).first() is None
+
+        return all(map(is_empty, self.tables.values())) and not is_empty(
+            sqla.table(wagers_table_name)
+        )
+
+    def read(self) -> Dict[str, pd.DataFrame]:
+        return {
+            table_name: pd.read_sql(
+                table.select().order_by(*table.primary_key.columns), self.conn
+            )
+            for table_name, table in self.tables.items()
+        }
+
+    def recompute(
+        self, wagers_table_name: str = "wagers", chunk_size: int = 1_000_000
+    ) -> Dict[str, pd.DataFrame]:
+        """Recomputes the summaries from the wagers table, streamed in chunks."""
+        sql = (
+            "SELECT numbers_wagered_id, draw_number_id, numbers_matched, prize "
+            f"FROM {wagers_table_name}"
+        )
+        summaries = {
+            table_name: pd.DataFrame(columns=keys + VALUE_COLUMNS, dtype=np.int64)
+            for table_name, keys in SUMMARY_KEYS.items()
+        }
+
+        for chunk in iter_sql_chunks(sql, self.conn, chunk_size):
+            summaries = add_summaries(
+                summaries, aggregate_wagers(chunk, self.numbers_wagered, self.drawings)
+            )
+
+        return summaries
+
+    def rebuild(self, wagers_table_name: str = "wagers") -> None:
+        """Replaces the summaries by those recomputed from the wagers table."""
+        summaries = self.recompute(wagers_table_name)
+
+        with self.conn.begin():
+            for table_name, table in self.tables.items():
+                self.conn.execute(table.delete())
+                self._add(table_name, summaries[table_name])
+
+    def verify(self, wagers_table_name: str = "wagers") -> bool:
+        """
+        Recomputes the summaries from the wagers table, and diffs them against
+        those stored, printing any rows that differ.
+
+        @returns ok: whether all summaries matched.
+        """
+        recomputed = self.recompute(wagers_table_name)
+        stored = self.read()
+        ok = True
+
+        for table_name, keys in SUMMARY_KEYS.items():
+            diff = (
+                stored[table_name]
+                .merge(
+                    recomputed[table_name],
+                    on=keys,
+                    how="outer",
+                    suffixes=("_stored", "_recomputed"),
+                )
+                .fillna(0)
+            )
+
+            mismatched = np.zeros(len(diff), dtype=bool)
+            for col in VALUE_COLUMNS:
+                mismatched |= diff[f"{col}_stored"] != diff[f"{col}_recomputed"]
+
+            if mismatched.any():
+                ok = False
+                print(f"{table_name}: {mismatched.sum()} rows differ.")
+                print(diff[mismatched].to_string(index=False))
+            else:
+                print(f"{table_name}: {len(diff)} rows match.")
+
+        return ok
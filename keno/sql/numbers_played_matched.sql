@@ -1,13 +1,3 @@
-WITH
-    toast
-    AS
-    (
-        SELECT tickets.numbers_wagered_id, numbers_wagered.number_string, tickets.numbers_matched, tickets.prize, numbers_wagered.id, numbers_wagered.numbers_played, tickets.prize
-        FROM numbers_wagered
-            INNER JOIN tickets ON tickets.numbers_wagered_id = numbers_wagered.id
-    )
-
-SELECT toast.numbers_played, toast.numbers_matched, count(*) AS cnt, sum(toast.prize)
-FROM toast
-GROUP BY toast.numbers_played, toast.numbers_matched
-ORDER BY toast.numbers_played, toast.numbers_matched ASC
+SELECT summary_played_matched.numbers_played, summary_played_matched.numbers_matched, summary_played_matched.wagers AS cnt, summary_played_matched.prize
+FROM summary_played_matched
+ORDER BY summary_played_matched.numbers_played, summary_played_matched.numbers_matched ASC
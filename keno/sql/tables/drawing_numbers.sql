@@ -0,0 +1,7 @@
+CREATE TABLE `drawing_numbers` (
+    `draw_id` INT UNSIGNED NOT NULL,
+    `number` TINYINT UNSIGNED NOT NULL,
+    PRIMARY KEY(`draw_id`, `number`),
+    KEY `ix_drawing_numbers_number` (`number`, `draw_id`),
+    FOREIGN KEY(`draw_id`) REFERENCES `drawings`(`id`)
+);
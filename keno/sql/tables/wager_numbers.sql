@@ -0,0 +1,7 @@
+CREATE TABLE `wager_numbers` (
+    `numbers_wagered_id` INT UNSIGNED NOT NULL,
+    `number` TINYINT UNSIGNED NOT NULL,
+    PRIMARY KEY(`numbers_wagered_id`, `number`),
+    KEY `ix_wager_numbers_number` (`number`, `numbers_wagered_id`),
+    FOREIGN KEY(`numbers_wagered_id`) REFERENCES `numbers_wagered`(`id`)
+);
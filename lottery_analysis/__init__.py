@@ -0,0 +1,20 @@
+"""Shared utilities for the keno and cash345 analyses."""
+
+from lottery_analysis.bitset import (
+    BitSet,
+    bits_to_nums,
+    nums_to_bits,
+    popcount64,
+    popcount64d,
+)
+from lottery_analysis.codec import decode_strings, encode_strings
+
+__all__ = [
+    "BitSet",
+    "bits_to_nums",
+    "nums_to_bits",
+    "popcount64",
+    "popcount64d",
+    "decode_strings",
+    "encode_strings",
+]
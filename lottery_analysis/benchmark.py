@@ -0,0 +1,214 @@
+import gc
+import json
+import os
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+from typing import *
+
+import numpy as np
+import pandas as pd
+
+"""
+A harness for timing the stages of a pipeline: the wall time, throughput and peak
+memory of each, reported, saved as a JSON baseline, and compared against thereafter.
+
+Peak memory is that traced by 'tracemalloc' over the stage's call: all allocations
+made via Python's, and NumPy's, allocators, but not those made natively by,
+e.g., SQLite. Tracing slows the allocation of many small Python objects; pass
+'trace_memory=False' for the purest timings.
+
+Usage:
+    benchmark = Benchmark("keno", params={"wagers": 1_000_000})
+    drawings = benchmark.run("process_drawings", process_drawings, drawings)
+    benchmark.report()
+    benchmark.save("baseline.json")
+"""
+
+
+class Measurement(NamedTuple):
+    stage: str
+    rows: int
+    seconds: float
+    # None if memory was not traced.
+    peak_bytes: Optional[int]
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float("inf")
+
+
+def count_rows(result: Any) -> int:
+    """Rows of a stage's result: its length, or that of its first element if a tuple."""
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    return len(result) if hasattr(result, "__len__") else 0
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+class Benchmark:
+    """
+    @param name: name of the benchmarked pipeline.
+    @param params: parameters whereby the data were generated (the scale, seed, &c.);
+                   saved alongside the measurements, and checked upon comparison.
+    @param trace_memory: whether to trace the peak memory of each stage.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        params: Optional[Dict[str, Any]] = None,
+        trace_memory: bool = True,
+    ):
+        self.name = name
+        self.params = params or {}
+        self.trace_memory = trace_memory
+        self.measurements: List[Measurement] = []
+
+    def run(
+        self,
+        stage: str,
+        func: Callable[..., Any],
+        *args: Any,
+        rows: Optional[Union[int, Callable[[Any], int]]] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Calls 'func(*args, **kwargs)', measuring it as 'stage'.
+
+        @param rows: number of rows processed, or a function thereof upon the result;
+                     defaults to 'count_rows' of the result.
+
+        @returns result: that of 'func'.
+        """
+        gc.collect()
+
+        if self.trace_memory:
+            tracemalloc.start()
+
+        t = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - t
+
+            peak_bytes = None
+            if self.trace_memory:
+                peak_bytes = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+        if rows is None:
+            rows = count_rows(result)
+        elif callable(rows):
+            rows = rows(result)
+
+        measurement = Measurement(stage, int(rows), seconds, peak_bytes)
+        self.measurements.append(measurement)
+        print(format_measurement(measurement))
+
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "params": self.params,
+            "environment": environment(),
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "stages": {m.stage: m._asdict() for m in self.measurements},
+        }
+
+    def save(self, path: str) -> None:
+        """Saves the measurements as a JSON baseline, atomically."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.to_dict(), file, indent=4)
+        os.replace(tmp_path, path)
+
+    def report(self) -> pd.DataFrame:
+        report = pd.DataFrame(
+            [
+                {
+                    "stage": m.stage,
+                    "rows": m.rows,
+                    "seconds": m.seconds,
+                    "rows/s": m.rows_per_second,
+                    "peak MiB": (
+                        m.peak_bytes / 2**20 if m.peak_bytes is not None else np.nan
+                    ),
+                }
+                for m in self.measurements
+            ]
+        )
+        print(report.to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+        return report
+
+    def compare(
+        self, baseline: Union[str, Dict[str, Any]], tolerance: float = 0.2
+    ) -> List[str]:
+        """
+        Compares the measurements against a baseline, as saved by 'save'.
+
+        A stage has regressed should its time, or its peak memory, exceed that of
+        the baseline by more than 'tolerance' (a fraction thereof). Stages absent
+        from either are reported, but are not regressions.
+
+        @returns regressions: the stages that regressed.
+        """
+        if isinstance(baseline, str):
+            with open(baseline) as file:
+                baseline = json.load(file)
+
+        if baseline["params"] != self.params:
+            print(
+                f"Warning: the baseline's params {baseline['params']} differ from "
+                f"{self.params}; the comparison is likely meaningless."
+            )
+
+        stages = baseline["stages"]
+        regressions = []
+
+        for m in self.measurements:
+            if m.stage not in stages:
+                print(f"{m.stage}: absent from the baseline.")
+                continue
+
+            base = stages[m.stage]
+            time_ratio = m.seconds / base["seconds"] if base["seconds"] > 0 else 1.0
+            line = f"{m.stage}: {time_ratio:.2f}x time"
+
+            regressed = time_ratio > 1 + tolerance
+
+            if m.peak_bytes is not None and base["peak_bytes"]:
+                memory_ratio = m.peak_bytes / base["peak_bytes"]
+                line += f", {memory_ratio:.2f}x peak memory"
+                regressed |= memory_ratio > 1 + tolerance
+
+            if regressed:
+                regressions.append(m.stage)
+                line += " - REGRESSED"
+
+            print(line)
+
+        for stage in sorted(set(stages) - {m.stage for m in self.measurements}):
+            print(f"{stage}: not measured.")
+
+        return regressions
+
+
+def format_measurement(m: Measurement) -> str:
+    line = (
+        f"{m.stage}: {m.rows} rows, {m.seconds:.3f}s, {m.rows_per_second:,.0f} rows/s"
+    )
+    if m.peak_bytes is not None:
+        line += f", peak {m.peak_bytes / 2 ** 20:,.1f} MiB"
+    return line
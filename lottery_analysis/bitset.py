@@ -0,0 +1,372 @@
+import math
+import textwrap
+from typing import *
+
+import numpy as np
+
+from lottery_analysis.codec import decode_strings, encode_strings
+
+"""
+For all things bit and integer array related.
+Facilitates easy bitwise operation on arbitrarily sized bit arrays.
+
+An important distinction to be made:
+
+When 'bit array' is used, this refers to an actual array of bits; ones and zeros,
+e.g.: [0, 1, 0, 1, 0, ...].
+
+When 'int array' is used, this refers to the integer array representation of a bit array
+of length N, wherein the integer array's length is M = ceil(N / bit_length).
+
+Shared by both the keno and cash345 scripts. The scalar functions,
+'nums_to_bits', 'bits_to_nums' and 'popcount64d', operate upon a single int array;
+'BitSet' operates upon N of them at once, backed by a uint64 NumPy array;
+its number strings are encoded, and decoded, in batch by 'codec'.
+"""
+
+
+def nums_to_bits(
+    nums: str,
+    bit_length: int,
+    max_num: int,
+    delim: Optional[str] = None,
+    num_length: Optional[int] = None,
+) -> List[int]:
+    """
+    Converts a given number or sequence of numbers into N bit_length integers,
+    where N = ceil(max_num / bit_length).
+
+    The process wherewith the conversion takes place is simple: if a
+    number is located within 'nums', set that numbers' bit
+    (located at [floor(num / bit_length)][num % bit_length])
+    to 1, else 0.
+
+    @param nums: string of numbers deliminated by either 'delim' or 'num_length'
+    @param max_num: maximum number availed for use within 'nums'
+    @param bit_length: the interval therewith the integers are sized.
+    @param delim: delimiter used for 'nums'
+    @param num_length: if no delimiter is provided, split 'nums' at every 'num_length' interval.
+
+    @returns bits: array of bit flags masquerading as integers.
+    """
+    arr = (
+        nums.split(delim)
+        if delim is not None
+        else textwrap.wrap(nums, num_length or -1)
+    )
+
+    N = math.ceil(max_num / bit_length)
+    bits = [0] * N
+
+    for i in arr:
+        n = int(i)
+        ix = n // bit_length
+        bits[ix] |= 1 << (n % bit_length)
+
+    return bits
+
+
+def bits_to_nums(
+    bits: List[int],
+    bit_length: int,
+    delim: Optional[str] = None,
+    num_length: Optional[int] = None,
+) -> str:
+    """
+    Converts an array of integers (therein an array of bit flags), into a
+    sequence of numbers delimited by 'delim' or separated by 'num_length'.
+
+    The function simply bit shifts each number therein 'bits' by 1 until a subsequent AND
+    with 1 results in a non-zero value.
+
+    @param bits: array of bit flags masquerading as integers.
+    @param delim: delimiter used for 'nums'
+    @param bit_length: the interval therewith the integers are sized.
+    @param num_length: if no delimiter is provided, zero pad each number to 'num_length'.
+
+    @param return: string of numbers delimited by either 'delim' or 'num_length'
+    """
+    nums = []
+
+    for n, i in enumerate(bits):
+        num = n * bit_length
+
+        while i != 0:
+            if i & 1 != 0:
+                nums.append(str(num).zfill(num_length or 0))
+            num += 1
+            i >>= 1
+
+    return (delim or "").join(nums)
+
+
+def popcount64d(num: int) -> int:
+    """
+    Computes the Hamming Weight of a given binary number.
+    See https://en.wikipedia.org/wiki/Hamming_weight for more information.
+
+    @param num: input integer for which the Hamming Weight is computed.
+
+    @returns i: the corresponding Hamming Weight of num.
+    """
+    i = 0
+    while i < num:
+        num &= num - 1
+        i += 1
+    return i
+
+
+POPCOUNT_M1 = np.uint64(0x5555555555555555)
+POPCOUNT_M2 = np.uint64(0x3333333333333333)
+POPCOUNT_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+POPCOUNT_H01 = np.uint64(0x0101010101010101)
+
+
+def popcount64(nums: np.ndarray) -> np.ndarray:
+    """
+    Vectorized counterpart of 'popcount64d': computes the Hamming Weight of
+    every element within an array of 64-bit integers at once.
+
+    Uses the branchless SWAR (SIMD within a register) reduction, summing adjacent
+    bit-fields of doubling width until each byte holds its own count; the final
+    multiply thereupon accumulates the byte counts into the uppermost byte.
+
+    @param nums: array of integers, each of which is interpreted as uint64.
+
+    @returns counts: uint8 array of the corresponding Hamming Weights.
+    """
+    x = np.asarray(nums).astype(np.uint64, copy=True)
+
+    x -= (x >> np.uint64(1)) & POPCOUNT_M1
+    x = (x & POPCOUNT_M2) + ((x >> np.uint64(2)) & POPCOUNT_M2)
+    x = (x + (x >> np.uint64(4))) & POPCOUNT_M4
+    x *= POPCOUNT_H01
+
+    return (x >> np.uint64(56)).astype(np.uint8)
+
+
+class BitSet:
+    """
+    N fixed-width bitsets, each spanning the numbers [0, max_num), stored as an
+    int array of M = ceil(max_num / bit_length) words per row: 'words' is a uint64
+    array of shape (N, M).
+
+    Number n is located at word floor(n / bit_length), bit n % bit_length; this is
+    the same layout as 'nums_to_bits', so that for keno (bit_length = 63) the word
+    columns are exactly the stored (low_bits, high_bits).
+
+    @param words: uint64 array of shape (N, M).
+    @param max_num: one past the largest number representable.
+    @param bit_length: number of bits used per word; at most 64.
+    """
+
+    def __init__(self, words: np.ndarray, max_num: int, bit_length: int = 64):
+        if not 0 < bit_length <= 64:
+            raise ValueError(f"bit_length must be within (0, 64], got {bit_length}.")
+
+        n_words = math.ceil(max_num / bit_length)
+        words = np.asarray(words, dtype=np.uint64)
+
+        if words.ndim == 1:
+            words = words.reshape(-1, n_words)
+        if words.ndim != 2 or words.shape[1] != n_words:
+            raise ValueError(
+                f"Expected words of shape (N, {n_words}), got {words.shape}."
+            )
+
+        self.words = words
+        self.max_num = max_num
+        self.bit_length = bit_length
+
+    @property
+    def n_words(self) -> int:
+        return self.words.shape[1]
+
+    def __len__(self) -> int:
+        return self.words.shape[0]
+
+    def __getitem__(self, ix: Any) -> "BitSet":
+        words = self.words[ix]
+        return BitSet(words.reshape(-1, self.n_words), self.max_num, self.bit_length)
+
+    def __repr__(self) -> str:
+        return (
+            f"BitSet(N={len(self)}, max_num={self.max_num}, "
+            f"bit_length={self.bit_length})"
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, BitSet):
+            return NotImplemented
+        return self._layout() == other._layout() and np.array_equal(
+            self.words, other.words
+        )
+
+    def _layout(self) -> Tuple[int, int]:
+        return (self.max_num, self.bit_length)
+
+    def _binary_op(self, other: "BitSet", op: np.ufunc) -> "BitSet":
+        if self._layout() != other._layout():
+            raise ValueError(f"Incompatible BitSet layouts: {self} and {other}.")
+        # A single row broadcasts against all N rows of the other operand.
+        return BitSet(op(self.words, other.words), self.max_num, self.bit_length)
+
+    def __and__(self, other: "BitSet") -> "BitSet":
+        return self._binary_op(other, np.bitwise_and)
+
+    def __or__(self, other: "BitSet") -> "BitSet":
+        return self._binary_op(other, np.bitwise_or)
+
+    def __xor__(self, other: "BitSet") -> "BitSet":
+        return self._binary_op(other, np.bitwise_xor)
+
+    @classmethod
+    def from_membership(cls, membership: np.ndarray, bit_length: int = 64) -> "BitSet":
+        """
+        Encodes a boolean membership matrix of shape (N, max_num), wherein
+        membership[i, n] flags whether number n is present within row i.
+        """
+        membership = np.asarray(membership, dtype=bool)
+        N, max_num = membership.shape
+        n_words = math.ceil(max_num / bit_length)
+
+        weights = np.uint64(1) << np.arange(bit_length, dtype=np.uint64)
+        words = np.zeros((N, n_words), dtype=np.uint64)
+
+        for w in range(n_words):
+            block = membership[:, w * bit_length : (w + 1) * bit_length]
+            words[:, w] = (block * weights[: block.shape[1]]).sum(
+                axis=1, dtype=np.uint64
+            )
+
+        return cls(words, max_num, bit_length)
+
+    @classmethod
+    def from_numbers(
+        cls,
+        numbers: Union[np.ndarray, Sequence[Sequence[int]]],
+        max_num: int,
+        bit_length: int = 64,
+    ) -> "BitSet":
+        """
+        Encodes N rows of numbers: either a 2-D integer array, padded with -1,
+        or a sequence of (possibly ragged) sequences of numbers.
+        """
+        if not isinstance(numbers, np.ndarray):
+            rows = [list(row) for row in numbers]
+            width = max(map(len, rows), default=0)
+            padded = np.full((len(rows), width), -1, dtype=np.int64)
+            for i, row in enumerate(rows):
+                padded[i, : len(row)] = row
+            numbers = padded
+
+        numbers = np.asarray(numbers, dtype=np.int64).reshape(len(numbers), -1)
+        if ((numbers >= max_num) | (numbers < -1)).any():
+            raise ValueError(f"Numbers must lie within [0, {max_num}).")
+
+        membership = np.zeros((len(numbers), max_num + 1), dtype=bool)
+        rows = np.broadcast_to(np.arange(len(numbers))[:, None], numbers.shape)
+        # Padding (-1) is scattered into the extra, trailing column and discarded.
+        membership[rows, numbers] = True
+
+        return cls.from_membership(membership[:, :max_num], bit_length)
+
+    @classmethod
+    def parse_strings(
+        cls,
+        strings: Iterable[str],
+        max_num: int,
+        bit_length: int = 64,
+        delim: Optional[str] = None,
+        num_length: Optional[int] = None,
+    ) -> Tuple["BitSet", np.ndarray]:
+        """
+        Encodes N number strings, as per 'codec.encode_strings'.
+
+        @returns (bitset, valid): invalid rows are empty, and flagged False in 'valid'.
+        """
+        words, valid = encode_strings(strings, max_num, bit_length, delim, num_length)
+        return cls(words, max_num, bit_length), valid
+
+    @classmethod
+    def from_strings(
+        cls,
+        strings: Iterable[str],
+        max_num: int,
+        bit_length: int = 64,
+        delim: Optional[str] = None,
+        num_length: Optional[int] = None,
+    ) -> "BitSet":
+        """Encodes N number strings, formatted as for 'nums_to_bits'."""
+        bitset, valid = cls.parse_strings(
+            strings, max_num, bit_length, delim, num_length
+        )
+
+        if not valid.all():
+            rows = np.flatnonzero(~valid)
+            raise ValueError(
+                f"{len(rows)} invalid number strings, at rows {rows[:10].tolist()}."
+            )
+
+        return bitset
+
+    @classmethod
+    def from_columns(
+        cls, columns: Sequence[np.ndarray], max_num: int, bit_length: int = 64
+    ) -> "BitSet":
+        """Builds a BitSet from its word columns, e.g.: (low_bits, high_bits)."""
+        words = np.stack([np.asarray(col, dtype=np.uint64) for col in columns], axis=1)
+        return cls(words, max_num, bit_length)
+
+    def columns(self) -> Tuple[np.ndarray, ...]:
+        """Returns each word column, e.g.: (low_bits, high_bits)."""
+        return tuple(self.words[:, w] for w in range(self.n_words))
+
+    def popcount(self) -> np.ndarray:
+        """Number of set bits of each row, as an int64 array of shape (N,)."""
+        return popcount64(self.words).sum(axis=1, dtype=np.int64)
+
+    def contains(self, numbers: Union[int, np.ndarray]) -> np.ndarray:
+        """
+        Membership test over all N rows: 'numbers' is either a single number,
+        tested against every row, or an array of shape (N,), one number per row.
+        """
+        numbers = np.asarray(numbers, dtype=np.int64)
+
+        word_ix = numbers // self.bit_length
+        bit_ix = (numbers % self.bit_length).astype(np.uint64)
+
+        if numbers.ndim == 0:
+            words = self.words[:, int(word_ix)]
+        else:
+            words = self.words[np.arange(len(self)), word_ix]
+
+        return ((words >> bit_ix) & np.uint64(1)).astype(bool)
+
+    def membership(self) -> np.ndarray:
+        """Decodes into a boolean membership matrix of shape (N, max_num)."""
+        shifts = np.arange(self.bit_length, dtype=np.uint64)
+        bits = (self.words[:, :, None] >> shifts) & np.uint64(1)
+
+        return bits.reshape(len(self), self.n_words * self.bit_length)[
+            :, : self.max_num
+        ].astype(bool)
+
+    def to_numbers(self) -> List[List[int]]:
+        """Decodes each row into its ascending list of numbers."""
+        if len(self) == 0:
+            return []
+
+        membership = self.membership()
+        rows, numbers = np.nonzero(membership)
+        splits = np.cumsum(membership.sum(axis=1))[:-1]
+
+        return [row.tolist() for row in np.split(numbers, splits)]
+
+    def to_strings(
+        self, delim: Optional[str] = None, num_length: Optional[int] = None
+    ) -> List[str]:
+        """Decodes each row into a number string, formatted as for 'bits_to_nums'."""
+        return decode_strings(
+            self.words, self.max_num, self.bit_length, delim, num_length
+        )
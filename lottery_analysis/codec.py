@@ -0,0 +1,192 @@
+import functools
+import math
+from typing import *
+
+import numpy as np
+
+"""
+Batch encoding and decoding of number strings, e.g.: "0102030405" or "1, 2, 3, 4, 5",
+into and out of their int array representations (see 'bitset').
+
+Encoding operates upon a whole column of strings at once: the column is laid out as
+a fixed-width NumPy string array, which is viewed, without copying, as a
+(N, width) matrix of code points. The matrix is then scanned column by column,
+each step advancing the tokenizer of all N rows simultaneously.
+
+Decoding views each word as its 8 bytes, and maps each byte onto its precomputed
+number string fragment; a row's string is thereupon the concatenation of its fragments.
+"""
+
+ZERO = ord("0")
+NINE = ord("9")
+
+
+def as_code_points(strings: Union[Iterable[str], np.ndarray]) -> np.ndarray:
+    """
+    Views a column of strings as a (N, width) matrix of code points, zero padded.
+
+    Bytes ('S') and unicode ('U') arrays are viewed in place; any other
+    iterable is first laid out as a unicode array.
+    """
+    if not isinstance(strings, np.ndarray) or strings.dtype.kind not in "SU":
+        strings = np.asarray(
+            [s if isinstance(s, str) else str(s) for s in strings], dtype=str
+        )
+
+    strings = np.ascontiguousarray(strings).reshape(-1)
+
+    if strings.dtype.kind == "S":
+        width = strings.dtype.itemsize
+        code_points = strings.view(np.uint8)
+    else:
+        width = strings.dtype.itemsize // 4
+        code_points = strings.view(np.uint32)
+
+    return code_points.reshape(len(strings), width)
+
+
+def encode_strings(
+    strings: Union[Iterable[str], np.ndarray],
+    max_num: int,
+    bit_length: int = 64,
+    delim: Optional[str] = None,
+    num_length: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Encodes a column of N number strings into their int arrays.
+
+    Numbers are separated by any run of the characters within 'delim', and, should
+    'num_length' be provided, split every 'num_length' digits: fixed-width strings,
+    such as "010203", are thereby parsed alike delimited ones, such as "01 02 03".
+
+    A row containing any other character, or any number not within [0, max_num),
+    is reported as invalid, and its int array is zeroed.
+
+    @param strings: column of number strings.
+    @param max_num: one past the largest number representable.
+    @param bit_length: number of bits used per word; at most 64.
+    @param delim: characters whereby the numbers are separated.
+    @param num_length: number of digits per number, for fixed-width strings.
+
+    @returns (words, valid): uint64 array of shape (N, ceil(max_num / bit_length)),
+                             and a boolean array flagging the valid rows.
+    """
+    code_points = as_code_points(strings)
+    N, width = code_points.shape
+    n_words = math.ceil(max_num / bit_length)
+
+    words = np.zeros((N, n_words), dtype=np.uint64)
+    valid = np.ones(N, dtype=bool)
+
+    value = np.zeros(N, dtype=np.int64)
+    digits = np.zeros(N, dtype=np.int64)
+
+    separators = np.array([0] + [ord(c) for c in delim or ""], dtype=code_points.dtype)
+    rows = np.arange(N)
+
+    def flush(mask: np.ndarray) -> None:
+        mask = mask & (digits > 0)
+
+        out_of_range = mask & (value >= max_num)
+        valid[out_of_range] = False
+        mask &= ~out_of_range
+
+        nums = value[mask]
+        word_ix = nums // bit_length
+        bits = np.uint64(1) << (nums % bit_length).astype(np.uint64)
+        # At most one number per row is flushed at once: the indices are unique.
+        words[rows[mask], word_ix] |= bits
+
+        value[mask] = 0
+        digits[mask] = 0
+
+    for j in range(width):
+        c = code_points[:, j]
+
+        is_digit = (c >= ZERO) & (c <= NINE)
+        is_separator = np.isin(c, separators)
+        valid &= is_digit | is_separator
+
+        if num_length:
+            flush(is_digit & (digits == num_length))
+        flush(is_separator)
+
+        value[is_digit] = value[is_digit] * 10 + (c[is_digit].astype(np.int64) - ZERO)
+        digits[is_digit] += 1
+
+    flush(np.ones(N, dtype=bool))
+
+    words[~valid] = 0
+
+    return words, valid
+
+
+@functools.lru_cache(maxsize=None)
+def build_fragment_table(
+    n_words: int,
+    max_num: int,
+    bit_length: int = 64,
+    delim: Optional[str] = None,
+    num_length: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Builds the per-byte lookup table used by 'decode_strings': table[k, v] is the
+    string of numbers flagged by byte value v at byte position k of a row
+    (word k // 8, byte k % 8), each number followed by 'delim'. Cached per layout.
+
+    @returns table: object array of shape (n_words * 8, 256).
+    """
+    delim = delim or ""
+    table = np.empty((n_words * 8, 256), dtype=object)
+
+    for k in range(n_words * 8):
+        word, byte = divmod(k, 8)
+        offsets = [
+            byte * 8 + i
+            for i in range(8)
+            if byte * 8 + i < bit_length and word * bit_length + byte * 8 + i < max_num
+        ]
+
+        for v in range(256):
+            table[k, v] = "".join(
+                str(word * bit_length + offset).zfill(num_length or 0) + delim
+                for offset in offsets
+                if v & (1 << (offset - byte * 8))
+            )
+
+    return table
+
+
+def decode_strings(
+    words: np.ndarray,
+    max_num: int,
+    bit_length: int = 64,
+    delim: Optional[str] = None,
+    num_length: Optional[int] = None,
+) -> List[str]:
+    """
+    Decodes N int arrays into their canonical number strings: ascending numbers,
+    zero padded to 'num_length', and joined by 'delim'.
+
+    @param words: uint64 array of shape (N, M).
+
+    @returns strings: list of N number strings.
+    """
+    words = np.asarray(words, dtype=np.uint64)
+    N, n_words = words.shape
+
+    if N == 0:
+        return []
+
+    table = build_fragment_table(n_words, max_num, bit_length, delim, num_length)
+
+    # Little-endian, so that byte k % 8 of each word holds its bits [8k, 8k + 8).
+    byte_values = words.astype("<u8").view(np.uint8).reshape(N, n_words * 8)
+    fragments = table[np.arange(n_words * 8), byte_values]
+
+    strings = fragments.sum(axis=1).tolist()
+
+    if delim:
+        strings = [s[: -len(delim)] for s in strings]
+
+    return strings
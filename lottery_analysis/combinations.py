@@ -0,0 +1,89 @@
+import functools
+import itertools
+from math import comb
+from typing import *
+
+import numpy as np
+
+"""
+Ranking, and unranking, of the k-combinations of a field of n numbers, and the
+inclusion-exclusion whereby their match histograms follow from subset counts.
+
+Combinations are of 0-based numbers, ascending, and ranked in colexicographic order:
+that of c_0 < c_1 < ... < c_{k-1} is sum_t C(c_t, t + 1). The ranks of the
+k-combinations of a field thereby span [0, C(n, k)), and are independent of n.
+
+Given, for a combination U, the sums P_i of the counts N_S of its subsets of each
+size i (e.g. the number of drawings whereupon all of S was drawn; P_0 being the
+number of drawings), the number of drawings whereupon exactly j of U was drawn is
+
+    E_j = sum_{i >= j} (-1)^(i - j) C(i, j) P_i.
+
+Shared by both the keno and cash345 scripts.
+"""
+
+
+@functools.lru_cache()
+def binomial_table(n: int, k: int) -> np.ndarray:
+    """(n + 1, k + 1) read-only array of C(i, r)."""
+    table = np.array(
+        [[comb(i, r) for r in range(k + 1)] for i in range(n + 1)], dtype=np.int64
+    )
+    table.setflags(write=False)
+    return table
+
+
+def unrank_combinations(ranks: np.ndarray, k: int, n: int) -> np.ndarray:
+    """
+    The k-combinations of the given ranks.
+
+    @param ranks: colexicographic ranks, within [0, C(n, k)).
+    @param n: numbers within the field.
+
+    @returns combos: (len(ranks), k) int64 array of ascending 0-based numbers.
+    """
+    binomials = binomial_table(n, k)
+    ranks = np.asarray(ranks, dtype=np.int64)
+    combos = np.empty((len(ranks), k), dtype=np.int64)
+
+    for i in range(k, 0, -1):
+        # The greatest c whereof C(c, i) <= rank.
+        c = np.searchsorted(binomials[:, i], ranks, side="right") - 1
+        combos[:, i - 1] = c
+        ranks = ranks - binomials[c, i]
+
+    return combos
+
+
+def rank_combinations(combos: np.ndarray, n: int) -> np.ndarray:
+    """Inverse of 'unrank_combinations'."""
+    combos = np.asarray(combos, dtype=np.int64)
+    k = combos.shape[1]
+    return binomial_table(n, k)[combos, np.arange(1, k + 1)].sum(axis=1)
+
+
+def subset_sums(combos: np.ndarray, counts: np.ndarray, i: int, n: int) -> np.ndarray:
+    """
+    P_i of each combination: the sum of 'counts' over its subsets of i numbers.
+
+    @param combos: (N, k) array of combinations.
+    @param counts: counts of every i-combination, indexed by rank.
+    """
+    sums = np.zeros(len(combos), dtype=np.int64)
+    for positions in itertools.combinations(range(combos.shape[1]), i):
+        sums += counts[rank_combinations(combos[:, positions], n)]
+    return sums
+
+
+def inclusion_exclusion_matrix(k: int) -> np.ndarray:
+    """
+    (k + 1, k + 1) matrix M whereby E = M P: M[j, i] = (-1)^(i - j) C(i, j), for
+    i >= j, else 0.
+    """
+    return np.array(
+        [
+            [(-1) ** (i - j) * comb(i, j) if i >= j else 0 for i in range(k + 1)]
+            for j in range(k + 1)
+        ],
+        dtype=np.int64,
+    )
@@ -0,0 +1,412 @@
+import http.server
+import math
+import os
+import threading
+import urllib.parse
+from datetime import datetime
+from typing import *
+
+import numpy as np
+import pandas as pd
+
+"""
+Deterministic, seeded generation of synthetic lottery data, written in the very
+formats of the NC Lottery dumps, so that the pipelines may be run, and measured,
+without the private data.
+
+Keno data is written as the split files read by 'keno_passf':
+
+    split/drawings_000.csv: Draw Nbr;Draw Date;Winning Number String
+    split/wagers_000.csv: begin_draw;end_draw;qp;ticket_cost;numbers_wagered
+
+Cash 5 data is written as 'NCELCash5.csv' (Date, Number 1, ..., Number 5), and
+'cash5_scraped.csv', as written by 'scrape_cash5'; the pages whence the latter is
+scraped may be served by a local stand-in server (see 'serve_cash5_pages').
+
+The output is wholly determined by the seed and the generation parameters. Wagers
+are generated one split file at a time, each from its own child seed, so that
+memory is bounded by 'rows_per_file' rather than by the number of wagers.
+"""
+
+KENO_MAX_NUMBER = 80
+KENO_DRAWN_COUNT = 20
+KENO_MAX_PLAYED = 10
+KENO_FIRST_DRAW = 1_000_000
+
+# Relative frequencies of 1 through 10 numbers played, and of the number of
+# consecutive draws whereupon a wager is played.
+KENO_PLAYED_WEIGHTS = [5, 8, 10, 15, 15, 10, 10, 10, 7, 10]
+KENO_CONSECUTIVE = {1: 50, 2: 10, 3: 5, 4: 5, 5: 10, 10: 10, 20: 10}
+
+CASH5_MAX_NUMBER = 43
+CASH5_PICKED_COUNT = 5
+CASH5_PRIZE = 100000.0
+CASH5_START = "10/27/2006"
+
+
+def child_rngs(seed: int, n: int) -> List[np.random.Generator]:
+    return [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(n)]
+
+
+def sample_numbers(
+    rng: np.random.Generator, n: int, k: int, max_num: int
+) -> np.ndarray:
+    """
+    Samples n rows of k distinct numbers within [1, max_num], unordered;
+    rows with duplicates are redrawn until none remain.
+
+    @returns numbers: (n, k) uint8 array.
+    """
+    numbers = rng.integers(1, max_num + 1, size=(n, k), dtype=np.uint8)
+    redraw = np.arange(n)
+
+    while len(redraw) > 0:
+        s = np.sort(numbers[redraw], axis=1)
+        redraw = redraw[(s[:, 1:] == s[:, :-1]).any(axis=1)]
+        numbers[redraw] = rng.integers(
+            1, max_num + 1, size=(len(redraw), k), dtype=np.uint8
+        )
+
+    return numbers
+
+
+def format_numbers(
+    numbers: np.ndarray, counts: Optional[np.ndarray] = None, delim: str = " "
+) -> np.ndarray:
+    """
+    Formats each row's first 'counts' numbers as two digit, 'delim' delimited,
+    number strings, e.g.: "01 02 03"; laid out as a byte matrix, and viewed
+    as a fixed-width string array.
+    """
+    n, k = numbers.shape
+    counts = np.full(n, k) if counts is None else np.asarray(counts)
+    sep = np.frombuffer(delim.encode(), dtype=np.uint8)
+    stride = 2 + len(sep)
+
+    chars = np.zeros((n, k, stride), dtype=np.uint8)
+    chars[:, :, 0] = ord("0") + numbers // 10
+    chars[:, :, 1] = ord("0") + numbers % 10
+    chars[:, :, 2:] = sep
+    chars = chars.reshape(n, k * stride)
+
+    # The trailing delimiter, and any numbers past 'counts', are zeroed,
+    # whereupon they are stripped from the string view.
+    lengths = counts * stride - len(sep)
+    chars[np.arange(k * stride) >= lengths[:, None]] = 0
+
+    return np.ascontiguousarray(chars).view(f"S{k * stride}").reshape(n)
+
+
+def to_str(strings: np.ndarray) -> np.ndarray:
+    return strings.astype(str).astype(object)
+
+
+def generate_keno_drawings(
+    days: int,
+    start_date: str = "2017-01-01",
+    draws_per_day: Union[int, Sequence[int]] = 249,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Generates 'days' days' worth of keno drawings, numbered consecutively
+    from KENO_FIRST_DRAW.
+
+    @param draws_per_day: number of draws of each day, or of every day.
+
+    @returns drawings: DataFrame of the 'Draw Nbr', 'Draw Date' (as YYYYMMDD)
+                       and 'Winning Number String' columns.
+    """
+    rng = child_rngs(seed, 1)[0]
+
+    dates = pd.date_range(start_date, periods=days, freq="D")
+    counts = np.broadcast_to(np.asarray(draws_per_day, dtype=np.int64), (days,))
+    n = int(counts.sum())
+
+    numbers = np.sort(sample_numbers(rng, n, KENO_DRAWN_COUNT, KENO_MAX_NUMBER), axis=1)
+
+    return pd.DataFrame(
+        {
+            "Draw Nbr": np.arange(KENO_FIRST_DRAW, KENO_FIRST_DRAW + n),
+            "Draw Date": np.repeat(
+                dates.strftime("%Y%m%d").astype(int).to_numpy(), counts
+            ),
+            "Winning Number String": to_str(format_numbers(numbers)),
+        }
+    )
+
+
+def generate_keno_wagers(
+    n: int,
+    draw_ids: np.ndarray,
+    rng: np.random.Generator,
+    pool: np.ndarray,
+    repeat_rate: float = 0.5,
+    delim: str = " ",
+) -> pd.DataFrame:
+    """
+    Generates n keno wagers upon the drawings of 'draw_ids'.
+
+    A 'repeat_rate' share of the wagers play a ticket of 'pool', chosen by a Zipf
+    distribution, as would a popular pick; the rest play fresh quick picks.
+    Numbers are left in the order picked.
+
+    @param pool: (M, KENO_MAX_PLAYED) array of popular tickets, the first
+                 numbers_played whereof are played.
+
+    @returns wagers: DataFrame of the 'keno_passf.WAGERS_NAMES' columns.
+    """
+    weights = np.asarray(KENO_PLAYED_WEIGHTS, dtype=float)
+    played = rng.choice(
+        np.arange(1, KENO_MAX_PLAYED + 1), size=n, p=weights / weights.sum()
+    )
+
+    numbers = sample_numbers(rng, n, KENO_MAX_PLAYED, KENO_MAX_NUMBER)
+    repeated = rng.random(n) < repeat_rate
+    picks = np.minimum(rng.zipf(1.3, size=repeated.sum()), len(pool)) - 1
+    numbers[repeated] = pool[picks]
+
+    consecutive = np.array(list(KENO_CONSECUTIVE))
+    weights = np.array(list(KENO_CONSECUTIVE.values()), dtype=float)
+    draws = rng.choice(consecutive, size=n, p=weights / weights.sum())
+
+    begin_draw = rng.choice(draw_ids, size=n)
+    end_draw = np.minimum(begin_draw + draws - 1, draw_ids.max())
+    cost = rng.choice([1, 2, 5, 10], size=n) * (end_draw - begin_draw + 1)
+
+    return pd.DataFrame(
+        {
+            "begin_draw": begin_draw,
+            "end_draw": end_draw,
+            "qp": np.where(~repeated, "T", "F"),
+            "ticket_cost": cost,
+            "numbers_wagered": to_str(format_numbers(numbers, played, delim)),
+        }
+    )
+
+
+def write_keno_split(
+    dirpath: str,
+    wagers: int,
+    days: int,
+    start_date: str = "2017-01-01",
+    draws_per_day: Union[int, Sequence[int]] = 249,
+    seed: int = 0,
+    rows_per_file: int = 1_000_000,
+    repeat_rate: float = 0.5,
+    pool_size: Optional[int] = None,
+    delim: str = " ",
+) -> Tuple[List[str], List[str]]:
+    """
+    Writes synthetic keno split files under 'dirpath/split', as per the formats
+    read by 'keno_passf'.
+
+    @param wagers: total number of wagers, written 'rows_per_file' per file.
+    @param pool_size: number of popular tickets; defaults to 1% of the wagers.
+    @param delim: delimiter of the wagers' numbers; "" for fixed-width strings,
+                  e.g.: "0506".
+
+    @returns (drawings_paths, wagers_paths): the files written.
+    """
+    split_dirpath = os.path.join(dirpath, "split")
+    os.makedirs(split_dirpath, exist_ok=True)
+
+    drawings = generate_keno_drawings(days, start_date, draws_per_day, seed)
+    drawings_path = os.path.join(split_dirpath, "drawings_000.csv")
+    drawings.to_csv(drawings_path, sep=";", header=False, index=False)
+
+    n_files = max(1, math.ceil(wagers / rows_per_file))
+    # The first child seeds the drawings, the second the pool.
+    pool_rng, *file_rngs = child_rngs(seed, n_files + 2)[1:]
+
+    pool_size = pool_size or max(1, wagers // 100)
+    pool = sample_numbers(pool_rng, pool_size, KENO_MAX_PLAYED, KENO_MAX_NUMBER)
+
+    draw_ids = drawings["Draw Nbr"].to_numpy()
+    wagers_paths = []
+
+    for i, rng in enumerate(file_rngs):
+        n = min(rows_per_file, wagers - i * rows_per_file)
+        path = os.path.join(split_dirpath, f"wagers_{i:03d}.csv")
+
+        generate_keno_wagers(n, draw_ids, rng, pool, repeat_rate, delim).to_csv(
+            path, sep=";", header=False, index=False
+        )
+        wagers_paths.append(path)
+
+    return [drawings_path], wagers_paths
+
+
+def cash5_match_odds(k: int) -> float:
+    """Odds of a Cash 5 ticket matching exactly k numbers."""
+    return (
+        math.comb(CASH5_PICKED_COUNT, k)
+        * math.comb(CASH5_MAX_NUMBER - CASH5_PICKED_COUNT, CASH5_PICKED_COUNT - k)
+        / math.comb(CASH5_MAX_NUMBER, CASH5_PICKED_COUNT)
+    )
+
+
+def generate_cash5(
+    draws: int,
+    start_date: str = CASH5_START,
+    tickets_per_draw: int = 200_000,
+    seed: int = 0,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Generates 'draws' daily Cash 5 drawings, and the prizes and winners thereof.
+
+    Each drawing's winners are binomially distributed about 'tickets_per_draw'
+    tickets. Without a match 5 winner, the jackpot rolls over, growing by a tenth
+    of CASH5_PRIZE; with one, it resets thereto.
+
+    @returns (ncel, scraped): DataFrames of the shapes of 'NCELCash5.csv' and
+                              'cash5_scraped.csv'.
+    """
+    rng = child_rngs(seed, 1)[0]
+
+    dates = pd.date_range(
+        datetime.strptime(start_date, "%m/%d/%Y"), periods=draws, freq="D"
+    ).strftime("%m/%d/%Y")
+    numbers = np.sort(
+        sample_numbers(rng, draws, CASH5_PICKED_COUNT, CASH5_MAX_NUMBER), axis=1
+    )
+
+    ncel = pd.DataFrame({"Date": dates})
+    for i in range(CASH5_PICKED_COUNT):
+        ncel[f"Number {i + 1}"] = numbers[:, i].astype(np.int64)
+
+    tickets = rng.poisson(tickets_per_draw, size=draws)
+    winners = {
+        k: rng.binomial(tickets, cash5_match_odds(k))
+        for k in range(2, CASH5_PICKED_COUNT + 1)
+    }
+
+    # The jackpot is reset upon the draw after each win; the number of draws
+    # since is that of its rollovers.
+    won = winners[5] > 0
+    ix = np.arange(draws)
+    reset = np.maximum.accumulate(np.where(np.r_[True, won[:-1]], ix, 0))
+    jackpot = CASH5_PRIZE + (ix - reset) * CASH5_PRIZE / 10
+
+    scraped = pd.DataFrame(
+        {
+            "date": dates,
+            "jackpot": jackpot.astype(str),
+            "prize_4": np.round(rng.normal(250, 25, size=draws), 2).astype(str),
+            "prize_5": np.where(won, jackpot.astype(str), "Rollover"),
+            **{f"winners_{k}": winners[k] for k in range(2, CASH5_PICKED_COUNT + 1)},
+        }
+    )
+
+    return ncel, scraped
+
+
+def write_cash5(
+    dirpath: str,
+    draws: int,
+    start_date: str = CASH5_START,
+    tickets_per_draw: int = 200_000,
+    seed: int = 0,
+) -> Tuple[str, str]:
+    """
+    Writes synthetic 'NCELCash5.csv' and 'cash5_scraped.csv' files within 'dirpath'.
+
+    @returns (ncel_path, scraped_path): the files written.
+    """
+    os.makedirs(dirpath, exist_ok=True)
+    ncel, scraped = generate_cash5(draws, start_date, tickets_per_draw, seed)
+
+    ncel_path = os.path.join(dirpath, "NCELCash5.csv")
+    scraped_path = os.path.join(dirpath, "cash5_scraped.csv")
+
+    ncel.to_csv(ncel_path, index=False)
+    scraped.to_csv(scraped_path, index=False)
+
+    return ncel_path, scraped_path
+
+
+# Element ids of the fields of a Cash 5 page upon nclottery.com, as per 'scrape_cash5'.
+CASH5_PAGE_IDS = {
+    "prize_5": "ctl00_MainContent_lblCash5Match5Prize",
+    "prize_4": "ctl00_MainContent_lblCash5Match4Prize",
+    "winners_5": "ctl00_MainContent_lblCash5Match5",
+    "winners_4": "ctl00_MainContent_lblCash5Match4",
+    "winners_3": "ctl00_MainContent_lblCash5Match3",
+    "winners_2": "ctl00_MainContent_lblCash5Match2",
+    "jackpot": "ctl00_MainContent_lblCash5TopPrize",
+}
+
+
+def render_cash5_pages(scraped: pd.DataFrame) -> Dict[str, str]:
+    """
+    Renders each row of 'scraped' as the page whence 'scrape_cash5' would have scraped
+    it: the prizes as dollars, e.g.: "$100,000.00", else as is (e.g.: "Rollover").
+
+    @returns pages: HTML of each date, e.g.: "10/27/2006".
+    """
+
+    def format_value(key: str, value: Any) -> str:
+        if key.startswith("winners"):
+            return str(value)
+        try:
+            return f"${float(value):,.2f}"
+        except ValueError:
+            return str(value)
+
+    pages = {}
+    for row in scraped.to_dict("records"):
+        spans = "\n".join(
+            f'<span id="{id}">{format_value(key, row[key])}</span>'
+            for key, id in CASH5_PAGE_IDS.items()
+        )
+        pages[row["date"]] = f"<html><body>\n{spans}\n</body></html>"
+
+    return pages
+
+
+def serve_cash5_pages(
+    pages: Dict[str, str], host: str = "127.0.0.1", port: int = 0
+) -> http.server.ThreadingHTTPServer:
+    """
+    A local stand-in for nclottery.com, serving 'pages' at "/Cash5?dd=<date>" over
+    keep-alive connections; a date absent thereof is a 404.
+
+    The server is bound, but not started: call its 'serve_forever', e.g. within a
+    thread, and its 'shutdown' thereafter. Its 'requests' and 'connections' count
+    those served.
+
+    @param port: 0 for any free port; see 'server_address'.
+    """
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with self.server.lock:
+                self.server.connections += 1
+
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            date = urllib.parse.parse_qs(url.query).get("dd", [""])[0]
+            page = pages.get(date) if url.path == "/Cash5" else None
+
+            with self.server.lock:
+                self.server.requests += 1
+
+            body = (page or "Not found").encode("utf-8")
+            self.send_response(200 if page is not None else 404)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.connections = 0
+
+    return server